@@ -0,0 +1,148 @@
+"""
+Import-time budget of the latyas entry points.
+
+Every target is imported in a fresh interpreter, several times, and the median
+time above a bare interpreter start is compared with its budget. The pipeline
+targets are measured above the import of numpy and pypdfium2 instead: every
+pipeline needs both on import, and they alone take about 200 ms, so that part
+is not latyas' to cut. The targets must also leave the model backends (torch,
+transformers, paddleocr, ...) unimported; they are only imported when a model
+is first used. Exits with 1 when a target is over budget or imports a backend.
+tests/test_import_time.py runs the same check.
+
+    python -m latyas.benchmarks.import_time_benchmark
+    python -m latyas.benchmarks.import_time_benchmark --runs 9 --budget-scale 2
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+# Modules that must only be imported when a model is built
+BACKENDS = (
+    "torch",
+    "torchvision",
+    "transformers",
+    "optimum",
+    "paddle",
+    "paddleocr",
+    "ultralytics",
+    "onnxruntime",
+    "huggingface_hub",
+    "easyocr",
+    "pytesseract",
+)
+
+# Imported by every pipeline, the floor of the targets measured with above_required
+REQUIRED_IMPORTS = "import numpy, pypdfium2"
+
+# name -> (statement importing the target, budget in milliseconds, measured above REQUIRED_IMPORTS)
+TARGETS = {
+    "latyas": ("import latyas", 20, False),
+    "pipelines": (
+        "import latyas.pipelines.report_pipeline, latyas.pipelines.paper_pipeline, latyas.pipelines.book_pipeline",
+        150,
+        True,
+    ),
+    "pdf2text": ("import latyas.tools.pdf2text", 200, True),
+    "pdf2text --help": (
+        "import runpy, sys; sys.argv = ['pdf2text', '--help']\n"
+        "try:\n"
+        "    runpy.run_module('latyas.tools.pdf2text', run_name='__main__')\n"
+        "except SystemExit:\n"
+        "    pass",
+        200,
+        True,
+    ),
+}
+
+_PROBE = """
+import sys
+{statement}
+import json
+print("LATYAS_BACKENDS " + json.dumps(sorted(m for m in {backends!r} if m in sys.modules)))
+"""
+
+
+def _run(code: str, cwd: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], cwd=cwd, check=True, capture_output=True)
+    return time.perf_counter() - start
+
+
+def measure(statement: str, runs: int, baseline: float, cwd: str) -> Dict[str, Any]:
+    times = [_run(statement, cwd) - baseline for _ in range(runs)]
+    probe = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(statement=statement, backends=BACKENDS)],
+        cwd=cwd, check=True, capture_output=True, text=True,
+    )
+    backends: List[str] = []
+    for line in probe.stdout.splitlines():
+        if line.startswith("LATYAS_BACKENDS "):
+            backends = json.loads(line[len("LATYAS_BACKENDS "):])
+    return {
+        "median_ms": max(statistics.median(times), 0.0) * 1000,
+        "min_ms": max(min(times), 0.0) * 1000,
+        "backends": backends,
+    }
+
+
+def check(runs: int = 5, budget_scale: float = 1.0) -> Tuple[Dict[str, float], List[Dict[str, Any]]]:
+    """
+    Measure every target. Returns the baselines in milliseconds and one result per
+    target, with its budget and a status that is "ok" when it is within budget
+    and imports no backend.
+    """
+    cwd = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    start = statistics.median(_run("pass", cwd) for _ in range(runs))
+    required = statistics.median(_run(REQUIRED_IMPORTS, cwd) for _ in range(runs))
+    results = []
+    for name, (statement, budget, above_required) in TARGETS.items():
+        result = {"target": name, "budget_ms": budget * budget_scale, "above_required": above_required}
+        try:
+            result.update(measure(statement, runs, required if above_required else start, cwd))
+        except subprocess.CalledProcessError as err:
+            result["status"] = "failed to import:\n" + (err.stderr.decode(errors="replace") if err.stderr else "")
+            results.append(result)
+            continue
+        result["status"] = "ok"
+        if result["median_ms"] > result["budget_ms"]:
+            result["status"] = "over budget"
+        if result["backends"]:
+            result["status"] = f"imports {', '.join(result['backends'])}"
+        results.append(result)
+    return {"start_ms": start * 1000, "required_ms": (required - start) * 1000}, results
+
+
+def run(runs: int = 5, budget_scale: float = 1.0) -> bool:
+    """
+    Measure every target and print the report. True when all of them are within
+    budget and import no backend.
+    """
+    baselines, results = check(runs, budget_scale)
+    print(f"interpreter start {baselines['start_ms']:.1f} ms (subtracted)")
+    print(f"numpy and pypdfium2 {baselines['required_ms']:.1f} ms (also subtracted from the targets marked *)")
+    print(f"{'target':<18} {'median ms':>10} {'min ms':>8} {'budget ms':>10}  result")
+    for result in results:
+        name = result["target"] + (" *" if result["above_required"] else "")
+        if "median_ms" not in result:
+            print(f"{name:<18} {result['status']}")
+            continue
+        print(
+            f"{name:<18} {result['median_ms']:>10.1f} {result['min_ms']:>8.1f} "
+            f"{result['budget_ms']:>10.0f}  {result['status']}"
+        )
+    return all(result["status"] == "ok" for result in results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the import time of latyas against its budget.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="multiply every budget, for slow machines")
+    args = parser.parse_args()
+    sys.exit(0 if run(args.runs, args.budget_scale) else 1)
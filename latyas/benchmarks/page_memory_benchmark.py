@@ -0,0 +1,139 @@
+"""
+Per-page allocations of the image path, before and after the zero-copy changes.
+
+For every page of a synthetic PDF the benchmark renders the page, then copies its
+layout and masks a block (as TexMix does for every text-with-equation block),
+crops every block and pads the small crops for the formula recognizer. The
+"before" path, kept here as the reference, converts the bitmap through PIL,
+copies the page on Layout.copy and pads through an int64 background. The
+"after" path is the one of the pipelines. Allocations are tracked with
+tracemalloc, which sees the NumPy and ctypes buffers; the PIL image of the
+"before" path is allocated outside of it, so its numbers are a lower bound.
+tests/test_page_memory.py asserts that the "after" path allocates less than
+half of the "before" path.
+
+    python -m latyas.benchmarks.page_memory_benchmark --pages 5 --scale 2
+"""
+
+import argparse
+import os
+import tempfile
+import tracemalloc
+from typing import Callable, Dict, List
+
+import cv2
+import numpy as np
+import pypdfium2
+
+from latyas.benchmarks.standin_models import StandInLayoutModel
+from latyas.benchmarks.synthetic_pdf import write_synthetic_pdf
+from latyas.layout.layout import Layout
+from latyas.ocr.ocr_utils import small_image_padding
+from latyas.pipelines.base_pipeline import BasePipeline
+
+
+def render_page_reference(page: pypdfium2.PdfPage, render_scale: float) -> np.ndarray:
+    bitmap = page.render(scale=render_scale, rotation=0)
+    pil_image = bitmap.to_pil()
+    return np.asarray(pil_image)
+
+
+def copy_reference(page_layout: Layout) -> Layout:
+    return Layout(blocks=[block.copy() for block in page_layout], page=page_layout._page.copy())
+
+
+def small_image_padding_reference(image: np.ndarray, bg_size: int = 800, bg_margin: int = 160, blur: int = 5):
+    image_array = cv2.resize(image, None, fx=2, fy=2, interpolation=cv2.INTER_LINEAR)
+    if blur != 0:
+        image_array = cv2.blur(image_array, (blur, blur))
+    margin_bg = np.ones((image_array.shape[0] + 2 * bg_margin, image_array.shape[1] + 2 * bg_margin, 3), np.uint8)
+    margin_bg = margin_bg * (255, 255, 255)
+    margin_bg[bg_margin:bg_margin + image_array.shape[0], bg_margin:bg_margin + image_array.shape[1]] = image_array
+    height, width = margin_bg.shape[0], margin_bg.shape[1]
+    background = np.ones((max(height, bg_size), max(width, bg_size), 3), np.uint8) * 255
+    y_offset = (background.shape[0] - height) // 2
+    x_offset = (background.shape[1] - width) // 2
+    background[y_offset:y_offset + height, x_offset:x_offset + width] = margin_bg
+    return background
+
+
+def _traced(fn: Callable, *args):
+    """
+    Run fn and return its result and the peak of the memory it allocated, in MB.
+    """
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    try:
+        result = fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak / (1024 * 1024)
+
+
+def crop_path(page_layout: Layout, copy: Callable[[Layout], Layout], pad: Callable[[np.ndarray], np.ndarray]) -> None:
+    if len(page_layout) > 0:
+        masked = copy(page_layout)
+        masked.mask_image(page_layout[0])
+    for block in page_layout:
+        crop = page_layout.crop_image(block)
+        if crop.size == 0:
+            continue
+        if crop.shape[0] < 400 or crop.shape[1] < 400:
+            pad(crop)
+
+
+def measure(pdf_path: str, pages: int, path: str, render_scale: float) -> Dict[str, List[float]]:
+    """
+    The peak allocations of every page, for rendering and for copying, cropping
+    and padding. Layout detection runs untracked in between.
+    """
+    layout_model = StandInLayoutModel()
+    pipeline = BasePipeline()
+    pipeline.set_render_scale(render_scale)
+    if path == "before":
+        render = lambda page: render_page_reference(page, render_scale)
+        copy, pad = copy_reference, small_image_padding_reference
+    else:
+        render, copy, pad = pipeline.render_page, Layout.copy, small_image_padding
+
+    pdf = pypdfium2.PdfDocument(pdf_path)
+    results: Dict[str, List[float]] = {"render_mb": [], "crops_mb": []}
+    for page_number in range(min(pages, len(pdf))):
+        page = pdf[page_number]
+        page_img, render_mb = _traced(render, page)
+        page_layout = layout_model.detect(page_img)
+        _, crops_mb = _traced(crop_path, page_layout, copy, pad)
+        page.close()
+        results["render_mb"].append(render_mb)
+        results["crops_mb"].append(crops_mb)
+    pdf.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-page allocations of rendering, copying and cropping.")
+    parser.add_argument("--mode", type=str, default="paper", choices=("report", "paper", "book"))
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=2)
+    parser.add_argument("--work-dir", type=str, default=None)
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or os.path.join(tempfile.gettempdir(), "latyas-benchmarks")
+    os.makedirs(work_dir, exist_ok=True)
+    pdf_path = os.path.join(work_dir, f"{args.mode}-{args.pages}-0.pdf")
+    if not os.path.exists(pdf_path):
+        write_synthetic_pdf(pdf_path, args.mode, pages=args.pages)
+
+    before = measure(pdf_path, args.pages, "before", args.scale)
+    after = measure(pdf_path, args.pages, "after", args.scale)
+    print(f"{'page':>5} {'render before':>14} {'after':>8} {'crops before':>13} {'after':>8}  (MB)")
+    for page_number in range(len(after["render_mb"])):
+        print(
+            f"{page_number:>5} {before['render_mb'][page_number]:>14.2f} {after['render_mb'][page_number]:>8.2f} "
+            f"{before['crops_mb'][page_number]:>13.2f} {after['crops_mb'][page_number]:>8.2f}"
+        )
+    print(
+        f"{'mean':>5} {np.mean(before['render_mb']):>14.2f} {np.mean(after['render_mb']):>8.2f} "
+        f"{np.mean(before['crops_mb']):>13.2f} {np.mean(after['crops_mb']):>8.2f}"
+    )
@@ -0,0 +1,229 @@
+"""
+End-to-end benchmark of pdf2text in report, paper and book modes.
+
+Every mode runs in a fresh process on a synthetic PDF generated locally, with the
+models of the mode's pipeline replaced by stand-ins, so the suite runs offline on
+a CPU. It reports pages/sec, the p50/p95 per-page latency, the peak RSS and the
+per-stage breakdown, and stores the results as JSON named after the commit so
+that two runs can be compared.
+
+    python -m latyas.benchmarks.pdf2text_benchmark --pages 20
+    python -m latyas.benchmarks.pdf2text_benchmark --compare old.json new.json
+"""
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from latyas.benchmarks.standin_models import build_standin_pipeline
+from latyas.benchmarks.synthetic_pdf import write_synthetic_pdf
+from latyas.utils.profiling import TraceProfiler
+
+MODES = ("report", "paper", "book")
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def run_mode(
+    mode: str,
+    pages: int,
+    seed: int,
+    workers: int,
+    seconds_per_call: float,
+    seconds_per_image: float,
+    work_dir: str,
+) -> Dict[str, Any]:
+    from latyas.tools.pdf2text import PIPELINE_CLASSES, iter_pdf2text, layout_to_text
+
+    pdf_path = os.path.join(work_dir, f"{mode}-{pages}-{seed}.pdf")
+    if not os.path.exists(pdf_path):
+        write_synthetic_pdf(pdf_path, mode, pages=pages, seed=seed)
+
+    pipeline = build_standin_pipeline(PIPELINE_CLASSES[mode], seconds_per_call, seconds_per_image)
+    profiler = TraceProfiler()
+
+    latencies = []
+    blocks = 0
+    start = time.perf_counter()
+    last = start
+    for page_number, page_layout in iter_pdf2text(
+        pdf_path, mode, workers=workers, profiler=profiler, pipeline=pipeline
+    ):
+        layout_to_text(page_layout)
+        blocks += len(page_layout)
+        now = time.perf_counter()
+        latencies.append(now - last)
+        last = now
+    seconds = time.perf_counter() - start
+
+    summary = profiler.summary()
+    return {
+        "pages": len(latencies),
+        "blocks": blocks,
+        "seconds": seconds,
+        "pages_per_sec": len(latencies) / seconds if seconds > 0 else 0.0,
+        "latency_p50_ms": float(np.percentile(latencies, 50)) * 1000 if latencies else 0.0,
+        "latency_p95_ms": float(np.percentile(latencies, 95)) * 1000 if latencies else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": summary.get("stage", {}),
+        "models": summary.get("model", {}),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+
+def run(
+    modes: List[str],
+    pages: int = 20,
+    seed: int = 0,
+    workers: int = 1,
+    seconds_per_call: float = 0.0,
+    seconds_per_image: float = 0.0,
+    work_dir: Optional[str] = None,
+) -> Dict[str, Any]:
+    if work_dir is None:
+        work_dir = os.path.join(tempfile.gettempdir(), "latyas-benchmarks")
+    os.makedirs(work_dir, exist_ok=True)
+
+    results = {}
+    for mode in modes:
+        # A fresh process per mode keeps the peak RSS of the modes apart
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results[mode] = pool.submit(
+                run_mode, mode, pages, seed, workers, seconds_per_call, seconds_per_image, work_dir
+            ).result()
+    return {
+        "commit": git_commit(),
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "pages": pages,
+            "seed": seed,
+            "workers": workers,
+            "seconds_per_call": seconds_per_call,
+            "seconds_per_image": seconds_per_image,
+        },
+        "results": results,
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"commit {report['commit']}  config {json.dumps(report['config'])}")
+    print(f"{'mode':>7} {'pages/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'rss MB':>8}")
+    for mode, result in report["results"].items():
+        print(
+            f"{mode:>7} {result['pages_per_sec']:>9.2f} {result['latency_p50_ms']:>9.2f} "
+            f"{result['latency_p95_ms']:>9.2f} {result['peak_rss_mb']:>8.1f}"
+        )
+        for stage, total in result["stages"].items():
+            print(
+                f"{'':>7}   {stage:<24} wall {total['wall'] * 1000:>9.2f} ms  cpu {total['cpu'] * 1000:>9.2f} ms"
+                f"  blocks {int(total.get('blocks', 0)):>6}"
+            )
+
+
+def _change(old: float, new: float) -> str:
+    if old == 0:
+        return "    n/a"
+    return f"{(new - old) / old * 100:>+7.1f}%"
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any]) -> None:
+    """
+    Print the metrics of two stored runs side by side.
+    """
+    print(f"old {old['commit']}  new {new['commit']}")
+    if old["config"] != new["config"]:
+        print(f"warning: configs differ, old {old['config']} new {new['config']}")
+    metrics = ("pages_per_sec", "latency_p50_ms", "latency_p95_ms", "peak_rss_mb")
+    for mode in new["results"]:
+        if mode not in old["results"]:
+            continue
+        old_result, new_result = old["results"][mode], new["results"][mode]
+        print(mode)
+        for metric in metrics:
+            print(
+                f"  {metric:<26} {old_result[metric]:>10.2f} {new_result[metric]:>10.2f} "
+                f"{_change(old_result[metric], new_result[metric])}"
+            )
+        for stage, new_total in new_result["stages"].items():
+            old_wall = old_result["stages"].get(stage, {}).get("wall", 0.0) * 1000
+            new_wall = new_total["wall"] * 1000
+            print(f"  {stage + ' wall ms':<26} {old_wall:>10.2f} {new_wall:>10.2f} {_change(old_wall, new_wall)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark pdf2text on synthetic PDFs with stand-in models.")
+    parser.add_argument("--modes", type=str, nargs="+", default=list(MODES), choices=MODES)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--model-delay-ms", type=float, default=0.0, help="simulated cost of every model call")
+    parser.add_argument(
+        "--model-delay-per-image-ms", type=float, default=0.0, help="simulated cost of every image in a model call"
+    )
+    parser.add_argument("--work-dir", type=str, default=None, help="where the synthetic PDFs are kept")
+    parser.add_argument("--results-dir", type=str, default="benchmark_results")
+    parser.add_argument("--no-save", action="store_true", help="do not store the results")
+    parser.add_argument("--compare", type=str, nargs=2, metavar=("OLD", "NEW"), help="compare two stored runs")
+    args = parser.parse_args()
+
+    if args.compare is not None:
+        with open(args.compare[0], "r", encoding="utf-8") as f:
+            old_report = json.load(f)
+        with open(args.compare[1], "r", encoding="utf-8") as f:
+            new_report = json.load(f)
+        compare(old_report, new_report)
+        sys.exit(0)
+
+    report = run(
+        args.modes,
+        pages=args.pages,
+        seed=args.seed,
+        workers=args.workers,
+        seconds_per_call=args.model_delay_ms / 1000,
+        seconds_per_image=args.model_delay_per_image_ms / 1000,
+        work_dir=args.work_dir,
+    )
+    print_report(report)
+    if not args.no_save:
+        os.makedirs(args.results_dir, exist_ok=True)
+        timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        commit = report["commit"] or "unknown"
+        commit = commit[:12] + ("-dirty" if commit.endswith("-dirty") else "")
+        path = os.path.join(args.results_dir, f"pdf2text-{commit}-{timestamp}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {path}")
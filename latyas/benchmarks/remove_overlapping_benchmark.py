@@ -0,0 +1,140 @@
+"""
+Benchmark of Layout.remove_overlapping on synthetic pages with 50 to 2,000 boxes.
+
+The vectorized implementation is checked against the original pure-Python
+double loop, kept here as the reference.
+
+    python -m latyas.benchmarks.remove_overlapping_benchmark --sizes 50 200 500 1000 2000
+"""
+
+import argparse
+import random
+import time
+from typing import List, Literal, Tuple
+
+from latyas.layout.block import Block, BlockType, is_text_block
+from latyas.layout.layout import Layout
+from latyas.layout.shape import Rectangle
+
+STRATEGIES = ("keep_large", "keep_small", "merge")
+
+BENCHMARK_KINDS = [
+    BlockType.Text,
+    BlockType.Title,
+    BlockType.Caption,
+    BlockType.Figure,
+    BlockType.Table,
+    BlockType.Equation,
+    BlockType.EmbedEq,
+]
+
+
+def remove_overlapping_reference(
+    layout: Layout,
+    area_threshold=0.5,
+    strategy: Literal["keep_large", "keep_small", "merge"] = "merge",
+):
+    to_remove = []
+    for block_i in range(len(layout._blocks)):
+        if block_i in to_remove:
+            continue
+        for block_j in range(block_i + 1, len(layout._blocks)):
+            block_lhs = layout._blocks[block_i]
+            block_rhs = layout._blocks[block_j]
+            if not isinstance(block_lhs.shape, Rectangle):
+                continue
+            if not isinstance(block_rhs.shape, Rectangle):
+                continue
+
+            if block_lhs.kind != block_rhs.kind:
+                if not (is_text_block(block_lhs.kind) and is_text_block(block_rhs.kind)):
+                    continue
+
+            intersect_rect = block_lhs.shape.intersect(block_rhs.shape)
+            if (
+                intersect_rect.area > area_threshold * block_lhs.shape.area
+                or intersect_rect.area > area_threshold * block_rhs.shape.area
+            ):
+                if strategy == "keep_large":
+                    if block_lhs.shape.area > block_rhs.shape.area:
+                        to_remove.append(block_j)
+                    else:
+                        to_remove.append(block_i)
+                elif strategy == "keep_small":
+                    if block_lhs.shape.area < block_rhs.shape.area:
+                        to_remove.append(block_j)
+                    else:
+                        to_remove.append(block_i)
+                elif strategy == "merge":
+                    to_remove.append(block_i)
+                    if block_lhs.kind.value > block_rhs.kind.value:
+                        merge_kind = block_lhs.kind
+                    else:
+                        merge_kind = block_rhs.kind
+                    layout._blocks[block_j]._kind = merge_kind
+                    union_shape = block_lhs.shape.union(block_rhs.shape)
+                    layout._blocks[block_j].set_shape(union_shape)
+                else:
+                    raise Exception("Unsupported overlapping strategy.")
+
+    to_remove = sorted(list(set(to_remove)))
+    for block_i in reversed(to_remove):
+        layout._blocks.pop(block_i)
+
+
+def random_layout(n: int, seed: int = 0, width: float = 1240, height: float = 1754) -> Layout:
+    """
+    A page with n boxes, half of them jittered copies of earlier boxes so that
+    every strategy has overlaps to resolve.
+    """
+    rng = random.Random(seed)
+    blocks = []
+    for block_i in range(n):
+        if block_i > 0 and rng.random() < 0.5:
+            x_1, y_1, x_2, y_2 = rng.choice(blocks).shape.boundingbox
+            dx, dy = rng.uniform(-20, 20), rng.uniform(-10, 10)
+            rect = Rectangle(x_1 + dx, y_1 + dy, x_2 + dx * 0.5, y_2 + dy * 0.5)
+        else:
+            x_1, y_1 = rng.uniform(0, width), rng.uniform(0, height)
+            rect = Rectangle(x_1, y_1, x_1 + rng.uniform(5, width / 3), y_1 + rng.uniform(5, height / 20))
+        blocks.append(Block(rect, rng.choice(BENCHMARK_KINDS)))
+    return Layout(blocks=blocks)
+
+
+def layout_signature(layout: Layout) -> List[Tuple[BlockType, Tuple[float, float, float, float]]]:
+    return [
+        (block.kind, tuple(float(v) for v in block.shape.boundingbox)) for block in layout
+    ]
+
+
+def run(sizes: List[int], repeat: int = 3, seed: int = 0) -> None:
+    print(f"{'boxes':>6} {'strategy':>11} {'reference ms':>13} {'vectorized ms':>14} {'speedup':>8}")
+    for n in sizes:
+        for strategy in STRATEGIES:
+            reference_time = vectorized_time = float("inf")
+            for _ in range(repeat):
+                reference = random_layout(n, seed)
+                start = time.perf_counter()
+                remove_overlapping_reference(reference, strategy=strategy)
+                reference_time = min(reference_time, time.perf_counter() - start)
+
+                vectorized = random_layout(n, seed)
+                start = time.perf_counter()
+                vectorized.remove_overlapping(strategy=strategy)
+                vectorized_time = min(vectorized_time, time.perf_counter() - start)
+
+                if layout_signature(reference) != layout_signature(vectorized):
+                    raise Exception(f"Results differ for {n} boxes with strategy {strategy}")
+            print(
+                f"{n:>6} {strategy:>11} {reference_time * 1000:>13.2f} "
+                f"{vectorized_time * 1000:>14.2f} {reference_time / vectorized_time:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Layout.remove_overlapping.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 500, 1000, 2000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.sizes, repeat=args.repeat, seed=args.seed)
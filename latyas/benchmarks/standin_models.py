@@ -0,0 +1,130 @@
+"""
+Small local stand-ins for the layout and OCR models of the pipelines, so that the
+benchmarks run offline on a CPU. They read the color coding of the synthetic PDFs
+and can sleep to simulate the cost of a real model.
+"""
+
+import time
+from typing import Dict, List, Optional, Set, Type, Union
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from latyas.layout.block import Block, BlockType
+from latyas.layout.layout import Layout
+from latyas.layout.models.layout_model import LayoutModel
+from latyas.layout.shape import Rectangle
+from latyas.ocr.models.ocr_model import OCRModel
+from latyas.ocr.text_bbox import TextBoundingBox
+from latyas.pipelines.base_pipeline import BasePipeline
+
+
+def _components(mask: np.ndarray, kernel_size: tuple, min_area: int = 20) -> List[tuple]:
+    dilated = cv2.dilate(mask.astype(np.uint8), np.ones(kernel_size, dtype=np.uint8))
+    count, _, stats, _ = cv2.connectedComponentsWithStats(dilated, connectivity=8)
+    boxes = []
+    for label in range(1, count):
+        x, y, w, h, area = stats[label]
+        if area < min_area:
+            continue
+        boxes.append((int(x), int(y), int(x + w), int(y + h)))
+    return boxes
+
+
+class StandInLayoutModel(LayoutModel):
+    """
+    Finds the blocks of a synthetic page from its colors: black ink is Text, dark
+    gray ink a Title, red ink a Table and blue ink an Equation, or an EmbedEq when
+    it lies inside a text block. Only the kinds in kinds are reported.
+    """
+
+    def __init__(
+        self, seconds_per_call: float = 0.0, seconds_per_image: float = 0.0, kinds: Optional[Set[BlockType]] = None
+    ) -> None:
+        self.seconds_per_call = seconds_per_call
+        self.seconds_per_image = seconds_per_image
+        self.kinds = kinds
+
+    def detect(self, image: Union["np.ndarray", "Image.Image"]) -> Layout:
+        return self.detect_batch([image])[0]
+
+    def detect_batch(self, images: List[Union["np.ndarray", "Image.Image"]], batch_size: int = 8) -> List[Layout]:
+        time.sleep(self.seconds_per_call + self.seconds_per_image * len(images))
+        return [self._detect(np.asarray(image)) for image in images]
+
+    def _detect(self, image_array: np.ndarray) -> Layout:
+        rgb = image_array[..., :3].astype(np.int16)
+        r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+        dark = (r < 110) & (g < 110) & (b < 110)
+        blue = (b > 150) & (r < 120) & (g < 120)
+        red = (r > 150) & (g < 120) & (b < 120)
+
+        width = image_array.shape[1]
+        kernel_size = (max(3, width // 80), max(3, width // 50))
+        page_layout = Layout(page=image_array)
+        text_boxes = []
+        for x_1, y_1, x_2, y_2 in _components(dark, kernel_size):
+            darkest = rgb[y_1:y_2, x_1:x_2].min(axis=2)[dark[y_1:y_2, x_1:x_2]].min()
+            kind = BlockType.Title if darkest > 40 else BlockType.Text
+            text_boxes.append(Rectangle(x_1, y_1, x_2, y_2))
+            page_layout.insert(len(page_layout), Block(text_boxes[-1], kind))
+        for x_1, y_1, x_2, y_2 in _components(red, kernel_size):
+            page_layout.insert(len(page_layout), Block(Rectangle(x_1, y_1, x_2, y_2), BlockType.Table))
+        for x_1, y_1, x_2, y_2 in _components(blue, (3, max(3, width // 100))):
+            rect = Rectangle(x_1, y_1, x_2, y_2)
+            inline = any(rect.is_inside(text_box, margin=0) for text_box in text_boxes)
+            page_layout.insert(len(page_layout), Block(rect, BlockType.EmbedEq if inline else BlockType.Equation))
+        if self.kinds is not None:
+            page_layout.reorder([i for i, block in enumerate(page_layout) if block.kind in self.kinds])
+        return page_layout
+
+
+class StandInOCRModel(OCRModel):
+    """
+    Returns a short description of the ink in each crop instead of its text.
+    """
+
+    def __init__(self, seconds_per_call: float = 0.0, seconds_per_image: float = 0.0) -> None:
+        self.seconds_per_call = seconds_per_call
+        self.seconds_per_image = seconds_per_image
+
+    def recognize(self, image: Union["np.ndarray", "Image.Image"]) -> str:
+        return self.recognize_batch([image])[0]
+
+    def recognize_batch(self, images: List[Union["np.ndarray", "Image.Image"]]) -> List[str]:
+        time.sleep(self.seconds_per_call + self.seconds_per_image * len(images))
+        texts = []
+        for image in images:
+            image_array = np.asarray(image)
+            if image_array.size == 0:
+                texts.append("")
+                continue
+            ink = image_array[..., :3].min(axis=2) < 128
+            texts.append(f"{image_array.shape[1]}x{image_array.shape[0]} ink={int(ink.sum())}")
+        return texts
+
+    def detect(self, image: Union["np.ndarray", "Image.Image"]) -> List[TextBoundingBox]:
+        return []
+
+
+def build_standin_pipeline(
+    pipeline_class: Type[BasePipeline],
+    seconds_per_call: float = 0.0,
+    seconds_per_image: float = 0.0,
+) -> BasePipeline:
+    """
+    A BasePipeline with the OCR rules of pipeline_class where every model is a
+    stand-in. The model weights of pipeline_class are never loaded. The layout
+    stand-in only reports the kinds the rules can read.
+    """
+    ocr_rules: Dict[BlockType, str] = pipeline_class.OCR_RULES
+    pipeline = BasePipeline()
+    pipeline.add_layout_model(
+        "layout_standin", StandInLayoutModel(seconds_per_call, seconds_per_image, kinds=set(ocr_rules))
+    )
+    for model_name in sorted(set(ocr_rules.values())):
+        pipeline.add_ocr_model(model_name, StandInOCRModel(seconds_per_call, seconds_per_image))
+    for block_type, rule in ocr_rules.items():
+        pipeline.add_ocr_rule(block_type, rule)
+    return pipeline
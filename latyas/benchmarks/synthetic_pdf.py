@@ -0,0 +1,185 @@
+"""
+Deterministic synthetic PDFs for the benchmarks, written without any PDF library.
+
+The pages are drawn with the standard Helvetica font so no font file is needed.
+The block kinds are encoded in the colors, which the stand-in layout model reads
+back: body text is black, titles are dark gray, equations are blue and tables
+are drawn in red.
+"""
+
+import random
+from typing import List, Tuple
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+MARGIN = 72
+
+BLACK = (0, 0, 0)
+GRAY = (0.25, 0.25, 0.25)
+BLUE = (0, 0, 1)
+RED = (1, 0, 0)
+
+WORDS = (
+    "layout analysis document page block text table figure caption equation model "
+    "detection recognition reading order column paragraph result method dataset "
+    "section value number system process sample image region line word character"
+).split()
+
+EQUATIONS = ["E = mc^2", "a^2 + b^2 = c^2", "f(x) = sum x_i w_i", "p(y|x) = softmax(Wx + b)"]
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+class _PageWriter(object):
+    def __init__(self) -> None:
+        self.ops: List[str] = []
+
+    def text(self, x: float, y: float, size: float, text: str, color: Tuple[float, float, float] = BLACK) -> None:
+        r, g, b = color
+        self.ops.append(f"BT {r} {g} {b} rg /F1 {size} Tf {x:.2f} {y:.2f} Td ({_escape(text)}) Tj ET")
+
+    def rect(self, x: float, y: float, w: float, h: float, color: Tuple[float, float, float] = BLACK) -> None:
+        r, g, b = color
+        self.ops.append(f"{r} {g} {b} RG 1 w {x:.2f} {y:.2f} {w:.2f} {h:.2f} re S")
+
+    @property
+    def content(self) -> bytes:
+        return ("\n".join(self.ops) + "\n").encode("latin-1")
+
+
+def _sentence(rng: random.Random, chars: int) -> str:
+    words = []
+    while sum(len(word) + 1 for word in words) < chars:
+        words.append(rng.choice(WORDS))
+    return " ".join(words)
+
+
+def _paragraph(
+    page: _PageWriter, rng: random.Random, x: float, y: float, width: float, lines: int,
+    size: float = 10, inline_equation: bool = False,
+) -> float:
+    """
+    Draw a paragraph with its first baseline at y and return the y below it.
+    """
+    leading = size * 1.4
+    chars = int(width / (size * 0.5))
+    for line_i in range(lines):
+        if inline_equation and line_i == lines // 2:
+            head = _sentence(rng, chars // 3)
+            equation = rng.choice(EQUATIONS)
+            page.text(x, y, size, head)
+            eq_x = x + len(head) * size * 0.5 + size
+            page.text(eq_x, y, size, equation, BLUE)
+            page.text(eq_x + len(equation) * size * 0.5 + size, y, size, _sentence(rng, chars // 4))
+        else:
+            page.text(x, y, size, _sentence(rng, chars if line_i < lines - 1 else chars // 2))
+        y -= leading
+    return y - leading * 1.5
+
+
+def _table(page: _PageWriter, rng: random.Random, x: float, y: float, width: float, rows: int, cols: int) -> float:
+    row_height = 16
+    cell_width = width / cols
+    for row_i in range(rows):
+        for col_i in range(cols):
+            cell_x = x + col_i * cell_width
+            cell_y = y - (row_i + 1) * row_height
+            page.rect(cell_x, cell_y, cell_width, row_height, RED)
+            page.text(cell_x + 3, cell_y + 4, 8, _sentence(rng, int(cell_width / 5) - 2)[:12], RED)
+    return y - rows * row_height - 30
+
+
+def _report_page(rng: random.Random, page_i: int) -> _PageWriter:
+    page = _PageWriter()
+    width = PAGE_WIDTH - 2 * MARGIN
+    y = PAGE_HEIGHT - MARGIN
+    page.text(MARGIN, y, 18, f"Section {page_i + 1} " + _sentence(rng, 20).title(), GRAY)
+    y -= 40
+    while y > MARGIN + 120:
+        if rng.random() < 0.2:
+            y = _table(page, rng, MARGIN, y, width, rng.randint(3, 5), rng.randint(3, 4))
+        else:
+            y = _paragraph(page, rng, MARGIN, y, width, rng.randint(3, 6))
+    return page
+
+
+def _paper_page(rng: random.Random, page_i: int) -> _PageWriter:
+    page = _PageWriter()
+    y = PAGE_HEIGHT - MARGIN
+    if page_i == 0:
+        page.text(MARGIN, y, 18, _sentence(rng, 40).title(), GRAY)
+        y -= 40
+    gutter = 24
+    column_width = (PAGE_WIDTH - 2 * MARGIN - gutter) / 2
+    for column_i in range(2):
+        x = MARGIN + column_i * (column_width + gutter)
+        column_y = y
+        while column_y > MARGIN + 100:
+            choice = rng.random()
+            if choice < 0.15:
+                page.text(x + column_width / 4, column_y, 10, rng.choice(EQUATIONS), BLUE)
+                column_y -= 36
+            elif choice < 0.25:
+                column_y = _table(page, rng, x, column_y, column_width, 4, 3)
+            else:
+                column_y = _paragraph(
+                    page, rng, x, column_y, column_width, rng.randint(3, 7), size=9,
+                    inline_equation=rng.random() < 0.3,
+                )
+    return page
+
+
+def _book_page(rng: random.Random, page_i: int) -> _PageWriter:
+    page = _PageWriter()
+    width = PAGE_WIDTH - 2 * MARGIN
+    y = PAGE_HEIGHT - MARGIN
+    if page_i % 5 == 0:
+        page.text(MARGIN, y, 20, f"Chapter {page_i // 5 + 1}", GRAY)
+        y -= 48
+    while y > MARGIN + 80:
+        y = _paragraph(page, rng, MARGIN, y, width, rng.randint(6, 10), size=11)
+    return page
+
+
+PAGE_GENERATORS = {
+    "report": _report_page,
+    "paper": _paper_page,
+    "book": _book_page,
+}
+
+
+def write_synthetic_pdf(path: str, mode: str, pages: int = 10, seed: int = 0) -> None:
+    """
+    Write a pages long PDF in the style of mode ("report", "paper" or "book").
+    The same mode, pages and seed always give the same file.
+    """
+    if mode not in PAGE_GENERATORS:
+        raise Exception(f"Unsupported mode: {mode}")
+    rng = random.Random(f"{mode}-{seed}")
+    contents = [PAGE_GENERATORS[mode](rng, page_i).content for page_i in range(pages)]
+
+    objs = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{3 + 2 * page_i} 0 R" for page_i in range(pages))
+    objs.append(f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode())
+    font_id = 3 + 2 * pages
+    for page_i, content in enumerate(contents):
+        objs.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {4 + 2 * page_i} 0 R >>".encode()
+        )
+        objs.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"endstream")
+    objs.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for obj_i, obj in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % obj_i + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
@@ -0,0 +1,166 @@
+"""
+Accuracy and latency of the TexTeller recognition backends.
+
+Every backend (pytorch, onnx, onnx-int8, see TexTellerTexOCRConfig.backend)
+recognizes the same formula crops through TexTellerTexOCRModel.recognize_batch,
+after one warm-up batch. The crops are either the Equation and EmbedEq blocks of
+a synthetic paper PDF, or the images of --images with the reference LaTeX of
+--labels, a JSON lines file of {"image": file name, "latex": reference}. Accuracy
+is the exact match rate and the mean normalized edit similarity to the
+reference. Without labels the output of the first backend is the reference, so
+the numbers measure how far the other backends drift from it. The backends are
+the real models, so this needs torch, transformers and optimum, and the weights.
+
+    python -m latyas.benchmarks.texteller_backend_benchmark --pages 3
+    python -m latyas.benchmarks.texteller_backend_benchmark --images crops --labels labels.jsonl --json out.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+import pypdfium2
+
+from latyas.benchmarks.standin_models import StandInLayoutModel
+from latyas.benchmarks.synthetic_pdf import write_synthetic_pdf
+from latyas.layout.block import BlockType
+from latyas.tex_ocr.models.texteller.texteller_ocr_config import TEXTELLER_BACKENDS
+from latyas.utils.text_utils import levenshtein_distance
+
+
+def synthetic_formulas(pdf_path: str, pages: int, render_scale: float) -> List[np.ndarray]:
+    """
+    The crops of the Equation and EmbedEq blocks of the first pages of a synthetic PDF.
+    """
+    layout_model = StandInLayoutModel(kinds={BlockType.Equation, BlockType.EmbedEq})
+    pdf = pypdfium2.PdfDocument(pdf_path)
+    crops = []
+    for page_number in range(min(pages, len(pdf))):
+        page = pdf[page_number]
+        page_img = page.render(scale=render_scale, rotation=0, rev_byteorder=True).to_numpy()
+        page_layout = layout_model.detect(page_img)
+        crops.extend(page_layout.crop_image(block).copy() for block in page_layout)
+        page.close()
+    pdf.close()
+    return [crop for crop in crops if crop.size > 0]
+
+
+def load_labelled_formulas(images_dir: str, labels_path: Optional[str]) -> Tuple[List[np.ndarray], Optional[List[str]]]:
+    """
+    The images of images_dir, RGB, with their references when labels_path is given.
+    """
+    if labels_path is None:
+        names = sorted(
+            name for name in os.listdir(images_dir) if name.lower().endswith((".png", ".jpg", ".jpeg", ".bmp"))
+        )
+        references = None
+    else:
+        names, references = [], []
+        with open(labels_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip() == "":
+                    continue
+                record = json.loads(line)
+                names.append(record["image"])
+                references.append(record["latex"])
+    images = []
+    for name in names:
+        image = cv2.imread(os.path.join(images_dir, name), cv2.IMREAD_COLOR)
+        if image is None:
+            raise Exception(f"Cannot read the image {name}")
+        images.append(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    return images, references
+
+
+def similarity(text: str, reference: str) -> float:
+    return 1.0 - levenshtein_distance(text, reference) / max(len(text), len(reference), 1)
+
+
+def run_backend(
+    backend: str, images: List[np.ndarray], batch_size: int, num_beam: int, runs: int
+) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Load the backend and time runs passes over images. Returns the timings and
+    the texts of the last pass.
+    """
+    from latyas.tex_ocr.models.texteller.texteller_ocr_model import TexTellerTexOCRModel
+
+    start = time.perf_counter()
+    model = TexTellerTexOCRModel.from_pretrained("OleehyO/TexTeller", backend=backend)
+    load_seconds = time.perf_counter() - start
+    model.recognize_batch(images[:batch_size], num_beam=num_beam, batch_size=batch_size)
+
+    times = []
+    texts: List[str] = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        texts = model.recognize_batch(images, num_beam=num_beam, batch_size=batch_size)
+        times.append(time.perf_counter() - start)
+    seconds = statistics.median(times)
+    return {
+        "backend": backend,
+        "load_s": load_seconds,
+        "ms_per_formula": seconds * 1000 / len(images),
+        "formulas_per_s": len(images) / seconds,
+    }, texts
+
+
+def compare(backends: List[str], images: List[np.ndarray], references: Optional[List[str]], **kwargs) -> List[Dict[str, Any]]:
+    results = []
+    for backend in backends:
+        result, texts = run_backend(backend, images, **kwargs)
+        if references is None:
+            # The first backend is the reference of the others
+            references = texts
+            result["reference"] = backend
+        result["exact"] = float(np.mean([text == reference for text, reference in zip(texts, references)]))
+        result["similarity"] = float(np.mean([similarity(text, reference) for text, reference in zip(texts, references)]))
+        results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the accuracy and latency of the TexTeller backends.")
+    parser.add_argument("--backends", type=str, nargs="+", default=list(TEXTELLER_BACKENDS), choices=TEXTELLER_BACKENDS)
+    parser.add_argument("--images", type=str, default=None, help="directory of formula images")
+    parser.add_argument("--labels", type=str, default=None, help="JSON lines of {\"image\", \"latex\"}")
+    parser.add_argument("--pages", type=int, default=3, help="synthetic pages, without --images")
+    parser.add_argument("--scale", type=float, default=2)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--num-beam", type=int, default=5)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--work-dir", type=str, default=None)
+    parser.add_argument("--json", type=str, default=None, help="also write the results to this file")
+    args = parser.parse_args()
+
+    if args.images is not None:
+        images, references = load_labelled_formulas(args.images, args.labels)
+    else:
+        work_dir = args.work_dir or os.path.join(tempfile.gettempdir(), "latyas-benchmarks")
+        os.makedirs(work_dir, exist_ok=True)
+        pdf_path = os.path.join(work_dir, f"paper-{args.pages}-0.pdf")
+        if not os.path.exists(pdf_path):
+            write_synthetic_pdf(pdf_path, "paper", pages=args.pages)
+        images, references = synthetic_formulas(pdf_path, args.pages, args.scale), None
+    if len(images) == 0:
+        raise Exception("No formula images to recognize.")
+
+    results = compare(
+        args.backends, images, references, batch_size=args.batch_size, num_beam=args.num_beam, runs=args.runs
+    )
+    print(f"{len(images)} formulas, reference: {'labels' if references is not None else args.backends[0]}")
+    print(f"{'backend':<10} {'load s':>7} {'ms/formula':>11} {'formulas/s':>11} {'exact':>6} {'similarity':>11}")
+    for result in results:
+        print(
+            f"{result['backend']:<10} {result['load_s']:>7.1f} {result['ms_per_formula']:>11.1f} "
+            f"{result['formulas_per_s']:>11.2f} {result['exact']:>6.2f} {result['similarity']:>11.3f}"
+        )
+    if args.json is not None:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"formulas": len(images), "results": results}, f, indent=2)
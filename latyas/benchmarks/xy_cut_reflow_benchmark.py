@@ -0,0 +1,196 @@
+"""
+Benchmark of xy_cut_reflow on synthetic pages with 50 to 2,000 boxes.
+
+The projection-profile implementation is checked against the original
+recursive XY-cut, kept here as the reference, on both scattered boxes and
+multi-column pages where many boxes share edges.
+
+    python -m latyas.benchmarks.xy_cut_reflow_benchmark --sizes 50 200 500 1000 2000
+"""
+
+import argparse
+import random
+import time
+from typing import List, Union
+
+from latyas.layout.block import Block, BlockType
+from latyas.layout.layout import Layout
+from latyas.layout.reflow.position_based.xy_cut_reflow import (
+    horizontal_overlap,
+    simple_position_reflow,
+    vertical_overlap,
+    xy_cut_reflow,
+)
+from latyas.layout.shape import Rectangle
+
+
+def horizontal_region_reference(
+    page_layout: Union[Layout, List[Block]],
+    bboxs: List[int],
+    margin: float = 0.0,
+    depth: int = 0,
+    max_depth: int = 4,
+) -> List[int]:
+    if len(bboxs) <= 1:
+        return bboxs
+    if depth > max_depth:
+        return simple_position_reflow(page_layout, bboxs)
+
+    possible_x_list = []
+    for bbox_i in bboxs:
+        bbox = page_layout[bbox_i].shape.boundingbox
+        possible_x_list.extend([bbox[0] - margin, bbox[2] + margin])
+    possible_x_list = sorted(possible_x_list)
+
+    sorted_bboxs = []
+    rest_bboxs = bboxs
+    for possible_x in possible_x_list:
+        l, r, o = horizontal_overlap(page_layout, rest_bboxs, possible_x)
+        if len(o) == 0:
+            if len(l) == 0:
+                continue
+
+            # print(f"possible x: {possible_x}")
+            sorted_bboxs.extend(
+                vertical_region_reference(
+                    page_layout,
+                    l,
+                    margin=margin - depth * (margin / max_depth),
+                    depth=depth + 1,
+                    max_depth=max_depth,
+                )
+            )
+            rest_bboxs = r
+    sorted_bboxs.extend(
+        vertical_region_reference(
+            page_layout,
+            rest_bboxs,
+            margin=margin - depth * (margin / max_depth),
+            depth=depth + 1,
+            max_depth=max_depth,
+        )
+    )
+    return sorted_bboxs
+
+
+def vertical_region_reference(
+    page_layout: Union[Layout, List[Block]],
+    bboxs: List[int],
+    margin: float = 0.0,
+    depth: int = 0,
+    max_depth: int = 4,
+) -> List[int]:
+    if len(bboxs) <= 1:
+        return bboxs
+    if depth > max_depth:
+        return simple_position_reflow(page_layout, bboxs)
+
+    possible_y_list = []
+    for bbox_i in bboxs:
+        bbox = page_layout[bbox_i].shape.boundingbox
+        possible_y_list.extend([bbox[1] - margin, bbox[3] + margin])
+    possible_y_list = sorted(possible_y_list)
+
+    sorted_bboxs = []
+    rest_bboxs = bboxs
+    for possible_y in possible_y_list:
+        t, b, o = vertical_overlap(page_layout, rest_bboxs, possible_y)
+        if len(o) == 0:
+            if len(t) == 0:
+                continue
+
+            # print(f"possible y: {possible_y}")
+            sorted_bboxs.extend(
+                horizontal_region_reference(
+                    page_layout,
+                    t,
+                    margin=margin - depth * (margin / max_depth),
+                    depth=depth + 1,
+                    max_depth=max_depth,
+                )
+            )
+            rest_bboxs = b
+
+    sorted_bboxs.extend(
+        horizontal_region_reference(
+            page_layout,
+            rest_bboxs,
+            margin=margin - depth * (margin / max_depth),
+            depth=depth + 1,
+            max_depth=max_depth,
+        )
+    )
+    return sorted_bboxs
+
+
+def xy_cut_reflow_reference(
+    page_layout: Union[Layout, List[Block]], margin: float = 10, horizontal_first: bool=True
+) -> List[int]:
+    # page_img = page_layout._page
+    # page_shape = page_img.shape  # (h, w, c)
+    bboxs = []
+    for bbox_i in range(len(page_layout)):
+        bboxs.append(bbox_i)
+
+    if horizontal_first:
+        out = horizontal_region_reference(page_layout, bboxs, margin=margin, depth=0, max_depth=8)
+    else:
+        out = vertical_region_reference(page_layout, bboxs, margin=margin, depth=0, max_depth=8)
+    return out
+
+
+def random_layout(n: int, seed: int = 0, columns: bool = False, width: float = 1240, height: float = 1754) -> Layout:
+    """
+    A page with n boxes. With columns the boxes snap to a three column grid so that
+    the cuts fall on shared edges.
+    """
+    rng = random.Random(seed)
+    blocks = []
+    for _ in range(n):
+        if columns:
+            x_1 = rng.randrange(3) * width / 3 + rng.choice([0, 0, 5])
+            y_1 = rng.randrange(max(n // 3, 1)) * height / max(n // 3, 1) + rng.choice([0, 0, 3])
+            rect = Rectangle(x_1, y_1, x_1 + rng.choice([width / 3 - 20, width * 2 / 3 - 20]), y_1 + rng.choice([10, 30]))
+        else:
+            x_1, y_1 = rng.uniform(0, width), rng.uniform(0, height)
+            rect = Rectangle(x_1, y_1, x_1 + rng.uniform(5, width / 3), y_1 + rng.uniform(5, height / 20))
+        blocks.append(Block(rect, BlockType.Text))
+    return Layout(blocks=blocks)
+
+
+def run(sizes: List[int], repeat: int = 3, seed: int = 0, max_reference_size: int = 1000) -> None:
+    print(f"{'boxes':>6} {'page':>9} {'reference ms':>13} {'projection ms':>14} {'speedup':>8}")
+    for n in sizes:
+        for columns in (False, True):
+            layout = random_layout(n, seed, columns=columns)
+            projection_time = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                projection = xy_cut_reflow(layout)
+                projection_time = min(projection_time, time.perf_counter() - start)
+
+            page = "columns" if columns else "scattered"
+            if n > max_reference_size:
+                print(f"{n:>6} {page:>9} {'-':>13} {projection_time * 1000:>14.2f} {'-':>8}")
+                continue
+            start = time.perf_counter()
+            reference = xy_cut_reflow_reference(layout)
+            reference_time = time.perf_counter() - start
+            if reference != projection:
+                raise Exception(f"Reading order differs for {n} {page} boxes")
+            print(
+                f"{n:>6} {page:>9} {reference_time * 1000:>13.2f} "
+                f"{projection_time * 1000:>14.2f} {reference_time / projection_time:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark xy_cut_reflow.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 500, 1000, 2000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--max-reference-size", type=int, default=1000, help="skip the reference above this many boxes"
+    )
+    args = parser.parse_args()
+    run(args.sizes, repeat=args.repeat, seed=args.seed, max_reference_size=args.max_reference_size)
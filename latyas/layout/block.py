@@ -1,5 +1,5 @@
-from typing import Optional, Union
-from latyas.layout.shape import Shape
+from typing import Any, Dict, List, Optional, Union
+from latyas.layout.shape import Rectangle, Shape
 
 import copy
 from enum import Enum
@@ -127,6 +127,8 @@ class Block(object):
         self._kind = kind
         self._text: Optional[str] = None
         self._has_equation: bool = False
+        # EmbedEq boxes inside a text block, in page coordinates
+        self._equations: List[Shape] = []
 
     @property
     def shape(self) -> Shape:
@@ -144,9 +146,16 @@ class Block(object):
     def has_equation(self) -> bool:
         return self._has_equation
 
+    @property
+    def equations(self) -> List[Shape]:
+        return self._equations
+
     def set_text(self, text: str):
         self._text = text
 
+    def set_equations(self, equations: List[Shape]):
+        self._equations = list(equations)
+
     def set_shape(self, shape: Shape):
         self._shape = shape
 
@@ -156,8 +165,28 @@ class Block(object):
             kind=self._kind,
         )
         copy_block._text = self._text
+        copy_block._equations = copy.deepcopy(self._equations)
         return copy_block
 
+    def to_dict(self) -> Dict[str, Any]:
+        if not isinstance(self.shape, Rectangle):
+            raise Exception("Only rectangle blocks can be serialized.")
+        return {
+            "kind": self.kind.name,
+            "bbox": [float(v) for v in self.shape.boundingbox],
+            "text": self.text,
+            "has_equation": self.has_equation,
+            "equations": [[float(v) for v in equation.boundingbox] for equation in self.equations],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Block":
+        block = cls(shape=Rectangle(*data["bbox"]), kind=BlockType[data["kind"]])
+        block._text = data["text"]
+        block._has_equation = data["has_equation"]
+        block._equations = [Rectangle(*bbox) for bbox in data.get("equations", [])]
+        return block
+
     def __str__(self):
         return f"Block(shape={self._shape}, kind={self._kind}, text={self._text}, equation={self._has_equation})"
 
@@ -0,0 +1,222 @@
+from typing import Generator, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from latyas.layout.block import Block, BlockType
+from latyas.layout.shape import Rectangle
+
+
+class BlockColumns(object):
+    """
+    Struct-of-arrays storage for the blocks of a layout.
+
+    The boxes are kept in a float32 (N, 4) array of x_1, y_1, x_2, y_2, the kinds in
+    a uint8 array of BlockType values and the texts and embedded equation boxes in
+    object arrays. It behaves
+    like the list of blocks a Layout normally holds: indexing and iteration return
+    BlockView objects that read and write the arrays in place. Views address rows
+    by position, so views taken before an insert or removal must not be reused.
+    """
+
+    def __init__(
+        self,
+        boxes: np.ndarray,
+        kinds: np.ndarray,
+        texts: Optional[np.ndarray] = None,
+        has_equation: Optional[np.ndarray] = None,
+        equations: Optional[np.ndarray] = None,
+    ) -> None:
+        self.boxes = np.ascontiguousarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.kinds = np.ascontiguousarray(kinds, dtype=np.uint8).reshape(-1)
+        n = self.boxes.shape[0]
+        if self.kinds.shape[0] != n:
+            raise Exception("The number of kinds does not match the number of boxes.")
+        if texts is None:
+            texts = np.full((n,), None, dtype=object)
+        self.texts = np.asarray(texts, dtype=object).reshape(-1)
+        if has_equation is None:
+            has_equation = np.zeros((n,), dtype=bool)
+        self.has_equation = np.asarray(has_equation, dtype=bool).reshape(-1)
+        # None stands for no equations, so the rows of a fresh layout share nothing
+        if equations is None:
+            equations = np.full((n,), None, dtype=object)
+        self.equations = np.asarray(equations, dtype=object).reshape(-1)
+
+    @classmethod
+    def from_blocks(cls, blocks: Iterable[Block]) -> "BlockColumns":
+        blocks = list(blocks)
+        for block in blocks:
+            if not isinstance(block.shape, Rectangle):
+                raise Exception("Only rectangle blocks can be stored in columns.")
+        texts = np.empty((len(blocks),), dtype=object)
+        texts[:] = [block.text for block in blocks]
+        equations = np.full((len(blocks),), None, dtype=object)
+        for i, block in enumerate(blocks):
+            if len(block.equations) > 0:
+                equations[i] = list(block.equations)
+        return cls(
+            boxes=np.array([block.shape.boundingbox for block in blocks], dtype=np.float32),
+            kinds=np.array([block.kind.value for block in blocks], dtype=np.uint8),
+            texts=texts,
+            has_equation=np.array([block.has_equation for block in blocks], dtype=bool),
+            equations=equations,
+        )
+
+    def to_blocks(self) -> List[Block]:
+        return [self[i].copy() for i in range(len(self))]
+
+    def copy(self) -> "BlockColumns":
+        equations = np.full((len(self),), None, dtype=object)
+        for i, row in enumerate(self.equations):
+            if row is not None:
+                equations[i] = list(row)
+        return BlockColumns(
+            self.boxes.copy(), self.kinds.copy(), self.texts.copy(), self.has_equation.copy(), equations
+        )
+
+    def take(self, indices: Union[List[int], np.ndarray]) -> "BlockColumns":
+        indices = np.asarray(indices, dtype=np.int64)
+        return BlockColumns(
+            self.boxes[indices],
+            self.kinds[indices],
+            self.texts[indices],
+            self.has_equation[indices],
+            self.equations[indices],
+        )
+
+    def __len__(self) -> int:
+        return self.boxes.shape[0]
+
+    def __getitem__(self, key: Union[int, slice]) -> Union["BlockView", "BlockColumns"]:
+        if isinstance(key, slice):
+            return self.take(np.arange(len(self))[key])
+        if key < 0:
+            key += len(self)
+        if key < 0 or key >= len(self):
+            raise IndexError("block index out of range")
+        return BlockView(self, key)
+
+    def __setitem__(self, key: Union[int, slice], value: Union[Block, Iterable[Block]]) -> None:
+        if isinstance(key, slice):
+            if key != slice(None, None, None):
+                raise Exception("Only full slice assignment is supported.")
+            other = self._columns_of(value)
+            self.boxes, self.kinds, self.texts, self.has_equation, self.equations = (
+                other.boxes, other.kinds, other.texts, other.has_equation, other.equations
+            )
+            return
+        self._write_row(key, value)
+
+    def __delitem__(self, key: int) -> None:
+        self.pop(key)
+
+    def __iter__(self) -> Generator["BlockView", None, None]:
+        for i in range(len(self)):
+            yield BlockView(self, i)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, BlockColumns):
+            return False
+        return (
+            np.array_equal(self.boxes, other.boxes)
+            and np.array_equal(self.kinds, other.kinds)
+            and list(self.texts) == list(other.texts)
+        )
+
+    def insert(self, key: int, block: Block) -> None:
+        if key < 0:
+            key = max(len(self) + key, 0)
+        key = min(key, len(self))
+        other = BlockColumns.from_blocks([block])
+        self._concat([self.take(np.arange(key)), other, self.take(np.arange(key, len(self)))])
+
+    def append(self, block: Block) -> None:
+        self.insert(len(self), block)
+
+    def extend(self, blocks: Union["BlockColumns", Iterable[Block]]) -> None:
+        self._concat([self, self._columns_of(blocks)])
+
+    def pop(self, key: int = -1) -> Block:
+        block = self[key].copy()
+        if key < 0:
+            key += len(self)
+        keep = np.ones((len(self),), dtype=bool)
+        keep[key] = False
+        self._concat([self.take(np.nonzero(keep)[0])])
+        return block
+
+    def _write_row(self, i: int, block: Block) -> None:
+        self.boxes[i] = block.shape.boundingbox
+        self.kinds[i] = block.kind.value
+        self.texts[i] = block.text
+        self.has_equation[i] = block.has_equation
+        self.equations[i] = list(block.equations) if len(block.equations) > 0 else None
+
+    def _concat(self, parts: List["BlockColumns"]) -> None:
+        self.boxes = np.concatenate([part.boxes for part in parts], axis=0).reshape(-1, 4)
+        self.kinds = np.concatenate([part.kinds for part in parts])
+        self.texts = np.concatenate([part.texts for part in parts])
+        self.has_equation = np.concatenate([part.has_equation for part in parts])
+        self.equations = np.concatenate([part.equations for part in parts])
+
+    def _columns_of(self, blocks: Union["BlockColumns", Iterable[Block]]) -> "BlockColumns":
+        if isinstance(blocks, BlockColumns):
+            return blocks
+        blocks = list(blocks)
+        # Views of these columns, e.g. a reordering, are gathered without building blocks
+        if all(isinstance(block, BlockView) and block._columns is self for block in blocks):
+            return self.take([block._index for block in blocks])
+        return BlockColumns.from_blocks(blocks)
+
+
+class BlockView(Block):
+    """
+    A Block backed by one row of BlockColumns.
+    """
+
+    def __init__(self, columns: BlockColumns, index: int) -> None:
+        # Block.__init__ is not called, the attributes live in the columns
+        self._columns = columns
+        self._index = index
+
+    @property
+    def _shape(self) -> Rectangle:
+        x_1, y_1, x_2, y_2 = self._columns.boxes[self._index]
+        return Rectangle(float(x_1), float(y_1), float(x_2), float(y_2))
+
+    @_shape.setter
+    def _shape(self, shape: Rectangle) -> None:
+        self._columns.boxes[self._index] = shape.boundingbox
+
+    @property
+    def _kind(self) -> BlockType:
+        return BlockType(int(self._columns.kinds[self._index]))
+
+    @_kind.setter
+    def _kind(self, kind: BlockType) -> None:
+        self._columns.kinds[self._index] = kind.value
+
+    @property
+    def _text(self) -> Optional[str]:
+        return self._columns.texts[self._index]
+
+    @_text.setter
+    def _text(self, text: Optional[str]) -> None:
+        self._columns.texts[self._index] = text
+
+    @property
+    def _has_equation(self) -> bool:
+        return bool(self._columns.has_equation[self._index])
+
+    @_has_equation.setter
+    def _has_equation(self, has_equation: bool) -> None:
+        self._columns.has_equation[self._index] = has_equation
+
+    @property
+    def _equations(self) -> List[Rectangle]:
+        equations = self._columns.equations[self._index]
+        return [] if equations is None else equations
+
+    @_equations.setter
+    def _equations(self, equations: List[Rectangle]) -> None:
+        self._columns.equations[self._index] = list(equations) if len(equations) > 0 else None
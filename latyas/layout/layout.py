@@ -1,22 +1,64 @@
 import warnings
 import cv2
 import numpy as np
-from typing import Generator, List, Literal, Optional, Tuple, Union
+from typing import Any, Dict, Generator, List, Literal, Optional, Tuple, Union
 
 from latyas.layout.block import BLOCK_TYPE_COLOR_MAP, Block, BlockType, is_text_block
+from latyas.layout.columns import BlockColumns
 from latyas.layout.shape import Rectangle
 
+TEXT_BLOCK_VALUES = [kind.value for kind in BlockType if is_text_block(kind)]
+
+
+def _intersect_areas(box: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    intersect_w = np.clip(np.minimum(boxes[:, 2], box[2]) - np.maximum(boxes[:, 0], box[0]), 0, None)
+    intersect_h = np.clip(np.minimum(boxes[:, 3], box[3]) - np.maximum(boxes[:, 1], box[1]), 0, None)
+    return intersect_w * intersect_h
+
 
 class Layout(object):
     def __init__(
-        self, blocks: Optional[List] = None, page: Optional[np.ndarray] = None
+        self, blocks: Optional[Union[List, BlockColumns]] = None, page: Optional[np.ndarray] = None
     ) -> None:
         if blocks is None:
             blocks = []
-        self._blocks: List[Block] = blocks
+        self._blocks: Union[List[Block], BlockColumns] = blocks
         # TODO: if page is None
         self._page: np.ndarray = page
-    
+        # Set while the page may be seen by the caller or by another layout, mask_image and
+        # keep_image copy it first. A page passed in belongs to the caller.
+        self._page_shared = page is not None
+
+    @classmethod
+    def from_arrays(
+        cls,
+        boxes: np.ndarray,
+        kinds: np.ndarray,
+        texts: Optional[np.ndarray] = None,
+        page: Optional[np.ndarray] = None,
+    ) -> "Layout":
+        """
+        Build a layout backed by columns instead of a list of Block objects.
+        """
+        return cls(BlockColumns(boxes, kinds, texts), page)
+
+    @property
+    def is_columnar(self) -> bool:
+        return isinstance(self._blocks, BlockColumns)
+
+    def to_columnar(self) -> "Layout":
+        if self.is_columnar:
+            return self
+        return self.__class__(BlockColumns.from_blocks(self._blocks), self._page)
+
+    def to_arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return the boxes, kinds and texts of the blocks. The arrays of a columnar layout
+        are returned without copying, so writing to them changes the layout.
+        """
+        columns = self._blocks if self.is_columnar else BlockColumns.from_blocks(self._blocks)
+        return columns.boxes, columns.kinds, columns.texts
+
     @property
     def height(self) -> int:
         return self._page.shape[0]
@@ -56,16 +98,53 @@ class Layout(object):
             return False
     
     def copy(self) -> "Layout":
-        return Layout(
-            blocks=[block.copy() for block in self._blocks],
-            page=self._page.copy()
-        )
+        if self.is_columnar:
+            blocks = self._blocks.copy()
+        else:
+            blocks = [block.copy() for block in self._blocks]
+        # The page is shared until one of the two layouts draws on it
+        layout = Layout(blocks=blocks, page=self._page)
+        layout._page_shared = True
+        self._page_shared = True
+        return layout
     
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        The blocks and the page size, without the page image.
+        """
+        return {
+            "page_shape": None if self._page is None else list(self._page.shape),
+            "blocks": [block.to_dict() for block in self._blocks],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], page: Optional[np.ndarray] = None) -> "Layout":
+        """
+        Rebuild a layout saved with to_dict on top of page. Without a page it is a
+        read-only blank image of the original size, so the size is known but crops
+        are white. page itself is never drawn on.
+        """
+        if page is None and data["page_shape"] is not None:
+            page = np.broadcast_to(np.uint8(255), tuple(data["page_shape"]))
+        return cls(blocks=[Block.from_dict(block) for block in data["blocks"]], page=page)
+
     def insert(self, key: int, value: Block):
         self._blocks.insert(key, value)
 
     def merge(self, other: "Layout"):
-        self._blocks.extend(other._blocks)
+        if other.is_columnar and not self.is_columnar:
+            self._blocks.extend(other._blocks.to_blocks())
+        else:
+            self._blocks.extend(other._blocks)
+
+    def reorder(self, indices: List[int]):
+        """
+        Keep the blocks at indices, in that order.
+        """
+        if self.is_columnar:
+            self._blocks = self._blocks.take(indices)
+        else:
+            self._blocks = [self._blocks[i] for i in indices]
     
     def page_sort(self, reverse=False):
         """
@@ -81,55 +160,138 @@ class Layout(object):
                 ((x // sf[1], y // sf[0], x2 // sf[1], y2 // sf[0]), bbox_i)
             )
         sorted_bbox = sorted(sorted_bbox, key=lambda x: x[0], reverse=reverse)
-        self._blocks = [self._blocks[bbox_i] for k, bbox_i in sorted_bbox]
+        self.reorder([bbox_i for k, bbox_i in sorted_bbox])
 
     def remove_overlapping(self, area_threshold=0.5, strategy: Literal["keep_large", "keep_small", "merge"]="merge"):
-        to_remove = []
-        for block_i in range(len(self._blocks)):
-            if block_i in to_remove:
-                continue
-            for block_j in range(block_i + 1, len(self._blocks)):
-                block_lhs = self._blocks[block_i]
-                block_rhs = self._blocks[block_j]
-                if not isinstance(block_lhs.shape, Rectangle):
+        """
+        Remove the blocks overlapping by more than area_threshold of either block.
+        Only blocks of the same kind, or two text blocks, are compared. The pairs are
+        visited in the same order as a double loop over the blocks would visit them,
+        so the result does not depend on the vectorization.
+        """
+        if strategy not in ("keep_large", "keep_small", "merge"):
+            raise Exception("Unsupported overlapping strategy.")
+        n = len(self._blocks)
+        if n < 2:
+            return
+
+        if self.is_columnar:
+            valid = np.ones((n,), dtype=bool)
+            boxes = self._blocks.boxes.astype(np.float64)
+            kinds = self._blocks.kinds.astype(np.int64)
+        else:
+            valid = np.array([isinstance(block.shape, Rectangle) for block in self._blocks], dtype=bool)
+            boxes = np.array(
+                [block.shape.boundingbox if is_valid else (0, 0, 0, 0) for block, is_valid in zip(self._blocks, valid)],
+                dtype=np.float64,
+            )
+            kinds = np.array([block.kind.value for block in self._blocks], dtype=np.int64)
+        texts = np.isin(kinds, TEXT_BLOCK_VALUES)
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        removed = np.zeros((n,), dtype=bool)
+
+        if strategy == "merge":
+            # A merge grows the later block, so each row sees the boxes left by the previous rows
+            changed = np.zeros((n,), dtype=bool)
+            for block_i in range(n - 1):
+                if not valid[block_i]:
+                    continue
+                rest = slice(block_i + 1, n)
+                intersect_area = _intersect_areas(boxes[block_i], boxes[rest])
+                hits = valid[rest] & (
+                    (kinds[rest] == kinds[block_i]) | (texts[rest] & texts[block_i])
+                ) & (
+                    (intersect_area > area_threshold * areas[block_i])
+                    | (intersect_area > area_threshold * areas[rest])
+                )
+                if not hits.any():
                     continue
-                if not isinstance(block_rhs.shape, Rectangle):
+                removed[block_i] = True
+                hit_indices = np.nonzero(hits)[0] + block_i + 1
+                boxes[hit_indices, :2] = np.minimum(boxes[hit_indices, :2], boxes[block_i, :2])
+                boxes[hit_indices, 2:] = np.maximum(boxes[hit_indices, 2:], boxes[block_i, 2:])
+                areas[hit_indices] = (boxes[hit_indices, 2] - boxes[hit_indices, 0]) * (
+                    boxes[hit_indices, 3] - boxes[hit_indices, 1]
+                )
+                kinds[hit_indices] = np.maximum(kinds[hit_indices], kinds[block_i])
+                texts[hit_indices] = np.isin(kinds[hit_indices], TEXT_BLOCK_VALUES)
+                changed[hit_indices] = True
+
+            if self.is_columnar:
+                self._blocks.boxes[changed] = boxes[changed]
+                self._blocks.kinds[changed] = kinds[changed]
+            else:
+                for block_i in np.nonzero(changed)[0]:
+                    block = self._blocks[block_i]
+                    block._kind = BlockType(int(kinds[block_i]))
+                    block.set_shape(Rectangle(*(float(v) for v in boxes[block_i])))
+        else:
+            # Nothing is modified, so the whole pairwise overlap matrix is computed at once
+            x_1, y_1, x_2, y_2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+            intersect_w = np.clip(np.minimum(x_2[:, None], x_2[None, :]) - np.maximum(x_1[:, None], x_1[None, :]), 0, None)
+            intersect_h = np.clip(np.minimum(y_2[:, None], y_2[None, :]) - np.maximum(y_1[:, None], y_1[None, :]), 0, None)
+            intersect_area = intersect_w * intersect_h
+            hits = (
+                np.triu(np.ones((n, n), dtype=bool), k=1)
+                & (valid[:, None] & valid[None, :])
+                & ((kinds[:, None] == kinds[None, :]) | (texts[:, None] & texts[None, :]))
+                & (
+                    (intersect_area > area_threshold * areas[:, None])
+                    | (intersect_area > area_threshold * areas[None, :])
+                )
+            )
+            if strategy == "keep_large":
+                remove_rhs = areas[:, None] > areas[None, :]
+            else:
+                remove_rhs = areas[:, None] < areas[None, :]
+
+            # A block removed by an earlier row does not get to remove others
+            for block_i in np.nonzero(hits.any(axis=1))[0]:
+                if removed[block_i]:
                     continue
-                
-                if block_lhs.kind != block_rhs.kind:
-                    if not (is_text_block(block_lhs.kind) and is_text_block(block_rhs.kind)):
-                        continue
-
-                intersect_rect = block_lhs.shape.intersect(block_rhs.shape)
-                if (
-                    intersect_rect.area > area_threshold * block_lhs.shape.area
-                    or intersect_rect.area > area_threshold * block_rhs.shape.area
-                ):
-                    if strategy == "keep_large":
-                        if block_lhs.shape.area > block_rhs.shape.area:
-                            to_remove.append(block_j)
-                        else:
-                            to_remove.append(block_i)
-                    elif strategy == "keep_small":
-                        if block_lhs.shape.area < block_rhs.shape.area:
-                            to_remove.append(block_j)
-                        else:
-                            to_remove.append(block_i)
-                    elif strategy == "merge":
-                        to_remove.append(block_i)
-                        if block_lhs.kind.value > block_rhs.kind.value:
-                            merge_kind = block_lhs.kind
-                        else:
-                            merge_kind = block_rhs.kind
-                        self._blocks[block_j]._kind = merge_kind
-                        union_shape = block_lhs.shape.union(block_rhs.shape)
-                        self._blocks[block_j].set_shape(union_shape)
-                    else:
-                        raise Exception("Unsupported overlapping strategy.")
-
-        to_remove = sorted(list(set(to_remove)))
-        for block_i in reversed(to_remove):
-            self._blocks.pop(block_i)
+                row_hits = hits[block_i]
+                removed |= row_hits & remove_rhs[block_i]
+                if (row_hits & ~remove_rhs[block_i]).any():
+                    removed[block_i] = True
+
+        if self.is_columnar:
+            self._blocks = self._blocks.take(np.nonzero(~removed)[0])
+        else:
+            self._blocks[:] = [block for block, is_removed in zip(self._blocks, removed) if not is_removed]
+
+    def embedded_equations(self, margin: float = 20) -> Dict[int, List[int]]:
+        """
+        Map the index of every text block holding EmbedEq blocks to the indices of
+        those EmbedEq blocks, in block order. Containment is Rectangle.is_inside
+        with margin, tested for all text and EmbedEq boxes in one broadcast.
+        """
+        if self.is_columnar:
+            valid = np.ones((len(self._blocks),), dtype=bool)
+            boxes = self._blocks.boxes.astype(np.float64)
+            kinds = self._blocks.kinds.astype(np.int64)
+        else:
+            valid = np.array([isinstance(block.shape, Rectangle) for block in self._blocks], dtype=bool)
+            boxes = np.array(
+                [block.shape.boundingbox if is_valid else (0, 0, 0, 0) for block, is_valid in zip(self._blocks, valid)],
+                dtype=np.float64,
+            ).reshape(-1, 4)
+            kinds = np.array([block.kind.value for block in self._blocks], dtype=np.int64)
+        text_indices = np.nonzero(valid & np.isin(kinds, TEXT_BLOCK_VALUES))[0]
+        equation_indices = np.nonzero(valid & (kinds == BlockType.EmbedEq.value))[0]
+        if len(text_indices) == 0 or len(equation_indices) == 0:
+            return {}
+
+        texts, equations = boxes[text_indices], boxes[equation_indices]
+        inside = (
+            (equations[None, :, 0] >= texts[:, None, 0] - margin)
+            & (equations[None, :, 1] >= texts[:, None, 1] - margin)
+            & (equations[None, :, 2] <= texts[:, None, 2] + margin)
+            & (equations[None, :, 3] <= texts[:, None, 3] + margin)
+        )
+        return {
+            int(text_indices[row]): [int(i) for i in equation_indices[np.nonzero(inside[row])[0]]]
+            for row in np.nonzero(inside.any(axis=1))[0]
+        }
 
     def crop_image(self, block: Block) -> Optional[np.ndarray]:
         if self._page is None:
@@ -139,9 +301,15 @@ class Layout(object):
         bbox_image = self._page[y1:y2, x1:x2]
         return bbox_image
     
+    def _own_page(self) -> None:
+        if self._page_shared or not self._page.flags.writeable:
+            self._page = self._page.copy()
+            self._page_shared = False
+
     def mask_image(self, block: Block, color: Union[str, Tuple[int, int, int]] = (255, 255, 255)):
         if self._page is None:
             return None
+        self._own_page()
         x1, y1, x2, y2 = block.shape.boundingbox
         x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
         self._page[y1:y2, x1:x2, :] = color # TODO: support hex color
@@ -151,9 +319,18 @@ class Layout(object):
             return None
         x1, y1, x2, y2 = block.shape.boundingbox
         x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
-        blank_page = np.full_like(self._page, fill_value=color)
-        blank_page[y1:y2, x1:x2, :] = self._page[y1:y2, x1:x2, :]
-        self._page = blank_page
+        if self._page_shared or not self._page.flags.writeable:
+            blank_page = np.full_like(self._page, fill_value=color)
+            blank_page[y1:y2, x1:x2, :] = self._page[y1:y2, x1:x2, :]
+            self._page = blank_page
+            self._page_shared = False
+            return
+        # The page is our own copy, blank everything around the block in place
+        x1, y1 = max(x1, 0), max(y1, 0)
+        self._page[:y1] = color
+        self._page[y2:] = color
+        self._page[y1:y2, :x1] = color
+        self._page[y1:y2, x2:] = color
 
     def draw_bboxs(self, bboxs: List[Rectangle], thickness=2) -> np.ndarray:
         vis = self._page.copy()
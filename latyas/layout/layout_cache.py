@@ -0,0 +1,24 @@
+import json
+from typing import Optional
+
+import numpy as np
+
+from latyas.layout.layout import Layout
+from latyas.utils.cache import TieredCache
+
+
+class LayoutCache(TieredCache):
+    """
+    Cache of the merged and deduplicated page layouts, before any OCR. Only the
+    blocks are stored; a cached layout is rebuilt on top of the freshly rendered
+    page image so that the OCR stages can still crop it.
+    """
+
+    def get_layout(self, key: str, page_img: np.ndarray) -> Optional[Layout]:
+        value = self.get(key)
+        if value is None:
+            return None
+        return Layout.from_dict(json.loads(value), page=page_img)
+
+    def put_layout(self, key: str, page_layout: Layout) -> None:
+        self.put(key, json.dumps(page_layout.to_dict(), ensure_ascii=False))
@@ -14,7 +14,7 @@
 import numpy as np
 from PIL import Image
 from abc import ABC, abstractmethod
-from typing import Union
+from typing import List, Union
 
 from latyas.layout.layout import Layout
 from latyas.models.latyas_model import LatyasModel
@@ -27,3 +27,12 @@ class LayoutModel(LatyasModel):
     @abstractmethod
     def detect(self, image: Union["np.ndarray", "Image.Image"]) -> Layout:
         pass
+
+    def detect_batch(
+        self, images: List[Union["np.ndarray", "Image.Image"]], batch_size: int = 8
+    ) -> List[Layout]:
+        """
+        Detect the layouts of several pages. Models without native batching
+        fall back to one detect call per image.
+        """
+        return [self.detect(image) for image in images]
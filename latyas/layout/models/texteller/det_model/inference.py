@@ -5,7 +5,7 @@ import numpy as np
 import cv2
 
 from tqdm import tqdm
-from typing import List, Union
+from typing import List, Optional, Union
 from .preprocess import Compose
 from .Bbox import Bbox
 
@@ -174,8 +174,9 @@ def predict_image(imgsave_dir, infer_config, predictor, img_list):
     print(errImgList)
 
 
-def predict(img_path: Union[str, np.ndarray], predictor, infer_config) -> List[Bbox]:
-    transforms = Compose(infer_config.preprocess_infos)
+def predict(img_path: Union[str, np.ndarray], predictor, infer_config, transforms: Optional[Compose] = None) -> List[Bbox]:
+    if transforms is None:
+        transforms = Compose(infer_config.preprocess_infos)
     inputs = transforms(img_path)
     inputs_name = [var.name for var in predictor.get_inputs()]
     inputs = {k: inputs[k][None, ] for k in inputs_name}
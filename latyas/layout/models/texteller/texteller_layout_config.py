@@ -13,12 +13,20 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 from latyas.layout.models.layout_config import LayoutConfig
 
+# The formula detector used by the TexTeller layout and TexOCR models
+TEXTELLER_DETECT_REPO = "XiaHan19/texteller_rtdetr_r50vd_6x_coco"
+
 
 class TexTellerLayoutConfig(LayoutConfig):
     model_type: str = "TexTellerLayoutModel"
     cfg_name: str
-    weights_name: str
\ No newline at end of file
+    weights_name: str
+    # onnxruntime session options, shared by every detect call of the model
+    providers: Optional[List[str]] = None
+    graph_optimization_level: str = "all"
+    intra_op_num_threads: int = 0
+    inter_op_num_threads: int = 0
@@ -15,14 +15,16 @@
 import os
 import numpy as np
 from PIL import Image
-from typing import Optional, Union
+from typing import List, Optional, Union
 from latyas.layout.block import Block, BlockType
 from latyas.layout.layout import Layout
 from latyas.layout.models.layout_config import LayoutConfig
 from latyas.layout.models.layout_model import LayoutModel
 
-from onnxruntime import InferenceSession
+from onnxruntime import GraphOptimizationLevel, InferenceSession, SessionOptions
+from .det_model.Bbox import Bbox
 from .det_model.inference import PredictConfig
+from .det_model.preprocess import Compose
 from .thrid_party.paddleocr.infer import predict_det, predict_rec
 from .det_model.inference import predict as latex_det_predict
 
@@ -32,6 +34,14 @@ from latyas.layout.shape import Rectangle
 
 from .texteller_layout_config import TexTellerLayoutConfig
 
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+
 class TexTellerLayoutModel(LayoutModel):
     def __init__(self, config: TexTellerLayoutConfig) -> None:
         self.config = config
@@ -48,6 +58,23 @@ class TexTellerLayoutModel(LayoutModel):
         else:
             self.weights_path = hf_hub_download(repo_id=self._name_or_path, filename=self._weights_name, revision=self.config._revision)
 
+        # Parse the predict config and build the onnx session once, every detect call reuses them
+        self.infer_config = PredictConfig(self.cfg_path)
+        self.transforms = Compose(self.infer_config.preprocess_infos)
+        self.session = self._build_session()
+
+    def _build_session(self) -> InferenceSession:
+        level = self.config.graph_optimization_level
+        if level not in GRAPH_OPTIMIZATION_LEVELS:
+            raise Exception(f"Unsupported graph optimization level: {level}")
+        sess_options = SessionOptions()
+        sess_options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[level]
+        sess_options.intra_op_num_threads = self.config.intra_op_num_threads
+        sess_options.inter_op_num_threads = self.config.inter_op_num_threads
+        return InferenceSession(
+            self.weights_path, sess_options=sess_options, providers=self.config.providers
+        )
+
     @classmethod
     def from_pretrained(
         cls,
@@ -58,8 +85,13 @@ class TexTellerLayoutModel(LayoutModel):
         config = TexTellerLayoutConfig.from_pretrained(pretrained_model_name_or_path)
         config._name_or_path = pretrained_model_name_or_path
         config._revision = revision
+        for key, value in kwargs.items():
+            setattr(config, key, value)
         return cls(config)
 
+    def detect_bboxes(self, image_array: np.ndarray) -> List[Bbox]:
+        return latex_det_predict(image_array, self.session, self.infer_config, self.transforms)
+
     def detect(self, image: Union["np.ndarray", "Image.Image"]) -> Layout:
         if isinstance(image, Image.Image):
             image_array = np.array(image)
@@ -67,9 +99,7 @@ class TexTellerLayoutModel(LayoutModel):
             image_array = image
 
         page_layout = Layout(page=image_array)
-        infer_config = PredictConfig(self.cfg_path)
-        latex_det_model = InferenceSession(self.weights_path)
-        latex_bboxes = latex_det_predict(image_array, latex_det_model, infer_config)
+        latex_bboxes = self.detect_bboxes(image_array)
         
         for bbox in latex_bboxes:
             x, y = bbox.p.x, bbox.p.y
@@ -15,7 +15,7 @@
 import os
 import numpy as np
 from PIL import Image
-from typing import Optional, Union
+from typing import List, Optional, Union
 from latyas.layout.block import Block, BlockType
 from latyas.layout.layout import Layout
 from latyas.layout.models.layout_config import LayoutConfig
@@ -57,31 +57,45 @@ class UltralyticsLayoutModel(LayoutModel):
         elif isinstance(image, np.ndarray):
             image_array = image
 
-        page_layout = Layout(page=image_array)
-
         results = self.model.predict(source=image_array, verbose=False)
         if len(results) != 1:
             raise Exception("The number of prediction results is not one.")
-        result = results[0]
+        return self._result_to_layout(results[0], image_array, threshold)
+
+    def detect_batch(
+        self,
+        images: List[Union["np.ndarray", "Image.Image"]],
+        batch_size: int = 8,
+        threshold: float = 0.3,
+    ) -> List[Layout]:
+        image_arrays = [np.array(image) if isinstance(image, Image.Image) else image for image in images]
+
+        page_layouts = []
+        for batch_start in range(0, len(image_arrays), batch_size):
+            batch = image_arrays[batch_start:batch_start + batch_size]
+            # A list source is stacked into one tensor and run through a single forward pass
+            results = self.model.predict(source=batch, verbose=False)
+            if len(results) != len(batch):
+                raise Exception("The number of prediction results does not match the number of images.")
+            for result, image_array in zip(results, batch):
+                page_layouts.append(self._result_to_layout(result, image_array, threshold))
+        return page_layouts
+
+    def _result_to_layout(self, result, image_array: np.ndarray, threshold: float) -> Layout:
+        page_layout = Layout(page=image_array)
 
         # Detection
         names = result.names
-        result.boxes.xyxy  # box with xyxy format, (N, 4)
-        result.boxes.xywh  # box with xywh format, (N, 4)
-        result.boxes.xyxyn  # box with xyxy format but normalized, (N, 4)
-        result.boxes.xywhn  # box with xywh format but normalized, (N, 4)
-        result.boxes.conf  # confidence score, (N, 1)
-        result.boxes.cls  # cls, (N, 1)
+        xyxy = result.boxes.xyxy.cpu().numpy()  # box with xyxy format, (N, 4)
+        conf = result.boxes.conf.cpu().numpy()  # confidence score, (N, 1)
+        cls = result.boxes.cls.cpu().numpy()  # cls, (N, 1)
 
-        for bbox_i in range(result.boxes.xyxy.shape[0]):
-            label_id = result.boxes.cls[bbox_i].item()
-            conf = result.boxes.conf[bbox_i].item()
-            x, y, x2, y2 = result.boxes.xyxy[bbox_i, :].cpu().numpy()
-            x, y, x2, y2 = float(x), float(y), float(x2), float(y2)
-            if conf > threshold:
+        for bbox_i in range(xyxy.shape[0]):
+            if conf[bbox_i] > threshold:
+                x, y, x2, y2 = (float(v) for v in xyxy[bbox_i])
                 page_layout.insert(
                     0,
-                    Block(Rectangle(x, y, x2, y2), BlockType.from_str(names[label_id])),
+                    Block(Rectangle(x, y, x2, y2), BlockType.from_str(names[int(cls[bbox_i])])),
                 )
         # page_layout.page_sort()
         page_layout.remove_overlapping(strategy="merge")
@@ -5,20 +5,31 @@ See also: https://stackoverflow.com/questions/27549574/algorithms-to-extract-tex
 
 import sys
 from typing import List, Tuple, Union
+
+import numpy as np
+
 from latyas.layout.block import Block
 from latyas.layout.layout import Layout
 
 EPSILON = 5
 
 
-def simple_position_reflow(
-    page_layout: Union[Layout, List[Block]], bboxs: List[int]
-) -> List[int]:
+def _layout_boxes(page_layout: Union[Layout, List[Block]]) -> np.ndarray:
+    if isinstance(page_layout, Layout) and page_layout.is_columnar:
+        return page_layout._blocks.boxes.astype(np.float64)
+    boxes = np.array(
+        [page_layout[bbox_i].shape.boundingbox for bbox_i in range(len(page_layout))],
+        dtype=np.float64,
+    )
+    return boxes.reshape(-1, 4)
+
+
+def _simple_position_reflow(boxes: np.ndarray, bboxs: List[int]) -> List[int]:
     # Sort Blocks
     sorted_bbox = []
-    min_x, min_y, max_x, max_y = page_layout[0].shape.boundingbox
+    min_x, min_y, max_x, max_y = boxes[0].tolist()
     for bbox_i in bboxs:
-        x, y, x2, y2 = page_layout[bbox_i].shape.boundingbox
+        x, y, x2, y2 = boxes[bbox_i].tolist()
         min_x = min(min_x, x)
         max_x = max(max_x, x2)
         min_y = min(min_y, y)
@@ -29,7 +40,7 @@ def simple_position_reflow(
     sf = (h // 16, w // 3)
 
     for bbox_i in bboxs:
-        x, y, x2, y2 = page_layout[bbox_i].shape.boundingbox
+        x, y, x2, y2 = boxes[bbox_i].tolist()
         x, y, x2, y2 = int(x), int(y), int(x2), int(y2)
         sorted_bbox.append(((x // sf[1], y // sf[0], x2 // sf[1], y2 // sf[0]), bbox_i))
     sorted_bbox = sorted(sorted_bbox, key=lambda x: x[0])
@@ -37,6 +48,80 @@ def simple_position_reflow(
     return [item[1] for item in sorted_bbox]
 
 
+def simple_position_reflow(
+    page_layout: Union[Layout, List[Block]], bboxs: List[int]
+) -> List[int]:
+    return _simple_position_reflow(_layout_boxes(page_layout), bboxs)
+
+
+def _projection_cut(boxes: np.ndarray, bboxs: List[int], axis: int, margin: float) -> List[List[int]]:
+    """
+    Split bboxs at the gaps of their projection on one axis (0 for x, 1 for y).
+
+    The candidate splits are the box edges moved outwards by margin. A candidate is a
+    cut when no box strictly straddles it and some box ends after the previous cut,
+    which is what scanning the candidates in order and partitioning the remaining
+    boxes at each of them gives, but each candidate is tested with a binary search.
+    The last group holds the boxes after the last cut and may be empty.
+    """
+    indices = np.asarray(bboxs, dtype=np.int64)
+    starts = boxes[indices, axis]
+    ends = boxes[indices, axis + 2]
+    candidates = np.sort(np.concatenate([starts - margin, ends + margin]))
+
+    sorted_starts = np.sort(starts)
+    sorted_ends = np.sort(ends)
+    sorted_points = np.sort(starts[starts == ends])
+    starts_before = np.searchsorted(sorted_starts, candidates, side="left")
+    ends_before = np.searchsorted(sorted_ends, candidates, side="right")
+    # Boxes with start == end == split are on both sides of it but do not straddle it
+    points_at = np.searchsorted(sorted_points, candidates, side="right") - np.searchsorted(
+        sorted_points, candidates, side="left"
+    )
+    straddling = starts_before - (ends_before - points_at)
+
+    cuts = []
+    last_ends_before = 0
+    for candidate, n_straddling, n_ends_before in zip(candidates, straddling, ends_before):
+        if n_straddling == 0 and n_ends_before > last_ends_before:
+            cuts.append(candidate)
+            last_ends_before = n_ends_before
+
+    group_ids = np.searchsorted(np.asarray(cuts, dtype=np.float64), ends, side="left")
+    groups = [[] for _ in range(len(cuts) + 1)]
+    for bbox_i, group_id in zip(bboxs, group_ids):
+        groups[group_id].append(bbox_i)
+    return groups
+
+
+def _region(
+    boxes: np.ndarray,
+    bboxs: List[int],
+    axis: int,
+    margin: float,
+    depth: int,
+    max_depth: int,
+) -> List[int]:
+    if len(bboxs) <= 1:
+        return bboxs
+    if depth > max_depth:
+        return _simple_position_reflow(boxes, bboxs)
+
+    sorted_bboxs = []
+    for group in _projection_cut(boxes, bboxs, axis, margin):
+        sorted_bboxs.extend(
+            _region(
+                boxes,
+                group,
+                1 - axis,
+                margin=margin - depth * (margin / max_depth),
+                depth=depth + 1,
+                max_depth=max_depth,
+            )
+        )
+    return sorted_bboxs
+
+
 def horizontal_overlap(
     page_layout: Union[Layout, List[Block]], bboxs: List[int], split: float
 ) -> Tuple[List[int], List[int], List[int]]:
@@ -69,46 +154,7 @@ def horizontal_region(
     """
     水平排布的block
     """
-    if len(bboxs) <= 1:
-        return bboxs
-    if depth > max_depth:
-        return simple_position_reflow(page_layout, bboxs)
-
-    possible_x_list = []
-    for bbox_i in bboxs:
-        bbox = page_layout[bbox_i].shape.boundingbox
-        possible_x_list.extend([bbox[0] - margin, bbox[2] + margin])
-    possible_x_list = sorted(possible_x_list)
-
-    sorted_bboxs = []
-    rest_bboxs = bboxs
-    for possible_x in possible_x_list:
-        l, r, o = horizontal_overlap(page_layout, rest_bboxs, possible_x)
-        if len(o) == 0:
-            if len(l) == 0:
-                continue
-
-            # print(f"possible x: {possible_x}")
-            sorted_bboxs.extend(
-                vertical_region(
-                    page_layout,
-                    l,
-                    margin=margin - depth * (margin / max_depth),
-                    depth=depth + 1,
-                    max_depth=max_depth,
-                )
-            )
-            rest_bboxs = r
-    sorted_bboxs.extend(
-        vertical_region(
-            page_layout,
-            rest_bboxs,
-            margin=margin - depth * (margin / max_depth),
-            depth=depth + 1,
-            max_depth=max_depth,
-        )
-    )
-    return sorted_bboxs
+    return _region(_layout_boxes(page_layout), bboxs, 0, margin, depth, max_depth)
 
 
 def vertical_overlap(
@@ -143,47 +189,7 @@ def vertical_region(
     """
     垂直排布的block
     """
-    if len(bboxs) <= 1:
-        return bboxs
-    if depth > max_depth:
-        return simple_position_reflow(page_layout, bboxs)
-
-    possible_y_list = []
-    for bbox_i in bboxs:
-        bbox = page_layout[bbox_i].shape.boundingbox
-        possible_y_list.extend([bbox[1] - margin, bbox[3] + margin])
-    possible_y_list = sorted(possible_y_list)
-
-    sorted_bboxs = []
-    rest_bboxs = bboxs
-    for possible_y in possible_y_list:
-        t, b, o = vertical_overlap(page_layout, rest_bboxs, possible_y)
-        if len(o) == 0:
-            if len(t) == 0:
-                continue
-
-            # print(f"possible y: {possible_y}")
-            sorted_bboxs.extend(
-                horizontal_region(
-                    page_layout,
-                    t,
-                    margin=margin - depth * (margin / max_depth),
-                    depth=depth + 1,
-                    max_depth=max_depth,
-                )
-            )
-            rest_bboxs = b
-
-    sorted_bboxs.extend(
-        horizontal_region(
-            page_layout,
-            rest_bboxs,
-            margin=margin - depth * (margin / max_depth),
-            depth=depth + 1,
-            max_depth=max_depth,
-        )
-    )
-    return sorted_bboxs
+    return _region(_layout_boxes(page_layout), bboxs, 1, margin, depth, max_depth)
 
 
 def xy_cut_reflow(
@@ -191,12 +197,8 @@ def xy_cut_reflow(
 ) -> List[int]:
     # page_img = page_layout._page
     # page_shape = page_img.shape  # (h, w, c)
-    bboxs = []
-    for bbox_i in range(len(page_layout)):
-        bboxs.append(bbox_i)
-
-    if horizontal_first:
-        out = horizontal_region(page_layout, bboxs, margin=margin, depth=0, max_depth=8)
-    else:
-        out = vertical_region(page_layout, bboxs, margin=margin, depth=0, max_depth=8)
-    return out
+    boxes = _layout_boxes(page_layout)
+    bboxs = list(range(len(page_layout)))
+
+    axis = 0 if horizontal_first else 1
+    return _region(boxes, bboxs, axis, margin=margin, depth=0, max_depth=8)
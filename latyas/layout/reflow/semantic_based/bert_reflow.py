@@ -1,58 +1,197 @@
 
+import functools
 import logging
-from typing import List
+import os
+from typing import Dict, List, Literal, Optional, Tuple
+
+import numpy as np
 from latyas.layout.layout import Layout
 
 from transformers import AutoTokenizer, BertTokenizer, BertForNextSentencePrediction
 import torch
 
-from latyas.layout.reflow.position_based import position_reflow
-
-
-def bert_reflow(page_layout: Layout, threshold=3) -> List[int]:
-    position_blocks = position_reflow(page_layout)
-    loggers = [logging.getLogger(name) for name in logging.root.manager.loggerDict]
-    for logger in loggers:
-        if "transformers" in logger.name.lower():
-            logger.setLevel(logging.ERROR)
-    tokenizer: BertTokenizer = BertTokenizer.from_pretrained("bert-base-chinese")
-    model = BertForNextSentencePrediction.from_pretrained("bert-base-chinese")
-    for bbox_i in range(len(position_blocks)):
-        for bbox_j in range(bbox_i, len(position_blocks)):
-            if bbox_i == bbox_j:
-                continue
-            lhs_bbox = page_layout[position_blocks[bbox_i]].shape.boundingbox
-            rhs_bbox = page_layout[position_blocks[bbox_j]].shape.boundingbox
-            
+from latyas.layout.reflow.position_based.position_reflow import position_reflow
+
+
+class BertReflower(object):
+    """
+    Reorders the blocks of a page by next sentence prediction.
+
+    The tokenizer and the model are loaded once and kept for every page. The pairs of a
+    page are scored in padded batches, sorted by length so that a batch holds texts of
+    similar length. With the onnx and onnx-int8 backends the model is exported once to
+    onnx_dir (quantized with dynamic int8 weights for onnx-int8) and run with
+    onnxruntime on the CPU.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "bert-base-chinese",
+        backend: Literal["pytorch", "onnx", "onnx-int8"] = "pytorch",
+        device: str = "cpu",
+        batch_size: int = 32,
+        max_length: int = 512,
+        onnx_dir: Optional[str] = None,
+    ) -> None:
+        if backend not in ("pytorch", "onnx", "onnx-int8"):
+            raise Exception(f"Unsupported BERT reflow backend: {backend}")
+        self.model_name = model_name
+        self.backend = backend
+        self.device = device
+        self.batch_size = batch_size
+        self.max_length = max_length
+        if onnx_dir is None:
+            onnx_dir = os.path.join(
+                os.path.expanduser("~"), ".cache", "latyas", "bert_reflow", model_name.replace("/", "--")
+            )
+        self.onnx_dir = onnx_dir
+
+        loggers = [logging.getLogger(name) for name in logging.root.manager.loggerDict]
+        for logger in loggers:
+            if "transformers" in logger.name.lower():
+                logger.setLevel(logging.ERROR)
+        self.tokenizer: BertTokenizer = BertTokenizer.from_pretrained(model_name)
+        model = BertForNextSentencePrediction.from_pretrained(model_name)
+        model.eval()
+        loggers = [logging.getLogger(name) for name in logging.root.manager.loggerDict]
+        for logger in loggers:
+            if "transformers" in logger.name.lower():
+                logger.setLevel(logging.INFO)
+
+        if backend == "pytorch":
+            self.model = model.to(device)
+            self.session = None
+        else:
+            self.model = None
+            self.session = self._build_session(model)
+
+    def _build_session(self, model: BertForNextSentencePrediction):
+        from onnxruntime import InferenceSession
+
+        os.makedirs(self.onnx_dir, exist_ok=True)
+        onnx_path = os.path.join(self.onnx_dir, "model.onnx")
+        if not os.path.exists(onnx_path):
+            dummy = self.tokenizer("", text_pair="", return_tensors="pt")
+            torch.onnx.export(
+                model,
+                (dummy["input_ids"], dummy["attention_mask"], dummy["token_type_ids"]),
+                onnx_path,
+                input_names=["input_ids", "attention_mask", "token_type_ids"],
+                output_names=["logits"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "token_type_ids": {0: "batch", 1: "sequence"},
+                    "logits": {0: "batch"},
+                },
+                opset_version=14,
+            )
+        if self.backend == "onnx-int8":
+            quantized_path = os.path.join(self.onnx_dir, "model.int8.onnx")
+            if not os.path.exists(quantized_path):
+                from onnxruntime.quantization import QuantType, quantize_dynamic
+
+                quantize_dynamic(onnx_path, quantized_path, weight_type=QuantType.QInt8)
+            onnx_path = quantized_path
+        return InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+
+    def score_pairs(self, pairs: List[Tuple[str, str]]) -> np.ndarray:
+        """
+        Return logits[0] - logits[1] for every (lhs, rhs) pair, the margin by which
+        rhs is predicted to continue lhs.
+        """
+        scores = np.zeros((len(pairs),), dtype=np.float32)
+        order = sorted(range(len(pairs)), key=lambda i: len(pairs[i][0]) + len(pairs[i][1]))
+        for start in range(0, len(order), self.batch_size):
+            chunk = order[start : start + self.batch_size]
+            lhs_texts = [pairs[i][0] for i in chunk]
+            rhs_texts = [pairs[i][1] for i in chunk]
+            if self.session is None:
+                encoded = self.tokenizer(
+                    lhs_texts,
+                    text_pair=rhs_texts,
+                    padding=True,
+                    truncation=True,
+                    max_length=self.max_length,
+                    return_tensors="pt",
+                ).to(self.device)
+                with torch.no_grad():
+                    logits = self.model(**encoded).logits.float().cpu().numpy()
+            else:
+                encoded = self.tokenizer(
+                    lhs_texts,
+                    text_pair=rhs_texts,
+                    padding=True,
+                    truncation=True,
+                    max_length=self.max_length,
+                    return_tensors="np",
+                )
+                logits = self.session.run(
+                    ["logits"],
+                    {
+                        "input_ids": encoded["input_ids"].astype(np.int64),
+                        "attention_mask": encoded["attention_mask"].astype(np.int64),
+                        "token_type_ids": encoded["token_type_ids"].astype(np.int64),
+                    },
+                )[0]
+            scores[chunk] = logits[:, 0] - logits[:, 1]
+        return scores
+
+    def reflow(
+        self, page_layout: Layout, threshold: float = 3, position_blocks: Optional[List[int]] = None
+    ) -> List[int]:
+        """
+        Starting from the position based order, move a block right after an earlier
+        block when it is predicted to continue it.
+
+        The moves are replayed in the same order as scoring one pair at a time would
+        make them. The pairs that are still ahead of the current block are scored in a
+        single batch whenever a pair without a score is reached, which for most pages
+        means one batch for the whole page.
+        """
+        if position_blocks is None:
+            position_blocks = position_reflow(page_layout)
+        else:
+            position_blocks = list(position_blocks)
+        scores: Dict[Tuple[int, int], float] = {}
+
+        def is_candidate(lhs: int, rhs: int) -> bool:
+            lhs_bbox = page_layout[lhs].shape.boundingbox
+            rhs_bbox = page_layout[rhs].shape.boundingbox
             if rhs_bbox[0] < lhs_bbox[2] and rhs_bbox[1] < lhs_bbox[3]:
-                continue
-            lhs_text = page_layout[position_blocks[bbox_i]].text
-            rhs_text = page_layout[position_blocks[bbox_j]].text
-            if lhs_text is None or rhs_text is None:
-                continue
-            # print("========")
-            # print(lhs_text)
-            # print("--------")
-            # print(rhs_text)
-            # print("========")
-            
-            # lhs_ids = tokenizer.convert_tokens_to_ids(tokenizer.tokenize(lhs_text))
-            # rhs_ids = tokenizer.convert_tokens_to_ids(tokenizer.tokenize(rhs_text))
-            # input_ids = torch.tensor(tokenizer.build_inputs_with_special_tokens(lhs_ids, rhs_ids), dtype=torch.long).unsqueeze(0)
-            # input_mask = torch.tensor(tokenizer.get_special_tokens_mask(lhs_ids, rhs_ids), dtype=torch.long).unsqueeze(0)
-            # token_type = torch.tensor(tokenizer.create_token_type_ids_from_sequences(lhs_ids, rhs_ids), dtype=torch.long).unsqueeze(0)
-            encoded = tokenizer.encode_plus(lhs_text, text_pair=rhs_text, return_tensors='pt')
-            with torch.no_grad():
-                # outputs = model(input_ids=input_ids, attention_mask=input_mask, token_type_ids=token_type)
-                outputs = model(**encoded)
-                logits = outputs.logits
-                # print(logits[0, 0], logits[0, 1])
-                if logits[0, 0] - logits[0, 1] > threshold:
+                return False
+            return page_layout[lhs].text is not None and page_layout[rhs].text is not None
+
+        def score_remaining(bbox_i: int) -> None:
+            pairs = []
+            for lhs_i in range(bbox_i, len(position_blocks)):
+                for rhs_i in range(lhs_i + 1, len(position_blocks)):
+                    key = (position_blocks[lhs_i], position_blocks[rhs_i])
+                    if key not in scores and is_candidate(*key):
+                        pairs.append(key)
+            pair_scores = self.score_pairs([(page_layout[lhs].text, page_layout[rhs].text) for lhs, rhs in pairs])
+            scores.update(zip(pairs, pair_scores.tolist()))
+
+        for bbox_i in range(len(position_blocks)):
+            for bbox_j in range(bbox_i + 1, len(position_blocks)):
+                key = (position_blocks[bbox_i], position_blocks[bbox_j])
+                if not is_candidate(*key):
+                    continue
+                if key not in scores:
+                    score_remaining(bbox_i)
+                if scores[key] > threshold:
                     old_ele = position_blocks[bbox_j]
                     del position_blocks[bbox_j]
                     position_blocks.insert(bbox_i + 1, old_ele)
-    loggers = [logging.getLogger(name) for name in logging.root.manager.loggerDict]
-    for logger in loggers:
-        if "transformers" in logger.name.lower():
-            logger.setLevel(logging.INFO)
-    return position_blocks
\ No newline at end of file
+        return position_blocks
+
+
+@functools.lru_cache(maxsize=None)
+def default_bert_reflower() -> BertReflower:
+    return BertReflower()
+
+
+def bert_reflow(page_layout: Layout, threshold=3, reflower: Optional[BertReflower] = None) -> List[int]:
+    if reflower is None:
+        reflower = default_bert_reflower()
+    return reflower.reflow(page_layout, threshold=threshold)
@@ -16,7 +16,6 @@
 import json
 import os
 from typing import Any, Dict, Optional, Union
-from huggingface_hub import hf_hub_download
 
 
 class LatyasConfig:
@@ -65,6 +64,9 @@ class LatyasConfig:
         if os.path.exists(pretrained_model_name_or_path):
             config_path = os.path.join(pretrained_model_name_or_path, "config.json")
         else:
+            # Imported here so that building configs does not import the hub client
+            from huggingface_hub import hf_hub_download
+
             config_path = hf_hub_download(
                 repo_id=pretrained_model_name_or_path, filename="config.json"
             )
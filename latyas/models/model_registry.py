@@ -0,0 +1,187 @@
+import importlib
+import os
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple, Union
+
+
+class ModelRegistry(object):
+    """
+    Process-wide store of loaded models and weights. Every key is loaded once,
+    the first time it is asked for, and the same object is handed out after
+    that. Threads asking for the same key at once wait for the first load.
+    """
+
+    def __init__(self) -> None:
+        self._models: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        if key in self._models:
+            return self._models[key]
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in self._models:
+                self._models[key] = loader()
+            return self._models[key]
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._models
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    def keys(self) -> List[Hashable]:
+        return list(self._models.keys())
+
+    def remove(self, key: Hashable) -> None:
+        with self._lock:
+            self._models.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Drop every model. Models still referenced elsewhere stay alive.
+        """
+        with self._lock:
+            self._models.clear()
+
+
+MODEL_REGISTRY = ModelRegistry()
+
+
+def import_class(model_class: Union[type, str]) -> type:
+    """
+    The class itself, or the class at a dotted path such as
+    "latyas.ocr.models.gotocr2.gotocr2_model.GOTOCR2OCRModel". Naming a model by
+    its path keeps its backend out of the import of the calling module.
+    """
+    if isinstance(model_class, str):
+        module_name, _, class_name = model_class.rpartition(".")
+        return getattr(importlib.import_module(module_name), class_name)
+    return model_class
+
+
+def class_path(model_class: Union[type, str]) -> str:
+    if isinstance(model_class, str):
+        return model_class
+    return f"{model_class.__module__}.{model_class.__qualname__}"
+
+
+def pretrained_key(
+    model_class: Union[type, str],
+    pretrained_model_name_or_path: Union[str, os.PathLike],
+    revision: str = "main",
+    device: Optional[str] = None,
+    **kwargs,
+) -> Tuple:
+    """
+    The registry key of a model loaded with from_pretrained: its class, repo,
+    revision and device, and any other from_pretrained argument.
+    """
+    return (
+        class_path(model_class),
+        str(pretrained_model_name_or_path),
+        revision,
+        device,
+        tuple(sorted((key, repr(value)) for key, value in kwargs.items())),
+    )
+
+
+def _pretrained_loader(
+    model_class: Union[type, str],
+    pretrained_model_name_or_path: Union[str, os.PathLike],
+    revision: str = "main",
+    device: Optional[str] = None,
+    **kwargs,
+) -> Tuple[Tuple, Callable[[], Any]]:
+    key = pretrained_key(model_class, pretrained_model_name_or_path, revision, device, **kwargs)
+    if device is not None:
+        kwargs["device"] = device
+
+    def load() -> Any:
+        return import_class(model_class).from_pretrained(pretrained_model_name_or_path, revision=revision, **kwargs)
+
+    return key, load
+
+
+def shared_pretrained(
+    model_class: Union[type, str],
+    pretrained_model_name_or_path: Union[str, os.PathLike],
+    revision: str = "main",
+    device: Optional[str] = None,
+    **kwargs,
+) -> Any:
+    """
+    model_class.from_pretrained(...) loaded at most once per process.
+    """
+    key, load = _pretrained_loader(model_class, pretrained_model_name_or_path, revision, device, **kwargs)
+    return MODEL_REGISTRY.get_or_load(key, load)
+
+
+class LazyModel(object):
+    """
+    Stands in for a layout, OCR, TexOCR or TSR model and loads it through the
+    registry on first use, so a pipeline only pays for the models its documents
+    need and models with the same key are shared by every pipeline.
+    """
+
+    def __init__(self, registry_key: Hashable, loader: Callable[[], Any], registry: Optional[ModelRegistry] = None):
+        self.registry_key = registry_key
+        self._loader = loader
+        self._registry = registry if registry is not None else MODEL_REGISTRY
+
+    @classmethod
+    def from_pretrained(
+        cls,
+        model_class: Union[type, str],
+        pretrained_model_name_or_path: Union[str, os.PathLike],
+        revision: str = "main",
+        device: Optional[str] = None,
+        **kwargs,
+    ) -> "LazyModel":
+        key, load = _pretrained_loader(model_class, pretrained_model_name_or_path, revision, device, **kwargs)
+        return cls(key, load)
+
+    @classmethod
+    def from_config(cls, model_class: Union[type, str], config: Any) -> "LazyModel":
+        """
+        A lazy model_class(config), for the models built from a config rather than
+        with from_pretrained. Equal configs share the model.
+        """
+        key = (
+            class_path(model_class),
+            type(config).__qualname__,
+            tuple(sorted((key, repr(value)) for key, value in vars(config).items())),
+        )
+        return cls(key, lambda: import_class(model_class)(config))
+
+    @property
+    def loaded(self) -> bool:
+        return self.registry_key in self._registry
+
+    @property
+    def model(self) -> Any:
+        return self._registry.get_or_load(self.registry_key, self._loader)
+
+    def detect(self, image, *args, **kwargs):
+        return self.model.detect(image, *args, **kwargs)
+
+    def detect_batch(self, images, *args, **kwargs):
+        return self.model.detect_batch(images, *args, **kwargs)
+
+    def recognize(self, image, *args, **kwargs):
+        return self.model.recognize(image, *args, **kwargs)
+
+    def recognize_batch(self, images, *args, **kwargs):
+        return self.model.recognize_batch(images, *args, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        # Only reached for attributes not defined above, e.g. config or detect_bboxes
+        if name.startswith("_") or name == "registry_key":
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.loaded else "not loaded"
+        return f"LazyModel({self.registry_key!r}, {state})"
@@ -0,0 +1,158 @@
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Dict, List, Literal, Optional, Union
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from latyas.layout.shape import Shape
+from latyas.ocr.models.ocr_model import OCRModel
+from latyas.ocr.text_bbox import TextBoundingBox
+from latyas.utils.cache import TieredCache
+
+
+def exact_image_key(image: Union["np.ndarray", "Image.Image"]) -> str:
+    image_array = np.ascontiguousarray(np.asarray(image))
+    digest = hashlib.sha256()
+    digest.update(f"{image_array.shape}{image_array.dtype}".encode())
+    digest.update(image_array.data)
+    return digest.hexdigest()
+
+
+def perceptual_image_key(image: Union["np.ndarray", "Image.Image"], hash_size: int = 16) -> str:
+    """
+    Difference hash of the grayscale crop, with the rounded aspect ratio so that
+    crops of very different shapes never share a key.
+    """
+    image_array = np.asarray(image)
+    if image_array.ndim == 3:
+        gray = cv2.cvtColor(image_array[..., :3], cv2.COLOR_RGB2GRAY)
+    else:
+        gray = image_array
+    if gray.size == 0:
+        return "empty"
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = np.packbits((small[:, 1:] > small[:, :-1]).reshape(-1))
+    aspect = round(image_array.shape[1] / max(image_array.shape[0], 1), 1)
+    return f"{aspect}-{bits.tobytes().hex()}"
+
+
+def equations_key(equations: List[Shape]) -> str:
+    """
+    Identifies the equation boxes handed to a model along with a crop.
+    """
+    boxes = [[round(float(v), 1) for v in equation.boundingbox] for equation in equations]
+    return hashlib.sha256(json.dumps(boxes).encode()).hexdigest()
+
+
+def model_fingerprint(model: Any, model_name: str) -> str:
+    """
+    Identifies the model and its settings: the model name, its class and the
+    attributes of its config, if it has one. A LazyModel is identified by its
+    registry key, so fingerprinting never loads it.
+    """
+    registry_key = getattr(model, "registry_key", None)
+    if registry_key is not None:
+        description = json.dumps({"name": model_name, "registry_key": registry_key}, sort_keys=True, default=str)
+        return hashlib.sha256(description.encode()).hexdigest()
+    config = getattr(model, "config", None)
+    config_attrs: Dict[str, Any] = {}
+    if config is not None:
+        for klass in reversed(type(config).__mro__):
+            for key, value in vars(klass).items():
+                if not key.startswith("__") and not callable(value) and not isinstance(value, (property, classmethod, staticmethod)):
+                    config_attrs[key] = value
+        config_attrs.update(vars(config))
+    description = json.dumps(
+        {"name": model_name, "class": f"{type(model).__module__}.{type(model).__qualname__}", "config": config_attrs},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(description.encode()).hexdigest()
+
+
+class RecognitionCache(TieredCache):
+    """
+    Cache of recognized texts, keyed by CachedOCRModel.cache_key.
+    """
+
+
+class CachedOCRModel(OCRModel):
+    """
+    Wraps an OCRModel, TexOCRModel or TSRModel and serves repeated crops from a
+    RecognitionCache. The key is the hash of the crop pixels, exact or perceptual,
+    with the name, class and config of the wrapped model, so one cache can be
+    shared by several models. Identical crops within a batch are recognized once.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        cache: RecognitionCache,
+        model_name: Optional[str] = None,
+        key: Literal["exact", "perceptual"] = "exact",
+    ) -> None:
+        if key not in ("exact", "perceptual"):
+            raise Exception(f"Unsupported cache key: {key}")
+        self.model = model
+        self.cache = cache
+        self.key = key
+        if model_name is None:
+            model_name = getattr(getattr(model, "config", None), "_name_or_path", "") or type(model).__name__
+        self._model_fingerprint = model_fingerprint(model, model_name)
+
+    def cache_key(self, image: Union["np.ndarray", "Image.Image"]) -> str:
+        if self.key == "perceptual":
+            image_key = perceptual_image_key(image)
+        else:
+            image_key = exact_image_key(image)
+        return f"{self._model_fingerprint}:{self.key}:{image_key}"
+
+    @property
+    def accepts_equations(self) -> bool:
+        return getattr(self.model, "accepts_equations", False)
+
+    def recognize(self, image: Union["np.ndarray", "Image.Image"], equations: Optional[List[Shape]] = None) -> str:
+        return self.recognize_batch([image], None if equations is None else [equations])[0]
+
+    def recognize_batch(
+        self,
+        images: List[Union["np.ndarray", "Image.Image"]],
+        equations: Optional[List[Optional[List[Shape]]]] = None,
+    ) -> List[str]:
+        """
+        equations, for a model that accepts_equations, are part of the key: the
+        same crop with other equation boxes is recognized again.
+        """
+        keys = [self.cache_key(image) for image in images]
+        if equations is not None:
+            keys = [
+                key if image_equations is None else f"{key}:eq:{equations_key(image_equations)}"
+                for key, image_equations in zip(keys, equations)
+            ]
+        texts: List[Optional[str]] = [self.cache.get(key) for key in keys]
+
+        missing: Dict[str, List[int]] = OrderedDict()
+        for image_i, (key, text) in enumerate(zip(keys, texts)):
+            if text is None:
+                missing.setdefault(key, []).append(image_i)
+        if len(missing) > 0:
+            missing_images = [images[indices[0]] for indices in missing.values()]
+            if equations is not None:
+                missing_equations = [equations[indices[0]] for indices in missing.values()]
+                recognized = self.model.recognize_batch(missing_images, equations=missing_equations)
+            elif len(missing_images) == 1:
+                recognized = [self.model.recognize(missing_images[0])]
+            else:
+                recognized = self.model.recognize_batch(missing_images)
+            for (key, indices), text in zip(missing.items(), recognized):
+                if text is not None:
+                    self.cache.put(key, text)
+                for image_i in indices:
+                    texts[image_i] = text
+        return texts
+
+    def detect(self, image: Union["np.ndarray", "Image.Image"]) -> List[TextBoundingBox]:
+        return self.model.detect(image)
@@ -47,7 +47,7 @@ class EasyOCROCRModel(OCRModel):
         config._revision = revision
         return cls(config)
 
-    def recognize(self, image: Union["np.ndarray", "Image.Image"]) -> str:
+    def _prepare_image(self, image: Union["np.ndarray", "Image.Image"]) -> np.ndarray:
         if isinstance(image, Image.Image):
             image_array = np.array(image)
         elif isinstance(image, np.ndarray):
@@ -57,12 +57,41 @@ class EasyOCROCRModel(OCRModel):
         # 如果图像的宽度或高度小于400，则放置在800x800的白色背景上
         if image_array.shape[0] < 400 or image_array.shape[1] < 400:
             image_array = small_image_padding(image_array)
+        return image_array
+
+    def recognize(self, image: Union["np.ndarray", "Image.Image"]) -> str:
+        image_array = self._prepare_image(image)
         results = self.model.readtext(
             image_array, decoder="beamsearch", beamWidth=5, paragraph=True, detail=0
         )
 
         return "\n".join(results)
 
+    def recognize_batch(
+        self, images: List[Union["np.ndarray", "Image.Image"]], batch_size: int = 8
+    ) -> List[str]:
+        image_arrays = [self._prepare_image(image) for image in images]
+        # readtext_batched needs equally sized inputs, so every chunk is padded
+        # with white to its largest crop instead of being resized.
+        order = sorted(range(len(image_arrays)), key=lambda i: image_arrays[i].shape[:2])
+        texts = [""] * len(image_arrays)
+        for chunk_start in range(0, len(order), batch_size):
+            chunk = order[chunk_start:chunk_start + batch_size]
+            height = max(image_arrays[i].shape[0] for i in chunk)
+            width = max(image_arrays[i].shape[1] for i in chunk)
+            canvases = []
+            for i in chunk:
+                image_array = image_arrays[i]
+                canvas = np.full((height, width, 3), 255, dtype=np.uint8)
+                canvas[:image_array.shape[0], :image_array.shape[1]] = image_array
+                canvases.append(canvas)
+            results = self.model.readtext_batched(
+                canvases, decoder="beamsearch", beamWidth=5, paragraph=True, detail=0
+            )
+            for i, result in zip(chunk, results):
+                texts[i] = "\n".join(result)
+        return texts
+
     def detect(
         self, image: Union["np.ndarray", "Image.Image"]
     ) -> List[TextBoundingBox]:
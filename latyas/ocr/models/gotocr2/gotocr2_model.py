@@ -18,32 +18,43 @@ import numpy as np
 from PIL import Image
 from typing import Optional, Union
 
+from latyas.models.model_registry import MODEL_REGISTRY
 from latyas.ocr.models.ocr_model import OCRModel
 from latyas.ocr.ocr_utils import small_image_padding
 from .gotocr2_config import GOTOCR2OCRConfig
 
 from transformers import AutoModel, AutoTokenizer
 
+
+def load_gotocr2(name_or_path: str, revision: str, device: str):
+    """
+    The tokenizer and weights of GOT-OCR2, loaded once per process and shared by
+    the OCR and TSR models of the same revision.
+    """
+    def load():
+        tokenizer = AutoTokenizer.from_pretrained(name_or_path, revision=revision, trust_remote_code=True)
+        model = AutoModel.from_pretrained(
+            name_or_path,
+            revision=revision,
+            trust_remote_code=True,
+            low_cpu_mem_usage=True,
+            device_map=device,
+            use_safetensors=True,
+            pad_token_id=tokenizer.eos_token_id
+        )
+        model = model.eval().to(device)
+        return tokenizer, model
+
+    return MODEL_REGISTRY.get_or_load(("gotocr2", str(name_or_path), revision, device), load)
+
+
 class GOTOCR2OCRModel(OCRModel):
     def __init__(self, config: GOTOCR2OCRConfig) -> None:
         self.config = config
         self._name_or_path = config._name_or_path
 
         self.device = "cuda"
-        self.tokenizer = AutoTokenizer.from_pretrained(
-            self._name_or_path, revision=config._revision, trust_remote_code=True
-        )
-        self.model = AutoModel.from_pretrained(
-            self._name_or_path,
-            revision=config._revision,
-            trust_remote_code=True,
-            low_cpu_mem_usage=True,
-            device_map=self.device,
-            use_safetensors=True,
-            pad_token_id=self.tokenizer.eos_token_id
-        )
-        self.model = self.model.to(self.device)
-        self.model.eval()
+        self.tokenizer, self.model = load_gotocr2(self._name_or_path, config._revision, self.device)
 
     @classmethod
     def from_pretrained(
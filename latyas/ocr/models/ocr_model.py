@@ -22,6 +22,9 @@ from latyas.ocr.text_bbox import TextBoundingBox
 
 
 class OCRModel(LatyasModel):
+    # True when recognize and recognize_batch take the equation boxes found on the page
+    accepts_equations = False
+
     def __init__(self) -> None:
         pass
 
@@ -31,4 +34,11 @@ class OCRModel(LatyasModel):
     
     @abstractmethod
     def detect(self, image: Union["np.ndarray", "Image.Image"]) -> List[TextBoundingBox]:
-        pass
\ No newline at end of file
+        pass
+
+    def recognize_batch(self, images: List[Union["np.ndarray", "Image.Image"]]) -> List[str]:
+        """
+        Recognize a list of crops, returning one text per crop. Subclasses
+        override this when the backend can run the crops together.
+        """
+        return [self.recognize(image) for image in images]
@@ -28,6 +28,8 @@ from latyas.ocr.ocr_utils import small_image_padding
 from .paddleocr_ocr_config import PaddleOCRConfig
 
 from ppocr.utils.logging import get_logger
+from tools.infer.predict_system import sorted_boxes
+from tools.infer.utility import get_rotate_crop_image
 import logging
 logger = get_logger()
 logger.setLevel(logging.ERROR)
@@ -58,7 +60,7 @@ class PaddleOCRModel(OCRModel):
         config._revision = revision
         return cls(config)
 
-    def recognize(self, image: Union["np.ndarray", "Image.Image"]) -> str:
+    def _prepare_image(self, image: Union["np.ndarray", "Image.Image"]) -> np.ndarray:
         if isinstance(image, Image.Image):
             image_array = np.array(image)
         elif isinstance(image, np.ndarray):
@@ -68,6 +70,10 @@ class PaddleOCRModel(OCRModel):
         # 如果图像的宽度或高度小于400，则放置在800x800的白色背景上
         if image_array.shape[0] < 400 or image_array.shape[1] < 400:
             image_array = small_image_padding(image_array)
+        return image_array
+
+    def recognize(self, image: Union["np.ndarray", "Image.Image"]) -> str:
+        image_array = self._prepare_image(image)
         result = self.model.ocr(image_array, cls=True)
         result_text = []
         for idx in range(len(result)):
@@ -80,6 +86,31 @@ class PaddleOCRModel(OCRModel):
 
         return "".join(result_text)
 
+    def recognize_batch(self, images: List[Union["np.ndarray", "Image.Image"]]) -> List[str]:
+        # Text detection runs per image, the detected lines of all images go
+        # through the angle classifier and the recognizer together.
+        line_owners = []
+        line_images = []
+        for image_i, image in enumerate(images):
+            image_array = self._prepare_image(image)
+            dt_boxes, _ = self.model.text_detector(image_array)
+            if dt_boxes is None:
+                continue
+            for box in sorted_boxes(dt_boxes):
+                line_owners.append(image_i)
+                line_images.append(get_rotate_crop_image(image_array, box.copy()))
+
+        if len(line_images) == 0:
+            return ["" for _ in images]
+        if self.model.use_angle_cls:
+            line_images, _, _ = self.model.text_classifier(line_images)
+        rec_res, _ = self.model.text_recognizer(line_images)
+        result_texts = [[] for _ in images]
+        for image_i, (text, conf) in zip(line_owners, rec_res):
+            if conf >= self.model.drop_score:
+                result_texts[image_i].append(text.replace("\n", ""))
+        return ["".join(result_text) for result_text in result_texts]
+
     def detect(self, image: Union["np.ndarray", "Image.Image"]) -> List[TextBoundingBox]:
         if isinstance(image, Image.Image):
             image_array = np.array(image)
@@ -4,28 +4,18 @@ import cv2
 import numpy as np
 from PIL import Image
 
-def add_margin(image: np.ndarray, margin: int, color: Tuple[int, int, int] = (255, 255, 255)) -> np.ndarray:
-    if isinstance(image, Image.Image):
-        image_array = np.array(image)
-    elif isinstance(image, np.ndarray):
-        image_array = image
-    else:
-        image_array = image
-
-    height = image_array.shape[0]
-    width = image_array.shape[1]
-
-    bg_height = height + 2*margin
-    bg_width = width + 2*margin
-    background = np.ones((bg_height, bg_width, 3), np.uint8) * color
-
-    # 计算将图像放置在背景中心的偏移量
-    x_offset = margin
-    y_offset = margin
-
-    # 将原始图像放置在背景中心
-    background[y_offset:y_offset + height, x_offset:x_offset + width] = image_array
-    return background
+def small_image_padding_transform(
+    shape: Tuple[int, ...], bg_size: int = 800, bg_margin: int = 160
+) -> Tuple[float, int, int]:
+    """
+    The scale and the x and y offsets small_image_padding maps the pixels of an
+    image of this shape with: x -> x * scale + x_offset, y -> y * scale + y_offset.
+    """
+    height = shape[0] * 2 + 2 * bg_margin
+    width = shape[1] * 2 + 2 * bg_margin
+    x_offset = (max(width, bg_size) - width) // 2 + bg_margin
+    y_offset = (max(height, bg_size) - height) // 2 + bg_margin
+    return 2.0, x_offset, y_offset
 
 
 def small_image_padding(image: np.ndarray, bg_size: int=800, bg_margin: int=160, blur: int=5) -> np.ndarray:
@@ -36,21 +26,15 @@ def small_image_padding(image: np.ndarray, bg_size: int=800, bg_margin: int=160,
     else:
         image_array = image
 
+    _, x_offset, y_offset = small_image_padding_transform(image_array.shape, bg_size, bg_margin)
     image_array = cv2.resize(image_array, None, fx=2, fy=2, interpolation=cv2.INTER_LINEAR)
     if blur != 0:
         image_array = cv2.blur(image_array, (blur, blur))
-    image_array = add_margin(image_array, margin=bg_margin)
-    height = image_array.shape[0]
-    width = image_array.shape[1]
-
-    bg_height = max(height, bg_size)
-    bg_width = max(width, bg_size)
-    background = np.ones((bg_height, bg_width, 3), np.uint8) * 255
-
-    # 计算将图像放置在背景中心的偏移量
-    x_offset = (bg_width - width) // 2
-    y_offset = (bg_height - height) // 2
+    # The margin around the image and the centering share one background
+    bg_height = max(image_array.shape[0] + 2 * bg_margin, bg_size)
+    bg_width = max(image_array.shape[1] + 2 * bg_margin, bg_size)
+    background = np.full((bg_height, bg_width, 3), 255, np.uint8)
 
     # 将原始图像放置在背景中心
-    background[y_offset:y_offset + height, x_offset:x_offset + width] = image_array
+    background[y_offset:y_offset + image_array.shape[0], x_offset:x_offset + image_array.shape[1]] = image_array
     return background
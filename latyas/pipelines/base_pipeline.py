@@ -1,45 +1,72 @@
-import cv2
+import hashlib
+import os
+import threading
 import numpy as np
 import pypdfium2
-from typing import Dict, List, Optional, Tuple, Union
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Generator, Hashable, Iterable, List, Literal, Optional, Tuple, Union
 from latyas.layout.block import Block, BlockType, is_text_block
 from latyas.layout.layout import Layout
+from latyas.layout.layout_cache import LayoutCache
 from latyas.layout.models.layout_model import LayoutModel
 from latyas.layout.reflow.position_based.xy_cut_reflow import xy_cut_reflow
 from latyas.layout.shape import Rectangle
+from latyas.models.recognition_cache import CachedOCRModel, RecognitionCache, exact_image_key, model_fingerprint
 from latyas.ocr.models.ocr_model import OCRModel
 from latyas.ocr.text_bbox import TextBoundingBox
-from latyas.utils.text_utils import levenshtein_distance
+from latyas.pipelines.checkpoint import DocumentCheckpoint
+from latyas.pipelines.stage_graph import StageGraph
+from latyas.utils.pdf_utils import TextRectIndex, file_fingerprint
+from latyas.utils.cache import TieredCache
+from latyas.utils.profiling import NULL_PROFILER, Profiler, Span
+from latyas.utils.text_utils import levenshtein_distance, valid_char_ratio
+
+# pdfium is not thread-safe, every call into it goes through this lock
+PDFIUM_LOCK = threading.RLock()
+
+# Per-process state of the analyze_document process workers
+_document_worker_state = {}
+
+
+def _init_document_worker(
+    pipeline_factory: Callable[[], "BasePipeline"], pdf_path: str, settings: Dict[str, Any]
+) -> None:
+    pipeline = pipeline_factory()
+    pipeline.apply_settings(settings)
+    _document_worker_state["pipeline"] = pipeline
+    _document_worker_state["pdf"] = pypdfium2.PdfDocument(pdf_path, autoclose=True)
+
+
+def _analyze_document_page(page_number: int, page_key: Optional[str] = None) -> Layout:
+    page = _document_worker_state["pdf"][page_number]
+    try:
+        return _document_worker_state["pipeline"].analyze_pdf(page, page_key)
+    finally:
+        page.close()
+
 
 def coord_latyas_to_pdf(x, y, widht, height):
     return x, height - y
 
 def get_text_by_bbox(
-    textpage: pypdfium2.PdfPage, x_1: float, y_1: float, x_2: float, y_2: float
+    textpage: pypdfium2.PdfTextPage, x_1: float, y_1: float, x_2: float, y_2: float
 ) -> str:
+    pdf_text, _ = TextRectIndex(textpage).text_and_coverage(x_1, y_1, x_2, y_2)
+    return pdf_text
+
 
+def get_text_and_coverage_by_bbox(
+    textpage: pypdfium2.PdfTextPage, x_1: float, y_1: float, x_2: float, y_2: float
+) -> Tuple[str, float]:
+    """
+    Return the text of the text rects overlapping the bbox, with the latin words of
+    consecutive rects kept apart, and the fraction of the bbox area covered by
+    those rects. Build a TextRectIndex once per page instead when querying many boxes.
+    """
     # The page coordinate system's starting point (0,0) is the left-bottom corner of a page.
     # The Y axis is directed from the bottom of the page to the top.
-    pdf_text = ""
-    rects_n = textpage.count_rects()
-    for rect_i in range(rects_n):
-        rect_cord = textpage.get_rect(rect_i)
-        lhs_rect = Rectangle(rect_cord[0], rect_cord[1], rect_cord[2], rect_cord[3])
-        rhs_rect = Rectangle(x_1, y_1, x_2, y_2)
-
-        overlap_area = lhs_rect.intersect(rhs_rect).area / min(
-            lhs_rect.area, rhs_rect.area
-        )
-
-        if overlap_area > 0.5:
-            pdf_text_line = textpage.get_text_bounded(
-                left=rect_cord[0],
-                bottom=rect_cord[1],
-                right=rect_cord[2],
-                top=rect_cord[3],
-            ).replace("\n", "")
-            pdf_text += pdf_text_line
-    return pdf_text
+    return TextRectIndex(textpage).text_and_coverage(x_1, y_1, x_2, y_2, separate_words=True)
 
 
 class BlockRuleKey(object):
@@ -81,188 +108,782 @@ class BasePipeline(object):
         self._layout_models: Dict[str, LayoutModel] = {}
         self._ocr_models: Dict[str, OCRModel] = {}
         self._ocr_rule: Dict[BlockType, str] = {}
+        # One lock per set of weights: models sharing weights are never called from two threads
+        # at once, models with weights of their own may run concurrently
+        self._layout_locks: Dict[str, threading.Lock] = {}
+        self._ocr_locks: Dict[str, threading.Lock] = {}
+        self._registry_locks: Dict[Hashable, threading.Lock] = {}
+        # Text-layer-first: take the text of born-digital blocks from the PDF instead of OCR
+        self._text_layer_first = False
+        self._text_layer_min_coverage = 0.2
+        self._text_layer_min_valid_ratio = 0.95
+        # Hand the EmbedEq blocks of the page to the models that accept equations
+        self._page_equations = True
+        self._profiler: Profiler = NULL_PROFILER
+        # Pages are rendered at _render_scale for layout, OCR crops at _ocr_render_scale if it is set
+        self._render_scale = 2
+        self._ocr_render_scale: Optional[float] = None
+        self._layout_cache: Optional[LayoutCache] = None
+        self._layout_cache_key = "image"
+        self._layout_fingerprint: Optional[str] = None
+        # OCR stages of different models run at the same time on _stage_pool
+        self._stage_workers: Optional[int] = None
+        self._stage_pool: Optional[ThreadPoolExecutor] = None
+        self._stage_pool_workers = 0
+        # Graphs running on each pool, a replaced pool is shut down after its last graph
+        self._stage_pool_users: Dict[ThreadPoolExecutor, int] = {}
+        self._stage_executor_lock = threading.Lock()
 
-    def add_layout_model(self, name: str, layout_model: LayoutModel) -> None:
+    @property
+    def profiler(self) -> Profiler:
+        return self._profiler
+
+    def set_profiler(self, profiler: Optional[Profiler]) -> None:
+        """
+        Record the stages and model calls of this pipeline with profiler, e.g. a
+        TraceProfiler. None turns the instrumentation off again.
+        """
+        if profiler is None:
+            profiler = NULL_PROFILER
+        self._profiler = profiler
+
+    def set_render_scale(self, render_scale: float = 2, ocr_render_scale: Optional[float] = None) -> None:
+        """
+        Render pages at render_scale (1 is 72 dpi) for layout detection. With an
+        ocr_render_scale, the blocks that go to OCR are rendered again from the PDF
+        at that scale, each on its own, instead of being cropped from the page
+        raster. A cheap layout render with sharp OCR crops keeps large pages small
+        in memory. The block coordinates stay in the pixels of the layout render.
+        """
+        self._render_scale = render_scale
+        self._ocr_render_scale = ocr_render_scale
+
+    def settings(self) -> Dict[str, Any]:
+        """
+        The set_* configuration of this pipeline in a form that can be sent to
+        another process, for apply_settings. The models and the profiler are not
+        part of it. A cache is described by its class, size and path, so a cache
+        on disk is shared with the other process and a memory cache is not.
+        """
+
+        def cache_spec(cache: Optional[TieredCache]) -> Optional[Tuple]:
+            if cache is None:
+                return None
+            return (type(cache), cache.max_entries, cache.path, cache.max_disk_bytes)
+
+        recognition_cache, recognition_cache_key = None, "exact"
+        for ocr_model in self._ocr_models.values():
+            if isinstance(ocr_model, CachedOCRModel):
+                recognition_cache, recognition_cache_key = ocr_model.cache, ocr_model.key
+                break
+        return {
+            "text_layer_first": (
+                self._text_layer_first, self._text_layer_min_coverage, self._text_layer_min_valid_ratio
+            ),
+            "render_scale": (self._render_scale, self._ocr_render_scale),
+            "page_equations": self._page_equations,
+            "stage_workers": self._stage_workers,
+            "layout_cache": (cache_spec(self._layout_cache), self._layout_cache_key),
+            "recognition_cache": (cache_spec(recognition_cache), recognition_cache_key),
+        }
+
+    def apply_settings(self, settings: Dict[str, Any]) -> None:
+        def open_cache(spec: Optional[Tuple]) -> Optional[TieredCache]:
+            if spec is None:
+                return None
+            cache_class, max_entries, path, max_disk_bytes = spec
+            return cache_class(max_entries=max_entries, path=path, max_disk_bytes=max_disk_bytes)
+
+        self.set_text_layer_first(*settings["text_layer_first"])
+        self.set_render_scale(*settings["render_scale"])
+        self.set_page_equations(settings["page_equations"])
+        self.set_stage_workers(settings["stage_workers"])
+        layout_cache, layout_cache_key = settings["layout_cache"]
+        self.set_layout_cache(open_cache(layout_cache), layout_cache_key)
+        recognition_cache, recognition_cache_key = settings["recognition_cache"]
+        self.set_recognition_cache(open_cache(recognition_cache), recognition_cache_key)
+
+    def add_layout_model(
+        self, name: str, layout_model: LayoutModel, shares_weights_with: Iterable[str] = ()
+    ) -> None:
         self._layout_models[name] = layout_model
-
-    def add_ocr_model(self, name: str, ocr_model: OCRModel) -> None:
+        self._layout_locks[name] = self._weights_lock(layout_model, shares_weights_with)
+        self._layout_fingerprint = None
+
+    def add_ocr_model(self, name: str, ocr_model: OCRModel, shares_weights_with: Iterable[str] = ()) -> None:
+        """
+        shares_weights_with names the layout and OCR models added before that use
+        some of the weights of ocr_model, e.g. through load_gotocr2. Models with
+        the same registry key share their weights without being named.
+        """
         self._ocr_models[name] = ocr_model
+        self._ocr_locks[name] = self._weights_lock(ocr_model, shares_weights_with)
+
+    def _weights_lock(self, model: Any, shares_weights_with: Iterable[str]) -> threading.Lock:
+        """
+        The lock of the models model shares weights with, or a new one. When
+        those models hold different locks, they are all moved to one.
+        """
+        locks = []
+        for name in shares_weights_with:
+            if name in self._layout_locks:
+                locks.append(self._layout_locks[name])
+            elif name in self._ocr_locks:
+                locks.append(self._ocr_locks[name])
+            else:
+                raise Exception(f"Cannot find the model {name} to share weights with")
+        registry_key = getattr(model, "registry_key", None)
+        if registry_key in self._registry_locks:
+            locks.append(self._registry_locks[registry_key])
+        lock = locks[0] if len(locks) > 0 else threading.Lock()
+        for table in (self._layout_locks, self._ocr_locks, self._registry_locks):
+            for key, other in table.items():
+                if any(other is merged for merged in locks):
+                    table[key] = lock
+        if registry_key is not None:
+            self._registry_locks[registry_key] = lock
+        return lock
+
+    def set_recognition_cache(
+        self, cache: Optional[RecognitionCache], key: Literal["exact", "perceptual"] = "exact"
+    ) -> None:
+        """
+        Serve repeated crops of every OCR model added so far from cache. None
+        removes the caching again.
+        """
+        for name, ocr_model in self._ocr_models.items():
+            if isinstance(ocr_model, CachedOCRModel):
+                ocr_model = ocr_model.model
+            if cache is not None:
+                ocr_model = CachedOCRModel(ocr_model, cache, model_name=name, key=key)
+            self._ocr_models[name] = ocr_model
+
+    def set_layout_cache(self, cache: Optional[LayoutCache], key: Literal["image", "page"] = "image") -> None:
+        """
+        Reuse the layouts of pages seen before from cache and skip the layout
+        models for them. With key="image" a page is identified by the hash of its
+        rendered image. With key="page" it is identified by the document, page
+        number and render scale when analyze_document knows the document (see
+        its document_key), and by the image hash otherwise. None turns it off.
+        """
+        if key not in ("image", "page"):
+            raise Exception(f"Unsupported layout cache key: {key}")
+        self._layout_cache = cache
+        self._layout_cache_key = key
+
+    def layout_cache_key(self, page_img: np.ndarray, page_key: Optional[str] = None) -> str:
+        """
+        The key of a page in the layout cache. It covers every layout model with
+        its config, so changing the layout models never hits stale layouts.
+        """
+        if self._layout_fingerprint is None:
+            fingerprints = [model_fingerprint(model, name) for name, model in self._layout_models.items()]
+            self._layout_fingerprint = hashlib.sha256(":".join(fingerprints).encode()).hexdigest()
+        if self._layout_cache_key == "page" and page_key is not None:
+            return f"{self._layout_fingerprint}:page:{page_key}"
+        return f"{self._layout_fingerprint}:image:{exact_image_key(page_img)}"
 
     def add_ocr_rule(self, block_type: BlockType, rule: str) -> None:
         self._ocr_rule[block_type] = rule
 
-    def analyze_pdf(self, page: pypdfium2.PdfPage) -> Layout:
-        width, height = page.get_size()
-        render_scale = rs = 2
-        bitmap = page.render(
-            scale=render_scale,  # 72dpi resolution
-            rotation=0,  # no additional rotation
-        )
-        pil_image = bitmap.to_pil()
-        page_img = np.asarray(pil_image)
-
-        # Layout Analysis
-        page_layout: Optional[Layout] = None
-        for layout_model_name, layout_model in self._layout_models.items():
-            each_page_layout = layout_model.detect(page_img)
-            if page_layout is None:
-                page_layout = each_page_layout
-            else:
-                page_layout.merge(each_page_layout)
-        page_layout.remove_overlapping(strategy="merge")
-
-        # Equation OCR
-        for bbox_i in range(len(page_layout)):
-            block = page_layout[bbox_i]
-            if block.kind not in (BlockType.Equation,):
-                continue
-            if block.kind == BlockType.Equation:
-                if BlockType.Equation in self._ocr_rule:
-                    model_name = self._ocr_rule[BlockType.Equation]
-                    text = self._ocr_models[model_name].recognize(page_layout.crop_image(block))
-                    page_layout[bbox_i].set_text(text)
+    def set_text_layer_first(
+        self, enabled: bool = True, min_coverage: float = 0.2, min_valid_ratio: float = 0.95
+    ) -> None:
+        """
+        Read text blocks from the PDF text layer and only OCR the blocks whose text
+        layer is unreliable. A block's text layer is trusted when its text rects
+        cover at least min_coverage of the block and at least min_valid_ratio of
+        the extracted characters are sane unicode.
+        """
+        self._text_layer_first = enabled
+        self._text_layer_min_coverage = min_coverage
+        self._text_layer_min_valid_ratio = min_valid_ratio
+
+    def set_page_equations(self, enabled: bool = True) -> None:
+        """
+        Give the EmbedEq boxes the layout models found inside a text block to its
+        OCR model, when the model accepts them (e.g. TexMix), so it does not
+        detect the equations on the crop again.
+        """
+        self._page_equations = enabled
+
+    def read_text_layer(
+        self, text_index: TextRectIndex, page_height: float, render_scale: float, block: Block
+    ) -> Optional[str]:
+        """
+        Return the text layer of the block, or None if it should go to OCR.
+        """
+        x1, y1, x2, y2 = block.shape.boundingbox
+        rs = render_scale
+        with PDFIUM_LOCK:
+            text, coverage = text_index.text_and_coverage(
+                x1 / rs, page_height - y2 / rs, x2 / rs, page_height - y1 / rs, separate_words=True
+            )
+        if coverage < self._text_layer_min_coverage:
+            return None
+        if valid_char_ratio(text) < self._text_layer_min_valid_ratio:
+            return None
+        return text
+
+    def recognize(self, model_name: str, image: np.ndarray) -> str:
+        with self._ocr_locks[model_name], self._profiler.model_call(model_name, items=1):
+            return self._ocr_models[model_name].recognize(image)
+
+    def recognize_batch(
+        self,
+        model_name: str,
+        images: List[np.ndarray],
+        equations: Optional[List[Optional[List[Rectangle]]]] = None,
+    ) -> List[str]:
+        """
+        equations, only for models that accept them, are the equation boxes of
+        every image in its pixels, or None to detect them on the image.
+        """
+        if len(images) == 0:
+            return []
+        with self._ocr_locks[model_name], self._profiler.model_call(model_name, items=len(images)):
+            if equations is None:
+                return self._ocr_models[model_name].recognize_batch(images)
+            return self._ocr_models[model_name].recognize_batch(images, equations=equations)
+
+    def recognize_blocks(
+        self, jobs: List[Tuple[str, Layout, Block]], layout_pages: Optional[Dict[int, pypdfium2.PdfPage]] = None
+    ) -> None:
+        """
+        Recognize (model_name, page_layout, block) jobs with one batch per model
+        and store the results on the blocks. layout_pages maps the id of every
+        page_layout to its PDF page, for rendering the crops at the OCR scale.
+        """
+        model_jobs: Dict[str, List[Tuple[Layout, Block]]] = {}
+        for model_name, page_layout, block in jobs:
+            model_jobs.setdefault(model_name, []).append((page_layout, block))
+        for model_name, blocks in model_jobs.items():
+            images = [
+                self.crop_block(None if layout_pages is None else layout_pages.get(id(page_layout)), page_layout, block)
+                for page_layout, block in blocks
+            ]
+            equations = None
+            if self._page_equations and any(len(block.equations) > 0 for _, block in blocks):
+                if getattr(self._ocr_models[model_name], "accepts_equations", False):
+                    equations = [
+                        self.crop_equations(page_layout, block, image) if len(block.equations) > 0 else None
+                        for (page_layout, block), image in zip(blocks, images)
+                    ]
+            texts = self.recognize_batch(model_name, images, equations)
+            for (page_layout, block), text in zip(blocks, texts):
+                block.set_text(text)
+
+    def crop_equations(self, page_layout: Layout, block: Block, image: np.ndarray) -> List[Rectangle]:
+        """
+        The equations of block, in the pixels of image, its crop. The crop may be
+        rendered at another scale than the layout, see crop_block. Like the crop,
+        the block is clipped to the page first.
+        """
+        x1, y1, x2, y2 = (int(v) for v in block.shape.boundingbox)
+        x1, y1 = max(x1, 0), max(y1, 0)
+        x2, y2 = min(x2, page_layout.width), min(y2, page_layout.height)
+        height, width = image.shape[0], image.shape[1]
+        scale_x = width / max(x2 - x1, 1)
+        scale_y = height / max(y2 - y1, 1)
+        equations = []
+        for equation in block.equations:
+            eq_x1, eq_y1, eq_x2, eq_y2 = equation.boundingbox
+            equations.append(
+                Rectangle(
+                    min(max((eq_x1 - x1) * scale_x, 0), width),
+                    min(max((eq_y1 - y1) * scale_y, 0), height),
+                    min(max((eq_x2 - x1) * scale_x, 0), width),
+                    min(max((eq_y2 - y1) * scale_y, 0), height),
+                )
+            )
+        return equations
+
+    def crop_block(self, page: Optional[pypdfium2.PdfPage], page_layout: Layout, block: Block) -> np.ndarray:
+        """
+        The image of a block for OCR: rendered from the page at the OCR scale when
+        there is one and the page is known, cropped from the page raster otherwise.
+        """
+        if self._ocr_render_scale is None or page is None:
+            return page_layout.crop_image(block)
+        return self.render_region(page, page_layout, block, self._ocr_render_scale)
+
+    def render_region(
+        self, page: pypdfium2.PdfPage, page_layout: Layout, block: Block, render_scale: float
+    ) -> np.ndarray:
+        """
+        Render only the area of block, given in the pixels of the page_layout
+        raster, at render_scale. pdfium clips the rendering to the area, so the
+        cost follows the size of the block rather than of the page.
+        """
+        with self._profiler.stage("render_region", blocks=1):
+            with PDFIUM_LOCK:
+                width, height = page.get_size()
+                layout_scale = page_layout.width / width
+                x1, y1, x2, y2 = (v / layout_scale for v in block.shape.boundingbox)
+                x1, y1, x2, y2 = max(x1, 0), max(y1, 0), min(x2, width), min(y2, height)
+                # Slivers of a pixel or two are cropped from the page raster instead
+                if (x2 - x1) * render_scale < 2 or (y2 - y1) * render_scale < 2:
+                    return page_layout.crop_image(block)
+                # Amounts cut from the left, bottom, right and top of the page, in PDF units
+                crop = (x1, height - y2, width - x2, y1)
+                bitmap = page.render(scale=render_scale, rotation=0, crop=crop, rev_byteorder=True)
+            return bitmap.to_numpy()
+
+    def render_page(self, page: pypdfium2.PdfPage, render_scale: Optional[float] = None) -> np.ndarray:
+        if render_scale is None:
+            render_scale = self._render_scale
+        with self._profiler.stage("render", pages=1):
+            with PDFIUM_LOCK:
+                bitmap = page.render(
+                    scale=render_scale,  # 72dpi resolution
+                    rotation=0,  # no additional rotation
+                    rev_byteorder=True,  # RGB like to_pil, without converting
+                )
+            # A view of the bitmap buffer, which Python allocated and the array keeps alive
+            return bitmap.to_numpy()
+
+    def _cached_layouts(
+        self, page_imgs: List[np.ndarray], page_keys: List[Optional[str]]
+    ) -> Tuple[List[str], List[Optional[Layout]]]:
+        with self._profiler.stage("layout_cache", pages=len(page_imgs)) as span:
+            cache_keys = [
+                self.layout_cache_key(page_img, page_key) for page_img, page_key in zip(page_imgs, page_keys)
+            ]
+            page_layouts = [
+                self._layout_cache.get_layout(cache_key, page_img) for cache_key, page_img in zip(cache_keys, page_imgs)
+            ]
+            span.add(hits=sum(page_layout is not None for page_layout in page_layouts))
+        return cache_keys, page_layouts
+
+    def detect_layout(self, page_img: np.ndarray, page_key: Optional[str] = None) -> Layout:
+        if self._layout_cache is not None:
+            cache_keys, page_layouts = self._cached_layouts([page_img], [page_key])
+            if page_layouts[0] is not None:
+                return page_layouts[0]
+
+        with self._profiler.stage("layout", pages=1) as span:
+            page_layout: Optional[Layout] = None
+            for layout_model_name, layout_model in self._layout_models.items():
+                with self._layout_locks[layout_model_name], self._profiler.model_call(layout_model_name, items=1):
+                    each_page_layout = layout_model.detect(page_img)
+                if page_layout is None:
+                    page_layout = each_page_layout
                 else:
-                    raise Exception(f"Cannot find the OCR model for {block.kind.name}")
-
-        # Text with Embed Equation
-        for bbox_text_index in range(len(page_layout)):
-            text_block = page_layout[bbox_text_index]
-            if not is_text_block(text_block.kind):
-                continue
-            # Check EmbedEq
-            has_embed_eq = False
-            equations = []
-            for bbox_j in range(len(page_layout)):
-                if bbox_text_index == bbox_j:
-                    continue
-                if page_layout[bbox_j].kind == BlockType.EmbedEq and page_layout[
-                    bbox_j
-                ].shape.is_inside(page_layout[bbox_text_index].shape):
-                    has_embed_eq = True
-                    equations.append(bbox_j)
-            
-            if not has_embed_eq:
-                continue
-            text_block._has_equation = True
-            if BlockType.TextWithEquation in self._ocr_rule:
-                model_name = self._ocr_rule[BlockType.TextWithEquation]
-                text = self._ocr_models[model_name].recognize(page_layout.crop_image(text_block))
-                page_layout[bbox_text_index].set_text(text)
-            else:
-                raise Exception(f"Cannot find the OCR model for {block.kind.name}")
-        
-        # Table OCR
-        for bbox_i in range(len(page_layout)):
-            block = page_layout[bbox_i]
-            if block.kind != BlockType.Table:
-                continue
-
-            x1, y1, x2, y2 = block.shape.boundingbox
-            if block.kind in self._ocr_rule:
-                model_name = self._ocr_rule[block.kind]
-                ocr_text = self._ocr_models[model_name].recognize(page_layout.crop_image(block))
-            else:
-                raise Exception(f"Cannot find the Table OCR model for {block.kind.name}")
-            text = ocr_text
-            block.set_text(text)
-        
-        # Text OCR
-        textpage = page.get_textpage()
-        for bbox_i in range(len(page_layout)):
-            block = page_layout[bbox_i]
-            if not is_text_block(block.kind):
-                continue
-
-            if block._has_equation:
-                continue
-            x1, y1, x2, y2 = block.shape.boundingbox
-            if block.kind in self._ocr_rule:
-                model_name = self._ocr_rule[block.kind]
-                ocr_text = self._ocr_models[model_name].recognize(page_layout.crop_image(block))
-            else:
-                raise Exception(f"Cannot find the OCR model for {block.kind.name}")
-            text = ocr_text
-            block.set_text(text)
-        textpage.close()
-
-        # Reflow
-        sorted_block_indices = xy_cut_reflow(page_layout)
-        page_layout._blocks = [page_layout._blocks[i] for i in sorted_block_indices]
+                    page_layout.merge(each_page_layout)
+            page_layout.remove_overlapping(strategy="merge")
+            span.add(blocks=len(page_layout))
 
+        if self._layout_cache is not None:
+            self._layout_cache.put_layout(cache_keys[0], page_layout)
         return page_layout
 
-    def analyze_image(self, page_img: np.ndarray) -> Layout:
-        height, width =page_img.shape[0], page_img.shape[1]
-        
+    def detect_layout_batch(
+        self, page_imgs: List[np.ndarray], batch_size: int = 8, page_keys: Optional[List[Optional[str]]] = None
+    ) -> List[Layout]:
+        """
+        With a layout cache only the pages missing from it go to the layout models.
+        page_keys identify the pages for a key="page" cache.
+        """
+        page_layouts: List[Optional[Layout]] = [None] * len(page_imgs)
+        if self._layout_cache is not None:
+            if page_keys is None:
+                page_keys = [None] * len(page_imgs)
+            cache_keys, page_layouts = self._cached_layouts(page_imgs, page_keys)
+        missing = [page_i for page_i, page_layout in enumerate(page_layouts) if page_layout is None]
+        if len(missing) == 0:
+            return page_layouts
+        missing_imgs = [page_imgs[page_i] for page_i in missing]
+
+        with self._profiler.stage("layout", pages=len(missing_imgs)) as span:
+            for layout_model_name, layout_model in self._layout_models.items():
+                with self._layout_locks[layout_model_name], self._profiler.model_call(
+                    layout_model_name, items=len(missing_imgs)
+                ):
+                    each_page_layouts = layout_model.detect_batch(missing_imgs, batch_size=batch_size)
+                for page_i, each_page_layout in zip(missing, each_page_layouts):
+                    if page_layouts[page_i] is None:
+                        page_layouts[page_i] = each_page_layout
+                    else:
+                        page_layouts[page_i].merge(each_page_layout)
+            for page_i in missing:
+                page_layouts[page_i].remove_overlapping(strategy="merge")
+                span.add(blocks=len(page_layouts[page_i]))
+
+        if self._layout_cache is not None:
+            for page_i in missing:
+                self._layout_cache.put_layout(cache_keys[page_i], page_layouts[page_i])
+        return page_layouts
+
+    def analyze_pdf(self, page: pypdfium2.PdfPage, page_key: Optional[str] = None) -> Layout:
+        page_img = self.render_page(page)
+        return self.analyze_rendered_pdf(page, page_img, page_key)
+
+    def analyze_pdf_batch(
+        self, pages: List[pypdfium2.PdfPage], batch_size: int = 8, cross_page_ocr: bool = True
+    ) -> List[Layout]:
+        """
+        Analyze a chunk of pages, the layout models see the whole chunk at once.
+        With cross_page_ocr the OCR batches also span all pages of the chunk.
+        """
+        page_imgs = [self.render_page(page) for page in pages]
         # Layout Analysis
-        page_layout: Optional[Layout] = None
-        for layout_model_name, layout_model in self._layout_models.items():
-            each_page_layout = layout_model.detect(page_img)
-            if page_layout is None:
-                page_layout = each_page_layout
-            else:
-                page_layout.merge(each_page_layout)
-        page_layout.remove_overlapping(strategy="merge")
+        page_layouts = self.detect_layout_batch(page_imgs, batch_size=batch_size)
+        if cross_page_ocr:
+            return self.recognize_pdf_layouts(pages, page_layouts)
+        return [
+            self.recognize_pdf_layout(page, page_layout)
+            for page, page_layout in zip(pages, page_layouts)
+        ]
+
+    def analyze_document(
+        self,
+        pdf: Union[str, os.PathLike, pypdfium2.PdfDocument],
+        workers: int = 1,
+        queue_size: Optional[int] = None,
+        executor: Literal["thread", "process"] = "thread",
+        pipeline_factory: Optional[Callable[[], "BasePipeline"]] = None,
+        checkpoint: Optional[DocumentCheckpoint] = None,
+        document_key: Optional[str] = None,
+    ) -> Generator[Tuple[int, Layout], None, None]:
+        """
+        Analyze every page of a document and yield (page_number, layout) in page order.
+
+        With executor="thread" the models of this pipeline are shared by the worker
+        threads; pages are rendered on the calling thread while earlier pages are still
+        in layout detection and OCR. With executor="process" every worker process builds
+        its own pipeline with pipeline_factory (the zero-argument constructor of this
+        class by default), so the weights are loaded once per worker and pdf must be a path.
+        A pipeline whose models were added by hand, e.g. a BasePipeline, needs a
+        pipeline_factory that adds them again. The settings of this pipeline (see
+        settings) are applied to every worker pipeline. The caches are per worker,
+        except that caches with a path share their database, and the profiler of this
+        pipeline does not record the workers.
+        At most queue_size pages are in flight at any time.
+
+        With a checkpoint, the pages it already holds are loaded from it instead of
+        being analyzed, and every analyzed page is saved to it before it is yielded.
+
+        document_key identifies the document in a key="page" layout cache, e.g. its
+        file_fingerprint. It is the fingerprint of the file by default when pdf is
+        a path.
+        """
+        if queue_size is None:
+            queue_size = 2 * workers
+        queue_size = max(queue_size, 1)
+        if executor not in ("thread", "process"):
+            raise Exception(f"Unsupported executor: {executor}")
+
+        if isinstance(pdf, pypdfium2.PdfDocument):
+            page_count = len(pdf)
+        else:
+            with PDFIUM_LOCK:
+                pdf_reader = pypdfium2.PdfDocument(pdf, autoclose=True)
+                page_count = len(pdf_reader)
+                pdf_reader.close()
+        page_numbers = [
+            page_number for page_number in range(page_count)
+            if checkpoint is None or page_number not in checkpoint
+        ]
+        page_keys: Dict[int, Optional[str]] = {page_number: None for page_number in page_numbers}
+        if self._layout_cache is not None and self._layout_cache_key == "page":
+            if document_key is None and not isinstance(pdf, pypdfium2.PdfDocument):
+                document_key = file_fingerprint(pdf)
+            if document_key is not None:
+                for page_number in page_numbers:
+                    page_keys[page_number] = f"{document_key}:{page_number}:{self._render_scale}"
+
+        if executor == "process":
+            if pipeline_factory is None:
+                if type(self) is BasePipeline:
+                    raise Exception("The process executor needs a pipeline_factory for a BasePipeline.")
+                pipeline_factory = self.__class__
+            analyzed = self._analyze_document_processes(pdf, page_keys, workers, queue_size, pipeline_factory)
+        else:
+            analyzed = self._analyze_document_threads(pdf, page_keys, workers, queue_size)
 
-        # Equation OCR
-        for bbox_i in range(len(page_layout)):
-            block = page_layout[bbox_i]
-            if block.kind not in (BlockType.Equation,):
+        try:
+            for page_number in range(page_count):
+                if checkpoint is not None and page_number in checkpoint:
+                    yield page_number, checkpoint.load(page_number)
+                    continue
+                analyzed_page_number, page_layout = next(analyzed)
+                if checkpoint is not None:
+                    checkpoint.save(analyzed_page_number, page_layout)
+                yield analyzed_page_number, page_layout
+        finally:
+            analyzed.close()
+
+    def _analyze_document_threads(
+        self,
+        pdf: Union[str, os.PathLike, pypdfium2.PdfDocument],
+        page_keys: Dict[int, Optional[str]],
+        workers: int,
+        queue_size: int,
+    ) -> Generator[Tuple[int, Layout], None, None]:
+        if isinstance(pdf, pypdfium2.PdfDocument):
+            pdf_reader = pdf
+        else:
+            pdf_reader = pypdfium2.PdfDocument(pdf, autoclose=True)
+        try:
+            if workers <= 1:
+                for page_number, page_key in page_keys.items():
+                    page = pdf_reader[page_number]
+                    page_layout = self.analyze_pdf(page, page_key)
+                    page.close()
+                    yield page_number, page_layout
+                return
+
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                pending = deque()
+                for page_number, page_key in page_keys.items():
+                    with PDFIUM_LOCK:
+                        page = pdf_reader[page_number]
+                    page_img = self.render_page(page)
+                    future = pool.submit(self.analyze_rendered_pdf, page, page_img, page_key)
+                    pending.append((page_number, page, future))
+                    while len(pending) >= queue_size:
+                        yield self._finish_document_page(*pending.popleft())
+                while len(pending) > 0:
+                    yield self._finish_document_page(*pending.popleft())
+        finally:
+            if pdf_reader is not pdf:
+                pdf_reader.close()
+
+    def analyze_rendered_pdf(
+        self, page: pypdfium2.PdfPage, page_img: np.ndarray, page_key: Optional[str] = None
+    ) -> Layout:
+        # Layout Analysis
+        page_layout = self.detect_layout(page_img, page_key)
+        return self.recognize_pdf_layout(page, page_layout)
+
+    def _finish_document_page(
+        self, page_number: int, page: pypdfium2.PdfPage, future: Future
+    ) -> Tuple[int, Layout]:
+        try:
+            page_layout = future.result()
+        finally:
+            with PDFIUM_LOCK:
+                page.close()
+        return page_number, page_layout
+
+    def _analyze_document_processes(
+        self,
+        pdf: Union[str, os.PathLike],
+        page_keys: Dict[int, Optional[str]],
+        workers: int,
+        queue_size: int,
+        pipeline_factory: Callable[[], "BasePipeline"],
+    ) -> Generator[Tuple[int, Layout], None, None]:
+        if isinstance(pdf, pypdfium2.PdfDocument):
+            raise Exception("The process executor needs the path of the PDF file.")
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_document_worker,
+            initargs=(pipeline_factory, str(pdf), self.settings()),
+        ) as pool:
+            pending = deque()
+            for page_number, page_key in page_keys.items():
+                pending.append((page_number, pool.submit(_analyze_document_page, page_number, page_key)))
+                while len(pending) >= queue_size:
+                    page_number, future = pending.popleft()
+                    yield page_number, future.result()
+            while len(pending) > 0:
+                page_number, future = pending.popleft()
+                yield page_number, future.result()
+
+    def recognize_pdf_layout(self, page: pypdfium2.PdfPage, page_layout: Layout) -> Layout:
+        return self.recognize_pdf_layouts([page], [page_layout])[0]
+
+    def recognize_pdf_layouts(
+        self, pages: List[Optional[pypdfium2.PdfPage]], page_layouts: List[Layout]
+    ) -> List[Layout]:
+        """
+        Run the OCR stages over one or more pages. The blocks are routed to the
+        queue of their OCR model, every queue is recognized in one batch across
+        blocks and pages, and the queues of different models run at the same time
+        (see set_stage_workers). pages may hold None for layouts of plain images.
+        """
+        graph = self.build_stage_graph(pages, page_layouts)
+        executor = self._acquire_stage_executor()
+        try:
+            graph.run(executor)
+        finally:
+            self._release_stage_executor(executor)
+        return page_layouts
+
+    def build_stage_graph(
+        self, pages: List[Optional[pypdfium2.PdfPage]], page_layouts: List[Layout]
+    ) -> StageGraph:
+        """
+        The stages of recognize_pdf_layouts. The route stages sort the blocks into
+        jobs, one "ocr:<model>" stage per OCR model recognizes the jobs routed to
+        it once its routes are done, and reflow runs last.
+        """
+        profiler = self._profiler
+        layout_pages = {id(page_layout): page for page, page_layout in zip(pages, page_layouts)}
+        routes: Dict[str, Callable[[Span], List[Tuple[str, Layout, Block]]]] = {
+            "equation": lambda span: self._route_equations(page_layouts),
+            "embed_eq": lambda span: self._route_embed_equations(page_layouts),
+            "table": lambda span: self._route_tables(page_layouts),
+            "text": lambda span: self._route_texts(pages, page_layouts, span),
+        }
+        # The text route skips the blocks the embed_eq route marked as text with equations
+        route_after = {"text": ["route:embed_eq"]}
+        routed: Dict[str, List[Tuple[str, Layout, Block]]] = {}
+
+        def route_stage(route: str) -> Callable[[], None]:
+            def run() -> None:
+                with profiler.stage(f"route:{route}", pages=len(page_layouts)) as span:
+                    routed[route] = routes[route](span)
+                    span.add(blocks=len(routed[route]))
+            return run
+
+        def ocr_stage(model_name: str, feeding: List[str]) -> Callable[[], None]:
+            def run() -> None:
+                jobs = [job for route in feeding for job in routed[route] if job[0] == model_name]
+                with profiler.stage(f"ocr:{model_name}", pages=len(page_layouts)) as span:
+                    self.recognize_blocks(jobs, layout_pages)
+                    span.add(blocks=len(jobs))
+            return run
+
+        def reflow() -> None:
+            with profiler.stage("reflow", pages=len(page_layouts)) as span:
+                for page_layout in page_layouts:
+                    sorted_block_indices = xy_cut_reflow(page_layout)
+                    page_layout.reorder(sorted_block_indices)
+                    span.add(blocks=len(page_layout))
+
+        graph = StageGraph()
+        for route in routes:
+            graph.add(f"route:{route}", route_stage(route), after=route_after.get(route, ()))
+        route_models = {
+            "equation": {self._ocr_rule.get(BlockType.Equation)},
+            "embed_eq": {self._ocr_rule.get(BlockType.TextWithEquation)},
+            "table": {self._ocr_rule.get(BlockType.Table)},
+            "text": {model_name for kind, model_name in self._ocr_rule.items() if is_text_block(kind)},
+        }
+        ocr_stages = []
+        for model_name in dict.fromkeys(self._ocr_rule.values()):
+            feeding = [route for route in routes if model_name in route_models[route]]
+            if len(feeding) == 0:
                 continue
-            if block.kind == BlockType.Equation:
-                if BlockType.Equation in self._ocr_rule:
-                    model_name = self._ocr_rule[BlockType.Equation]
-                    text = self._ocr_models[model_name].recognize(page_layout.crop_image(block))
-                    page_layout[bbox_i].set_text(text)
-                else:
+            graph.add(f"ocr:{model_name}", ocr_stage(model_name, feeding), after=[f"route:{r}" for r in feeding])
+            ocr_stages.append(f"ocr:{model_name}")
+        graph.add("reflow", reflow, after=[f"route:{route}" for route in routes] + ocr_stages)
+        return graph
+
+    def set_stage_workers(self, workers: Optional[int] = None) -> None:
+        """
+        Run the OCR stages of up to workers models at the same time. None uses one
+        thread per OCR model, 1 runs the stages one after the other.
+        """
+        self._stage_workers = workers
+
+    def _acquire_stage_executor(self) -> Optional[ThreadPoolExecutor]:
+        workers = self._stage_workers
+        if workers is None:
+            # Models sharing a lock never run at the same time
+            locks = {id(self._ocr_locks[name]) for name in self._ocr_rule.values() if name in self._ocr_locks}
+            workers = len(locks)
+        if workers <= 1:
+            return None
+        with self._stage_executor_lock:
+            # Shared by every page in flight; the stages never wait on the pool themselves
+            if self._stage_pool is None or self._stage_pool_workers != workers:
+                if self._stage_pool is not None and self._stage_pool not in self._stage_pool_users:
+                    self._stage_pool.shutdown(wait=False)
+                self._stage_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="latyas-stage")
+                self._stage_pool_workers = workers
+            self._stage_pool_users[self._stage_pool] = self._stage_pool_users.get(self._stage_pool, 0) + 1
+            return self._stage_pool
+
+    def _release_stage_executor(self, executor: Optional[ThreadPoolExecutor]) -> None:
+        if executor is None:
+            return
+        with self._stage_executor_lock:
+            self._stage_pool_users[executor] -= 1
+            if self._stage_pool_users[executor] == 0:
+                del self._stage_pool_users[executor]
+                if executor is not self._stage_pool:
+                    executor.shutdown(wait=False)
+
+    def _route_equations(self, page_layouts: List[Layout]) -> List[Tuple[str, Layout, Block]]:
+        jobs = []
+        for page_layout in page_layouts:
+            for block in page_layout:
+                if block.kind != BlockType.Equation:
+                    continue
+                if BlockType.Equation not in self._ocr_rule:
                     raise Exception(f"Cannot find the OCR model for {block.kind.name}")
-
-        # Text with Embed Equation
-        for bbox_text_index in range(len(page_layout)):
-            text_block = page_layout[bbox_text_index]
-            if not is_text_block(text_block.kind):
-                continue
-            # Check EmbedEq
-            has_embed_eq = False
-            equations = []
-            for bbox_j in range(len(page_layout)):
-                if bbox_text_index == bbox_j:
+                jobs.append((self._ocr_rule[BlockType.Equation], page_layout, block))
+        return jobs
+
+    def _route_embed_equations(self, page_layouts: List[Layout]) -> List[Tuple[str, Layout, Block]]:
+        """
+        Mark the text blocks holding EmbedEq blocks, keep the EmbedEq boxes on them
+        and route them to the TextWithEquation model.
+        """
+        jobs = []
+        for page_layout in page_layouts:
+            for text_index, equation_indices in page_layout.embedded_equations().items():
+                text_block = page_layout[text_index]
+                text_block._has_equation = True
+                text_block.set_equations([page_layout[i].shape for i in equation_indices])
+                if BlockType.TextWithEquation not in self._ocr_rule:
+                    raise Exception(f"Cannot find the OCR model for {text_block.kind.name}")
+                jobs.append((self._ocr_rule[BlockType.TextWithEquation], page_layout, text_block))
+        return jobs
+
+    def _route_tables(self, page_layouts: List[Layout]) -> List[Tuple[str, Layout, Block]]:
+        jobs = []
+        for page_layout in page_layouts:
+            for block in page_layout:
+                if block.kind != BlockType.Table:
                     continue
-                if page_layout[bbox_j].kind == BlockType.EmbedEq and page_layout[
-                    bbox_j
-                ].shape.is_inside(page_layout[bbox_text_index].shape):
-                    has_embed_eq = True
-                    equations.append(bbox_j)
-            
-            if not has_embed_eq:
-                continue
-            text_block._has_equation = True
-            if BlockType.TextWithEquation in self._ocr_rule:
-                model_name = self._ocr_rule[BlockType.TextWithEquation]
-                text = self._ocr_models[model_name].recognize(page_layout.crop_image(text_block))
-                page_layout[bbox_text_index].set_text(text)
-            else:
-                raise Exception(f"Cannot find the OCR model for {block.kind.name}")
+                if block.kind not in self._ocr_rule:
+                    raise Exception(f"Cannot find the Table OCR model for {block.kind.name}")
+                jobs.append((self._ocr_rule[block.kind], page_layout, block))
+        return jobs
+
+    def _route_texts(
+        self, pages: List[Optional[pypdfium2.PdfPage]], page_layouts: List[Layout], span: Span
+    ) -> List[Tuple[str, Layout, Block]]:
+        """
+        Route the text blocks without equations to OCR. With text-layer-first the
+        blocks with a reliable PDF text layer get their text here instead.
+        """
+        jobs = []
+        for page, page_layout in zip(pages, page_layouts):
+            textpage = None
+            if self._text_layer_first and page is not None:
+                with PDFIUM_LOCK:
+                    textpage = page.get_textpage()
+                    text_index = TextRectIndex(textpage)
+                    width, height = page.get_size()
+                render_scale = page_layout.width / width
+            try:
+                for block in page_layout:
+                    if not is_text_block(block.kind):
+                        continue
+                    if block._has_equation:
+                        continue
+                    if textpage is not None:
+                        text = self.read_text_layer(text_index, height, render_scale, block)
+                        if text is not None:
+                            block.set_text(text)
+                            span.add(text_layer_blocks=1)
+                            continue
+                    if block.kind not in self._ocr_rule:
+                        raise Exception(f"Cannot find the OCR model for {block.kind.name}")
+                    jobs.append((self._ocr_rule[block.kind], page_layout, block))
+            finally:
+                if textpage is not None:
+                    with PDFIUM_LOCK:
+                        textpage.close()
+        return jobs
 
-        # Text OCR
-        for bbox_i in range(len(page_layout)):
-            block = page_layout[bbox_i]
-            if not is_text_block(block.kind):
-                continue
-
-            if block._has_equation:
-                continue
-            x1, y1, x2, y2 = block.shape.boundingbox
-            if block.kind in self._ocr_rule:
-                model_name = self._ocr_rule[block.kind]
-                ocr_text = self._ocr_models[model_name].recognize(page_layout.crop_image(block))
-            else:
-                raise Exception(f"Cannot find the OCR model for {block.kind.name}")
-            text = ocr_text
-            block.set_text(text)
-
-        # Reflow
-        sorted_block_indices = xy_cut_reflow(page_layout)
-        page_layout._blocks = [page_layout._blocks[i] for i in sorted_block_indices]
-
-        return page_layout
+    def analyze_image(self, page_img: np.ndarray) -> Layout:
+        # Layout Analysis
+        page_layout = self.detect_layout(page_img)
+        return self.recognize_pdf_layouts([None], [page_layout])[0]
@@ -1,24 +1,29 @@
 from latyas.layout.block import BlockType
+from latyas.models.model_registry import LazyModel
 from latyas.pipelines.base_pipeline import BasePipeline
-from latyas.layout.models.ultralytics.ultralytics_layout_model import (
-    UltralyticsLayoutModel,
-)
 from latyas.ocr.models.paddleocr.paddleocr_ocr_config import PaddleOCRConfig
-from latyas.ocr.models.paddleocr.paddleocr_ocr_model import PaddleOCRModel
-
-from latyas.tex_ocr.models.texteller.texteller_ocr_config import TexTellerTexOCRConfig
-from latyas.tex_ocr.models.texteller.texteller_ocr_model import TexTellerTexOCRModel
 
 class BookPipeline(BasePipeline):
+    # Block type -> name of the OCR model that reads it
+    OCR_RULES = {
+        BlockType.Title: "ocr_paddle",
+        BlockType.Text: "ocr_paddle",
+        BlockType.Caption: "ocr_paddle",
+    }
+
     def __init__(self) -> None:
         super().__init__()
-        self.add_layout_model("layout_360general", UltralyticsLayoutModel.from_pretrained(
+        # The models are loaded on first use and shared with the other pipelines of the process,
+        # their backends are only imported then
+        self.add_layout_model("layout_360general", LazyModel.from_pretrained(
+            "latyas.layout.models.ultralytics.ultralytics_layout_model.UltralyticsLayoutModel",
             "XiaHan19/360LayoutAnalysis-general6-8n"
         ))
         
-        self.add_ocr_model("ocr_paddle", PaddleOCRModel(PaddleOCRConfig()))
+        self.add_ocr_model("ocr_paddle", LazyModel.from_config(
+            "latyas.ocr.models.paddleocr.paddleocr_ocr_model.PaddleOCRModel", PaddleOCRConfig()
+        ))
 
-        self.add_ocr_rule(BlockType.Title, "ocr_paddle")
-        self.add_ocr_rule(BlockType.Text, "ocr_paddle")
-        self.add_ocr_rule(BlockType.Caption, "ocr_paddle")
+        for block_type, rule in self.OCR_RULES.items():
+            self.add_ocr_rule(block_type, rule)
 
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional, Union
+
+from latyas.layout.layout import Layout
+from latyas.utils.pdf_utils import file_fingerprint
+
+CHECKPOINT_VERSION = 1
+
+
+class DocumentCheckpoint(object):
+    """
+    Progress manifest of a document, kept as JSON lines on disk.
+
+    The first line identifies the document and the settings it is analyzed with,
+    every following line holds a finished page number and its serialized Layout.
+    The header and each page are flushed and synced when they are written, so a
+    crash loses at most the line being written; a truncated last page is ignored
+    and a manifest without a complete header starts over when it is opened again.
+    Only the file offsets of the pages are kept in memory.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike], fingerprint: str) -> None:
+        self.path = str(path)
+        self.fingerprint = fingerprint
+        self._offsets: Dict[int, int] = {}
+
+        if not os.path.exists(self.path) or not self._load():
+            self._write_header()
+        self._file = open(self.path, "ab")
+
+    @classmethod
+    def for_pdf(
+        cls,
+        path: Union[str, os.PathLike],
+        pdf_path: Union[str, os.PathLike],
+        settings: Optional[Dict[str, Any]] = None,
+    ) -> "DocumentCheckpoint":
+        """
+        The checkpoint of the PDF file at pdf_path analyzed with settings, e.g. the
+        pipeline class, mode and render scales. A run with other settings does not
+        resume it.
+        """
+        fingerprint = file_fingerprint(pdf_path)
+        if settings is not None:
+            settings_json = json.dumps(settings, sort_keys=True, default=str)
+            fingerprint += ":" + hashlib.sha256(settings_json.encode()).hexdigest()
+        return cls(path, fingerprint)
+
+    def _write_header(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "wb") as f:
+            f.write((json.dumps({"version": CHECKPOINT_VERSION, "fingerprint": self.fingerprint}) + "\n").encode())
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _load(self) -> bool:
+        """
+        Read the offsets of the saved pages. False when the header never made it
+        to disk in full, then the manifest is started again.
+        """
+        with open(self.path, "rb") as f:
+            header_line = f.readline()
+            if not header_line.endswith(b"\n"):
+                return False
+            try:
+                header = json.loads(header_line)
+            except ValueError:
+                return False
+            if header.get("version") != CHECKPOINT_VERSION:
+                raise Exception(f"Unsupported checkpoint version: {header.get('version')}")
+            if header.get("fingerprint") != self.fingerprint:
+                raise Exception(f"The checkpoint {self.path} belongs to another document or other settings.")
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    # The page that was being written when the job stopped
+                    break
+                record = json.loads(line)
+                self._offsets[record["page"]] = offset
+            end = offset
+        # Drop a partly written last page before appending after it
+        if os.path.getsize(self.path) != end:
+            with open(self.path, "r+b") as f:
+                f.truncate(end)
+        return True
+
+    def __contains__(self, page_number: int) -> bool:
+        return page_number in self._offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    @property
+    def done_pages(self) -> List[int]:
+        return sorted(self._offsets)
+
+    def load(self, page_number: int) -> Layout:
+        with open(self.path, "rb") as f:
+            f.seek(self._offsets[page_number])
+            record = json.loads(f.readline())
+        return Layout.from_dict(record["layout"])
+
+    def save(self, page_number: int, page_layout: Layout) -> None:
+        line = json.dumps({"page": page_number, "layout": page_layout.to_dict()}, ensure_ascii=False) + "\n"
+        offset = self._file.tell()
+        self._file.write(line.encode("utf-8"))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._offsets[page_number] = offset
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "DocumentCheckpoint":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
@@ -1,61 +1,77 @@
 from latyas.layout.block import BlockType
-from latyas.layout.models.texteller.texteller_layout_config import TexTellerLayoutConfig
-from latyas.layout.models.texteller.texteller_layout_model import TexTellerLayoutModel
-from latyas.ocr.models.gotocr2.gotocr2_model import GOTOCR2OCRModel
+from latyas.layout.models.texteller.texteller_layout_config import TEXTELLER_DETECT_REPO
+from latyas.models.model_registry import LazyModel
 from latyas.pipelines.base_pipeline import BasePipeline
-from latyas.layout.models.ultralytics.ultralytics_layout_model import (
-    UltralyticsLayoutModel,
-)
 from latyas.ocr.models.paddleocr.paddleocr_ocr_config import PaddleOCRConfig
-from latyas.ocr.models.paddleocr.paddleocr_ocr_model import PaddleOCRModel
 
-from latyas.tex_ocr.models.texteller.texteller_ocr_config import TexTellerTexOCRConfig
-from latyas.tex_ocr.models.texteller.texteller_ocr_model import TexTellerEmbeddingTexOCRModel, TexTellerTexOCRModel
 from latyas.tex_ocr.models.texmix.texmix_model import TexMixMixTexOCRModel
 from latyas.tex_ocr.models.texmix.texmix_config import TexMixMixTexOCRConfig
-from latyas.tsr.models.gotocr2.gotocr2_model import GOTOCR2TSRModel
+
+GOTOCR2_REVISION = "cf6b7386bc89a54f09785612ba74cb12de6fa17c"
 
 class PaperPipeline(BasePipeline):
+    # Block type -> name of the OCR model that reads it
+    OCR_RULES = {
+        BlockType.Title: "ocr_paddle",
+        BlockType.Text: "ocr_paddle",
+        BlockType.Caption: "ocr_paddle",
+        BlockType.TableCaption: "ocr_paddle",
+        BlockType.FigureCaption: "ocr_paddle",
+        BlockType.Reference: "ocr_paddle",
+        BlockType.Header: "ocr_paddle",
+        BlockType.Footer: "ocr_paddle",
+        BlockType.Equation: "ocr_texteller",
+        BlockType.EmbedEq: "ocr_texteller",
+        BlockType.TextWithEquation: "ocr_texmix",
+        BlockType.Table: "tsr_gotocr2",
+    }
+
     def __init__(self) -> None:
         super().__init__()
+        # Every model is loaded on first use and shared with the other pipelines of the process.
+        # The classes are named by path, so their backends are only imported then.
         self.add_layout_model(
             "layout_360general",
-            UltralyticsLayoutModel.from_pretrained(
+            LazyModel.from_pretrained(
+                "latyas.layout.models.ultralytics.ultralytics_layout_model.UltralyticsLayoutModel",
                 "XiaHan19/360LayoutAnalysis-paper-8n"
             ),
         )
 
         self.add_layout_model(
             "layout_texteller",
-            TexTellerLayoutModel.from_pretrained(
-                "XiaHan19/texteller_rtdetr_r50vd_6x_coco"
+            LazyModel.from_pretrained(
+                "latyas.layout.models.texteller.texteller_layout_model.TexTellerLayoutModel", TEXTELLER_DETECT_REPO
             ),
         )
 
-        text_model = PaddleOCRModel(PaddleOCRConfig(lang="en"))
-        llm_text_model = GOTOCR2OCRModel.from_pretrained('stepfun-ai/GOT-OCR2_0', revision="cf6b7386bc89a54f09785612ba74cb12de6fa17c")
-        tex_model = TexTellerTexOCRModel.from_pretrained("OleehyO/TexTeller")
-        embed_tex_model = TexTellerEmbeddingTexOCRModel.from_pretrained("OleehyO/TexTeller")
+        text_model = LazyModel.from_config(
+            "latyas.ocr.models.paddleocr.paddleocr_ocr_model.PaddleOCRModel", PaddleOCRConfig(lang="en")
+        )
+        llm_text_model = LazyModel.from_pretrained(
+            "latyas.ocr.models.gotocr2.gotocr2_model.GOTOCR2OCRModel", 'stepfun-ai/GOT-OCR2_0', revision=GOTOCR2_REVISION
+        )
+        tex_model = LazyModel.from_pretrained(
+            "latyas.tex_ocr.models.texteller.texteller_ocr_model.TexTellerTexOCRModel", "OleehyO/TexTeller"
+        )
+        embed_tex_model = LazyModel.from_pretrained(
+            "latyas.tex_ocr.models.texteller.texteller_ocr_model.TexTellerEmbeddingTexOCRModel", "OleehyO/TexTeller"
+        )
         self.add_ocr_model("ocr_paddle", llm_text_model)
         self.add_ocr_model("ocr_texteller", tex_model)
+        # Shares the TexTeller recognizer of ocr_texteller and the detector of layout_texteller
         self.add_ocr_model(
-            "ocr_texmix", TexMixMixTexOCRModel(embed_tex_model, text_model, TexMixMixTexOCRConfig())
+            "ocr_texmix",
+            TexMixMixTexOCRModel(embed_tex_model, text_model, TexMixMixTexOCRConfig()),
+            shares_weights_with=["ocr_texteller", "layout_texteller"],
         )
-        table_model = GOTOCR2TSRModel.from_pretrained('stepfun-ai/GOT-OCR2_0', revision="cf6b7386bc89a54f09785612ba74cb12de6fa17c")
-        self.add_ocr_model("tsr_gotocr2", table_model)
-        
-        self.add_ocr_rule(BlockType.Title, "ocr_paddle")
-        self.add_ocr_rule(BlockType.Text, "ocr_paddle")
-        self.add_ocr_rule(BlockType.Caption, "ocr_paddle")
-        self.add_ocr_rule(BlockType.TableCaption, "ocr_paddle")
-        self.add_ocr_rule(BlockType.FigureCaption, "ocr_paddle")
-        self.add_ocr_rule(BlockType.Reference, "ocr_paddle")
-        self.add_ocr_rule(BlockType.Header, "ocr_paddle")
-        self.add_ocr_rule(BlockType.Footer, "ocr_paddle")
+        # Shares the GOT-OCR2 weights of ocr_paddle
+        table_model = LazyModel.from_pretrained(
+            "latyas.tsr.models.gotocr2.gotocr2_model.GOTOCR2TSRModel", 'stepfun-ai/GOT-OCR2_0', revision=GOTOCR2_REVISION
+        )
+        self.add_ocr_model("tsr_gotocr2", table_model, shares_weights_with=["ocr_paddle"])
         
-        self.add_ocr_rule(BlockType.Equation, "ocr_texteller")
-        self.add_ocr_rule(BlockType.EmbedEq, "ocr_texteller")
-        self.add_ocr_rule(BlockType.TextWithEquation, "ocr_texmix")
-        self.add_ocr_rule(BlockType.Table, "tsr_gotocr2")
+        for block_type, rule in self.OCR_RULES.items():
+            self.add_ocr_rule(block_type, rule)
         
         
@@ -0,0 +1,99 @@
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+
+class Stage(object):
+    def __init__(self, name: str, fn: Callable[[], None], after: Iterable[str] = ()) -> None:
+        self.name = name
+        self.fn = fn
+        self.after: Set[str] = set(after)
+
+
+class StageGraph(object):
+    """
+    A DAG of named stages. run() starts every stage as soon as the stages it
+    comes after are done, so independent stages run at the same time on the
+    executor. Stages must not wait on other stages themselves.
+    """
+
+    def __init__(self) -> None:
+        self._stages: Dict[str, Stage] = {}
+
+    def add(self, name: str, fn: Callable[[], None], after: Iterable[str] = ()) -> None:
+        if name in self._stages:
+            raise Exception(f"Duplicate stage: {name}")
+        self._stages[name] = Stage(name, fn, after)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._stages
+
+    def __len__(self) -> int:
+        return len(self._stages)
+
+    def order(self) -> List[str]:
+        """
+        The stages in a valid sequential order.
+        """
+        for stage in self._stages.values():
+            missing = stage.after - set(self._stages)
+            if len(missing) > 0:
+                raise Exception(f"Stage {stage.name} comes after unknown stages: {sorted(missing)}")
+        done: List[str] = []
+        remaining = dict(self._stages)
+        while len(remaining) > 0:
+            ready = [name for name, stage in remaining.items() if stage.after.issubset(done)]
+            if len(ready) == 0:
+                raise Exception(f"Stage graph has a cycle: {sorted(remaining)}")
+            for name in ready:
+                done.append(name)
+                del remaining[name]
+        return done
+
+    def run(self, executor: Optional[Executor] = None) -> None:
+        """
+        Run every stage once. Without an executor the stages run one after the
+        other on the calling thread. The first exception of a stage is raised
+        after the stages already running have finished; the stages after it
+        never start.
+        """
+        order = self.order()
+        if executor is None:
+            for name in order:
+                self._stages[name].fn()
+            return
+
+        done: Set[str] = set()
+        started: Set[str] = set()
+        running: Dict[Future, str] = {}
+        error: Optional[BaseException] = None
+        while len(done) < len(order):
+            if error is None:
+                ready = [
+                    name for name in order
+                    if name not in started and self._stages[name].after.issubset(done)
+                ]
+                # The last ready stage runs on the calling thread instead of waiting idle
+                inline = ready.pop() if len(ready) > 0 and len(running) == 0 else None
+                for name in ready:
+                    started.add(name)
+                    running[executor.submit(self._stages[name].fn)] = name
+                if inline is not None:
+                    started.add(inline)
+                    try:
+                        self._stages[inline].fn()
+                        done.add(inline)
+                    except BaseException as err:
+                        error = err
+                    continue
+            if len(running) == 0:
+                break
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                if future.exception() is not None:
+                    if error is None:
+                        error = future.exception()
+                else:
+                    done.add(name)
+        if error is not None:
+            raise error
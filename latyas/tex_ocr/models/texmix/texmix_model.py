@@ -13,31 +13,23 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import os
-import cv2
 import numpy as np
 from PIL import Image
-from typing import List, Optional, Union
-
-import torch
-from onnxruntime import InferenceSession
+from typing import List, Optional, Tuple, Union
 
 from latyas.layout.block import BlockType
 from latyas.layout.layout import Layout
-from latyas.layout.models.texteller.det_model.inference import PredictConfig
-from latyas.layout.models.texteller.det_model.inference import predict as latex_det_predict
-
-from latyas.layout.models.texteller.texteller_layout_model import TexTellerLayoutModel
 from latyas.layout.reflow.position_based.xy_cut_reflow import xy_cut_reflow
 from latyas.layout.shape import Rectangle
 from latyas.ocr.models.ocr_model import OCRModel
 from latyas.tex_ocr.models.texmix.texmix_config import TexMixMixTexOCRConfig
 from latyas.tex_ocr.models.texocr_model import EmbeddingTexOCRModel, MixTexOCRModel, TexOCRModel
-from latyas.ocr.ocr_utils import small_image_padding
+from latyas.ocr.ocr_utils import small_image_padding, small_image_padding_transform
 from latyas.ocr.text_bbox import TextBoundingBox
 
-# counter = 0
-
 class TexMixMixTexOCRModel(MixTexOCRModel):
+    accepts_equations = True
+
     def __init__(self, tex_model: EmbeddingTexOCRModel, text_model: OCRModel, config: TexMixMixTexOCRConfig) -> None:
         self.tex_model = tex_model
         self.text_model = text_model 
@@ -67,7 +59,91 @@ class TexMixMixTexOCRModel(MixTexOCRModel):
 
         raise NotImplementedError("The detect method of TexMixMixTexOCRModel has not been implemented")
 
-    def recognize(self, image: Union["np.ndarray", "Image.Image"]) -> str:
+    def recognize(
+        self, image: Union["np.ndarray", "Image.Image"], equations: Optional[List[Rectangle]] = None
+    ) -> str:
+        """
+        equations are the boxes of the inline equations in the pixels of image,
+        e.g. the EmbedEq blocks the layout models found on the page. When they are
+        given the equations are not detected again on the crop.
+        """
+        return self.recognize_batch([image], [equations])[0]
+
+    def recognize_batch(
+        self,
+        images: List[Union["np.ndarray", "Image.Image"]],
+        equations: Optional[List[Optional[List[Rectangle]]]] = None,
+    ) -> List[str]:
+        """
+        Recognize text blocks with inline equations. The equations of all images
+        go to the formula recognizer in one recognize_batch call, and so do the
+        text snippets around them to the text recognizer.
+        """
+        if equations is None:
+            equations = [None] * len(images)
+        local_layouts: List[Layout] = []
+        equation_bboxs_list: List[List[TextBoundingBox]] = []
+        for image, image_equations in zip(images, equations):
+            local_layout, equation_bboxs = self._locate_equations(image, image_equations)
+            local_layouts.append(local_layout)
+            equation_bboxs_list.append(equation_bboxs)
+
+        # Recognize the embedding equations of every image at once
+        equation_crops = [
+            local_layout.crop_image(eq_bbox)
+            for local_layout, equation_bboxs in zip(local_layouts, equation_bboxs_list)
+            for eq_bbox in equation_bboxs
+        ]
+        equation_texts = iter(self.tex_model.recognize_batch(equation_crops) if len(equation_crops) > 0 else [])
+
+        snippet_bboxs_list: List[List[TextBoundingBox]] = []
+        for local_layout, equation_bboxs in zip(local_layouts, equation_bboxs_list):
+            masked_layout = local_layout.copy()
+            snippet_bboxs: List[TextBoundingBox] = []
+            for eq_bbox in equation_bboxs:
+                text = next(equation_texts)
+                bbox = TextBoundingBox(eq_bbox.shape, "$" + text + "$", eq_bbox.confidence)
+                snippet_bboxs.append(bbox)
+                masked_layout.mask_image(eq_bbox)
+            snippet_bboxs.extend(self._split_text_bboxs(masked_layout, equation_bboxs))
+            snippet_bboxs_list.append(snippet_bboxs)
+
+        # Rerecognize
+        text_jobs = [
+            (local_layout, bbox)
+            for local_layout, snippet_bboxs in zip(local_layouts, snippet_bboxs_list)
+            for bbox in snippet_bboxs
+            if bbox.text is None
+        ]
+        if len(text_jobs) > 0:
+            texts = self.text_model.recognize_batch([local_layout.crop_image(bbox) for local_layout, bbox in text_jobs])
+            for (_, bbox), text in zip(text_jobs, texts):
+                bbox.text = text
+
+        results = []
+        for snippet_bboxs in snippet_bboxs_list:
+            # Reflow bboxs
+            shrinked_snippet_bboxs = [
+                TextBoundingBox(rect=e.shape.shrink(0.5)) for e in snippet_bboxs
+            ]
+            reflow_indices = xy_cut_reflow(
+                shrinked_snippet_bboxs, margin=0, horizontal_first=False
+            )
+            snippet_bboxs = [snippet_bboxs[idx] for idx in reflow_indices]
+
+            text_list = []
+            for bbox in snippet_bboxs:
+                text_list.append(bbox.text)
+            results.append(" ".join(text_list))
+        return results
+
+    def _locate_equations(
+        self, image: Union["np.ndarray", "Image.Image"], equations: Optional[List[Rectangle]]
+    ) -> Tuple[Layout, List[TextBoundingBox]]:
+        """
+        The padded image of a block and the boxes of its inline equations, given or
+        detected, in the pixels of the padded image.
+        """
         if isinstance(image, Image.Image):
             image_array = np.array(image)
         elif isinstance(image, np.ndarray):
@@ -76,22 +152,32 @@ class TexMixMixTexOCRModel(MixTexOCRModel):
             image_array = image
 
         if image_array.shape[0] < 400 or image_array.shape[1] < 400:
+            if equations is not None:
+                scale, x_offset, y_offset = small_image_padding_transform(image_array.shape)
+                equations = [
+                    Rectangle(
+                        x_1 * scale + x_offset, y_1 * scale + y_offset, x_2 * scale + x_offset, y_2 * scale + y_offset
+                    )
+                    for x_1, y_1, x_2, y_2 in (equation.boundingbox for equation in equations)
+                ]
             image_array = small_image_padding(image_array, blur=0)
 
-        snippet_bboxs: List[TextBoundingBox] = []
-        equation_bboxs = self.tex_model.detect(image_array)
+        if equations is None:
+            equation_bboxs = self.tex_model.detect(image_array)
+        else:
+            equation_bboxs = [TextBoundingBox(equation, confidence=1.0) for equation in equations]
 
         local_layout = Layout()
         local_layout._page = image_array
-        masked_layout = local_layout.copy()
-
-        # Get bbox from embedding equations
-        for eq_bbox in equation_bboxs:
-            text = self.tex_model.recognize(local_layout.crop_image(eq_bbox))
-            bbox = TextBoundingBox(eq_bbox.shape, "$" + text + "$", eq_bbox.confidence)
-            snippet_bboxs.append(bbox)
-            masked_layout.mask_image(eq_bbox)
+        return local_layout, equation_bboxs
 
+    def _split_text_bboxs(
+        self, masked_layout: Layout, equation_bboxs: List[TextBoundingBox]
+    ) -> List[TextBoundingBox]:
+        """
+        The text boxes of the block with the equations masked out, split around
+        the equations they still overlap.
+        """
         # Sort bboxs
         sorted_bbox = [(e.shape.boundingbox[0], e) for e in equation_bboxs]
         sorted_bbox = sorted(sorted_bbox, key=lambda x: x[0])
@@ -121,31 +207,4 @@ class TexMixMixTexOCRModel(MixTexOCRModel):
                 cur_rect = rhs_text_bbox
             if cur_rect is not None:
                 split_text_bboxs.append(TextBoundingBox(rect=cur_rect, confidence=1.0))
-        snippet_bboxs.extend(split_text_bboxs)
-
-        # Rerecognize
-        for bbox in snippet_bboxs:
-            if bbox.text is not None:
-                continue
-            text = self.text_model.recognize(local_layout.crop_image(bbox))
-            bbox.text = text
-
-        # global counter
-        # vis = local_layout.draw_bboxs([box.shape for box in snippet_bboxs])
-        # vis = cv2.cvtColor(vis, cv2.COLOR_BGR2RGB)
-        # cv2.imwrite(f"./outputs/output_{counter}.jpg", vis)
-        # counter += 1
-
-        # Reflow bboxs
-        shrinked_snippet_bboxs = [
-            TextBoundingBox(rect=e.shape.shrink(0.5)) for e in snippet_bboxs
-        ]
-        reflow_indices = xy_cut_reflow(
-            shrinked_snippet_bboxs, margin=0, horizontal_first=False
-        )
-        snippet_bboxs = [snippet_bboxs[idx] for idx in reflow_indices]
-
-        text_list = []
-        for bbox in snippet_bboxs:
-            text_list.append(bbox.text)
-        return " ".join(text_list)
+        return split_text_bboxs
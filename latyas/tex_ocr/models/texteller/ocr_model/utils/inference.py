@@ -16,11 +16,16 @@ def inference(
     imgs: Union[List[str], List[np.ndarray]], 
     accelerator: str = 'cpu',
     num_beams: int = 1,
-    max_tokens = None
+    max_tokens = None,
+    prepare_model: bool = True,
 ) -> List[str]:
+    """
+    With prepare_model=False the model must already be in eval mode on the
+    accelerator, e.g. loaded once for many calls.
+    """
     if imgs == []:
         return []
-    if hasattr(model, 'eval'):
+    if prepare_model and hasattr(model, 'eval'):
         # not onnx session, turn model.eval()
         model.eval()
     if isinstance(imgs[0], str):
@@ -31,7 +36,7 @@ def inference(
     imgs = inference_transform(imgs)
     pixel_values = torch.stack(imgs)
 
-    if hasattr(model, 'eval'):
+    if prepare_model and hasattr(model, 'eval'):
         # not onnx session, move weights to device
         model = model.to(accelerator)
     pixel_values = pixel_values.to(accelerator)
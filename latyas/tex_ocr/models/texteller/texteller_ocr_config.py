@@ -17,8 +17,15 @@ from typing import Dict, List, Optional
 from latyas.tex_ocr.models.texocr_config import EmbeddingTexOCRConfig, TexOCRConfig
 
 
+# Recognition backends: PyTorch, ONNX Runtime on the CPU, and ONNX Runtime with
+# dynamically quantized int8 weights
+TEXTELLER_BACKENDS = ("pytorch", "onnx", "onnx-int8")
+
+
 class TexTellerTexOCRConfig(TexOCRConfig):
     model_type: str = "TexTellerTexOCRModel"
+    backend: str = "pytorch"
 
 class TexTellerEmbeddingTexOCRConfig(EmbeddingTexOCRConfig):
-    model_type: str = "TexTellerEmbeddingTexOCRModel"
\ No newline at end of file
+    model_type: str = "TexTellerEmbeddingTexOCRModel"
+    backend: str = "pytorch"
@@ -13,41 +13,158 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import os
+import shutil
+import tempfile
 import cv2
 import numpy as np
 from PIL import Image
 from typing import List, Optional, Union
 
 import torch
-from onnxruntime import InferenceSession
 
 from latyas.layout.block import BlockType
-from latyas.layout.models.texteller.det_model.inference import PredictConfig
-from latyas.layout.models.texteller.det_model.inference import predict as latex_det_predict
-
+from latyas.layout.models.texteller.texteller_layout_config import TEXTELLER_DETECT_REPO
 from latyas.layout.models.texteller.texteller_layout_model import TexTellerLayoutModel
 from latyas.layout.shape import Rectangle
+from latyas.models.model_registry import MODEL_REGISTRY, LazyModel
 from latyas.ocr.models.ocr_model import OCRModel
 from latyas.tex_ocr.models.texocr_model import EmbeddingTexOCRModel, TexOCRModel
 from latyas.ocr.ocr_utils import small_image_padding
 from latyas.ocr.text_bbox import TextBoundingBox
-from .texteller_ocr_config import TexTellerTexOCRConfig, TexTellerEmbeddingTexOCRConfig
+from .texteller_ocr_config import TEXTELLER_BACKENDS, TexTellerTexOCRConfig, TexTellerEmbeddingTexOCRConfig
 
 from .ocr_model.model.TexTeller import TexTeller
 from .ocr_model.utils.inference import inference as latex_inference
 from .ocr_model.utils.to_katex import to_katex
 
 
+def texteller_accelerator() -> str:
+    if torch.cuda.is_available():
+        return "cuda"
+    return "cpu"
+
+
+def texteller_onnx_dir(backend: str) -> str:
+    return os.path.join(
+        os.path.expanduser("~"), ".cache", "latyas", "texteller", TexTeller.REPO_NAME.replace("/", "--"), backend
+    )
+
+
+def _load_texteller_onnx_int8():
+    """
+    The ONNX model of the onnx backend with every graph quantized to dynamic int8
+    weights. The quantized files are written to texteller_onnx_dir once, into a
+    temporary directory next to it that is renamed into place when it is
+    complete, so an interrupted run never leaves a directory that looks done.
+    """
+    from optimum.onnxruntime import ORTModelForVision2Seq
+
+    onnx_dir = texteller_onnx_dir("onnx-int8")
+    if not os.path.isdir(onnx_dir):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        source_dir = str(TexTeller.from_pretrained(use_onnx=True, onnx_provider="cpu").model_save_dir)
+        parent_dir = os.path.dirname(onnx_dir)
+        os.makedirs(parent_dir, exist_ok=True)
+        work_dir = tempfile.mkdtemp(prefix=".onnx-int8-", dir=parent_dir)
+        try:
+            for file_name in os.listdir(source_dir):
+                source_path = os.path.join(source_dir, file_name)
+                if file_name.endswith(".onnx"):
+                    quantize_dynamic(source_path, os.path.join(work_dir, file_name), weight_type=QuantType.QInt8)
+                elif os.path.isfile(source_path) and not file_name.endswith(".onnx_data"):
+                    shutil.copy(source_path, work_dir)
+            try:
+                os.replace(work_dir, onnx_dir)
+            except OSError:
+                # Another process finished first
+                if not os.path.isdir(onnx_dir):
+                    raise
+        finally:
+            if os.path.isdir(work_dir):
+                shutil.rmtree(work_dir, ignore_errors=True)
+    return ORTModelForVision2Seq.from_pretrained(onnx_dir, provider="CPUExecutionProvider")
+
+
+def load_texteller(backend: str = "pytorch"):
+    """
+    The TexTeller recognizer of backend and the tokenizer, loaded once per
+    process and shared by every TexTeller model. A PyTorch recognizer is moved to
+    the accelerator and put in eval mode here, once, instead of on every
+    inference call; the ONNX backends run on the CPU.
+    """
+    if backend not in TEXTELLER_BACKENDS:
+        raise Exception(f"Unsupported TexTeller backend: {backend}")
+
+    def load():
+        if backend == "pytorch":
+            model = TexTeller.from_pretrained()
+            model.to(texteller_accelerator())
+            model.eval()
+        elif backend == "onnx":
+            model = TexTeller.from_pretrained(use_onnx=True, onnx_provider="cpu")
+        else:
+            model = _load_texteller_onnx_int8()
+        tokenizer = MODEL_REGISTRY.get_or_load(
+            ("texteller-tokenizer", TexTeller.REPO_NAME), TexTeller.get_tokenizer
+        )
+        return model, tokenizer
+
+    return MODEL_REGISTRY.get_or_load(("texteller", TexTeller.REPO_NAME, backend), load)
+
+
+def texteller_recognize_batch(
+    model: TexTeller,
+    tokenizer,
+    images: List[Union["np.ndarray", "Image.Image"]],
+    num_beam: int = 5,
+    batch_size: int = 8,
+) -> List[str]:
+    """
+    Recognize formula crops in batches of batch_size. The crops are bucketed by
+    aspect ratio, a proxy of the formula length, so the beams of a batch finish
+    at similar lengths instead of all running as long as the longest formula.
+    The texts are returned in the order of images.
+    """
+    image_arrays = []
+    aspect_ratios = []
+    for image in images:
+        if isinstance(image, Image.Image):
+            image_array = np.array(image)
+        else:
+            image_array = image
+        aspect_ratios.append(image_array.shape[1] / max(image_array.shape[0], 1))
+        if image_array.shape[0] < 400 or image_array.shape[1] < 400:
+            image_array = small_image_padding(image_array)
+        image_arrays.append(image_array)
+
+    # ONNX Runtime models have no eval and run on the CPU
+    accelerator = texteller_accelerator() if hasattr(model, "eval") else "cpu"
+    order = sorted(range(len(image_arrays)), key=lambda image_i: aspect_ratios[image_i])
+    results: List[Optional[str]] = [None] * len(image_arrays)
+    for batch_start in range(0, len(order), batch_size):
+        batch = order[batch_start:batch_start + batch_size]
+        res = latex_inference(
+            model,
+            tokenizer,
+            [image_arrays[image_i] for image_i in batch],
+            accelerator=accelerator,
+            num_beams=num_beam,
+            prepare_model=False,
+        )
+        for image_i, r in zip(batch, res):
+            results[image_i] = to_katex(r)
+    return results
+
+
 class TexTellerTexOCRModel(TexOCRModel):
     def __init__(self, config: TexTellerTexOCRConfig) -> None:
         self.config = config
         self._name_or_path = config._name_or_path
 
-        self.latex_detect_model = TexTellerLayoutModel.from_pretrained(
-            "XiaHan19/texteller_rtdetr_r50vd_6x_coco"
-        )
-        self.latex_rec_model = TexTeller.from_pretrained()
-        self.tokenizer = TexTeller.get_tokenizer()
+        # Only loaded when detect is called
+        self.latex_detect_model = LazyModel.from_pretrained(TexTellerLayoutModel, TEXTELLER_DETECT_REPO)
+        self.latex_rec_model, self.tokenizer = load_texteller(config.backend)
 
     @classmethod
     def from_pretrained(
@@ -59,6 +176,8 @@ class TexTellerTexOCRModel(TexOCRModel):
         config = TexTellerTexOCRConfig.from_pretrained(pretrained_model_name_or_path)
         config._name_or_path = pretrained_model_name_or_path
         config._revision = revision
+        for key, value in kwargs.items():
+            setattr(config, key, value)
         return cls(config)
 
     def detect(
@@ -70,9 +189,7 @@ class TexTellerTexOCRModel(TexOCRModel):
         elif isinstance(image, np.ndarray):
             image_array = image
 
-        infer_config = PredictConfig(self.latex_detect_model.cfg_path)
-        latex_det_model = InferenceSession(self.latex_detect_model.weights_path)
-        latex_bboxes = latex_det_predict(image_array, latex_det_model, infer_config)
+        latex_bboxes = self.latex_detect_model.detect_bboxes(image_array)
         
         bboxs = []
         for bbox in latex_bboxes:
@@ -90,27 +207,14 @@ class TexTellerTexOCRModel(TexOCRModel):
         return bboxs
 
     def recognize(self, image: Union["np.ndarray", "Image.Image"], num_beam=5) -> str:
-        if isinstance(image, Image.Image):
-            image_array = np.array(image)
-        elif isinstance(image, np.ndarray):
-            image_array = image
-        else:
-            image_array = image
-        if image_array.shape[0] < 400 or image_array.shape[1] < 400:
-            image_array = small_image_padding(image_array)
-        if torch.cuda.is_available():
-            accelerator = "cuda"
-        else:
-            accelerator = "cpu"
-        res = latex_inference(
-            self.latex_rec_model,
-            self.tokenizer,
-            [image_array],
-            accelerator=accelerator,
-            num_beams=num_beam,
+        return self.recognize_batch([image], num_beam=num_beam)[0]
+
+    def recognize_batch(
+        self, images: List[Union["np.ndarray", "Image.Image"]], num_beam=5, batch_size: int = 8
+    ) -> List[str]:
+        return texteller_recognize_batch(
+            self.latex_rec_model, self.tokenizer, images, num_beam=num_beam, batch_size=batch_size
         )
-        res = to_katex(res[0])
-        return res
 
 
 class TexTellerEmbeddingTexOCRModel(EmbeddingTexOCRModel):
@@ -118,11 +222,9 @@ class TexTellerEmbeddingTexOCRModel(EmbeddingTexOCRModel):
         self.config = config
         self._name_or_path = config._name_or_path
 
-        self.latex_detect_model = TexTellerLayoutModel.from_pretrained(
-            "XiaHan19/texteller_rtdetr_r50vd_6x_coco"
-        )
-        self.latex_rec_model = TexTeller.from_pretrained()
-        self.tokenizer = TexTeller.get_tokenizer()
+        # Only loaded when detect is called
+        self.latex_detect_model = LazyModel.from_pretrained(TexTellerLayoutModel, TEXTELLER_DETECT_REPO)
+        self.latex_rec_model, self.tokenizer = load_texteller(config.backend)
 
     @classmethod
     def from_pretrained(
@@ -134,6 +236,8 @@ class TexTellerEmbeddingTexOCRModel(EmbeddingTexOCRModel):
         config = TexTellerEmbeddingTexOCRConfig.from_pretrained(pretrained_model_name_or_path)
         config._name_or_path = pretrained_model_name_or_path
         config._revision = revision
+        for key, value in kwargs.items():
+            setattr(config, key, value)
         return cls(config)
 
     def detect(
@@ -145,9 +249,7 @@ class TexTellerEmbeddingTexOCRModel(EmbeddingTexOCRModel):
         elif isinstance(image, np.ndarray):
             image_array = image
 
-        infer_config = PredictConfig(self.latex_detect_model.cfg_path)
-        latex_det_model = InferenceSession(self.latex_detect_model.weights_path)
-        latex_bboxes = latex_det_predict(image_array, latex_det_model, infer_config)
+        latex_bboxes = self.latex_detect_model.detect_bboxes(image_array)
         
         bboxs = []
         for bbox in latex_bboxes:
@@ -165,25 +267,11 @@ class TexTellerEmbeddingTexOCRModel(EmbeddingTexOCRModel):
         return bboxs
 
     def recognize(self, image: Union["np.ndarray", "Image.Image"], num_beam=5) -> str:
-        if isinstance(image, Image.Image):
-            image_array = np.array(image)
-        elif isinstance(image, np.ndarray):
-            image_array = image
-        else:
-            image_array = image
+        return self.recognize_batch([image], num_beam=num_beam)[0]
 
-        if image_array.shape[0] < 400 or image_array.shape[1] < 400:
-            image_array = small_image_padding(image_array)
-        if torch.cuda.is_available():
-            accelerator = "cuda"
-        else:
-            accelerator = "cpu"
-        res = latex_inference(
-            self.latex_rec_model,
-            self.tokenizer,
-            [image_array],
-            accelerator=accelerator,
-            num_beams=num_beam,
+    def recognize_batch(
+        self, images: List[Union["np.ndarray", "Image.Image"]], num_beam=5, batch_size: int = 8
+    ) -> List[str]:
+        return texteller_recognize_batch(
+            self.latex_rec_model, self.tokenizer, images, num_beam=num_beam, batch_size=batch_size
         )
-        res = to_katex(res[0])
-        return res
@@ -1,47 +1,154 @@
 import argparse
+import json
 import pypdfium2
-import cv2
 import numpy as np
 import os
 import tqdm
+from typing import Any, Dict, Generator, List, Optional, Tuple, Union
 
 from latyas.layout.block import BlockType
+from latyas.layout.layout import Layout
+from latyas.layout.layout_cache import LayoutCache
+from latyas.models.model_registry import class_path
+from latyas.models.recognition_cache import RecognitionCache
+from latyas.pipelines.base_pipeline import BasePipeline
 from latyas.pipelines.book_pipeline import BookPipeline
+from latyas.pipelines.checkpoint import DocumentCheckpoint
 from latyas.pipelines.paper_pipeline import PaperPipeline
 from latyas.pipelines.report_pipeline import ReportPipeline
+from latyas.utils.pdf_utils import file_fingerprint
+from latyas.utils.profiling import Profiler, TraceProfiler
 
 
-def pdf2text(pdf_path: str, mode: str):
+PIPELINE_CLASSES = {
+    "report": ReportPipeline,
+    "paper": PaperPipeline,
+    "book": BookPipeline,
+}
+
+
+def create_pipeline(mode: str) -> BasePipeline:
     mode = mode.lower()
-    if mode == "report":
-        pipeline = ReportPipeline()
-    elif mode == "paper":
-        pipeline = PaperPipeline()
-    elif mode == "book":
-        pipeline = BookPipeline()
-    else:
+    if mode not in PIPELINE_CLASSES:
         raise Exception("Unsupported mode.")
-    pdf_reader = pypdfium2.PdfDocument(pdf_path, autoclose=True)
-    texts = []
+    return PIPELINE_CLASSES[mode]()
+
+
+def layout_to_text(page_layout: Layout) -> List[str]:
+    text = []
+    for i in range(len(page_layout)):
+        block = page_layout[i]
+        if block._text is None:
+            continue
+        if block.kind == BlockType.EmbedEq:
+            continue
+        elif block.kind == BlockType.Equation:
+            text.append("\n$$\n" + block._text + "\n$$\n")
+        else:
+            text.append(block._text)
+    return text
+
+
+def layout_to_record(page_number: int, page_layout: Layout) -> Dict[str, Any]:
+    """
+    The JSON lines record of a page: its number, its text as in the text output
+    and its blocks in reading order.
+    """
+    blocks = []
+    for block in page_layout:
+        blocks.append(
+            {
+                "kind": block.kind.name,
+                "bbox": [float(v) for v in block.shape.boundingbox],
+                "text": block.text,
+            }
+        )
+    return {"page": page_number, "texts": layout_to_text(page_layout), "blocks": blocks}
+
+
+def iter_pdf2text(
+    pdf: Union[str, pypdfium2.PdfDocument],
+    mode: str,
+    workers: int = 1,
+    text_layer_first: bool = False,
+    profiler: Optional[Profiler] = None,
+    pipeline: Optional[BasePipeline] = None,
+    checkpoint: Optional[Union[str, DocumentCheckpoint]] = None,
+    ocr_cache: Optional[RecognitionCache] = None,
+    layout_cache: Optional[LayoutCache] = None,
+    render_scale: float = 2,
+    ocr_render_scale: Optional[float] = None,
+) -> Generator[Tuple[int, Layout], None, None]:
+    """
+    Yield (page_number, layout) for every page in page order, as soon as the page
+    is analyzed. Nothing is kept after a page is yielded. A pipeline built by the
+    caller replaces the one of mode. With a checkpoint (a DocumentCheckpoint, or
+    the path of its manifest when pdf is a path) the pages finished by an earlier
+    run with the same pipeline, mode, render scales and text_layer_first are
+    loaded instead of analyzed again. With a layout_cache the layouts of
+    pages seen before are reused, keyed by the file and page number when pdf is a
+    path and by the rendered image otherwise, so only OCR and reflow run again.
+    Layout runs on a render at render_scale; with an ocr_render_scale the blocks
+    sent to OCR are rendered again at that scale.
+    """
+    if isinstance(checkpoint, str) and isinstance(pdf, pypdfium2.PdfDocument):
+        raise Exception("A checkpoint path needs the path of the PDF file.")
+    if pipeline is None:
+        pipeline = create_pipeline(mode)
+    opened_checkpoint = None
+    if isinstance(checkpoint, str):
+        settings = {
+            "pipeline": class_path(type(pipeline)),
+            "mode": mode.lower(),
+            "render_scale": render_scale,
+            "ocr_render_scale": ocr_render_scale,
+            "text_layer_first": text_layer_first,
+        }
+        checkpoint = opened_checkpoint = DocumentCheckpoint.for_pdf(checkpoint, pdf, settings)
+    pipeline.set_text_layer_first(text_layer_first)
+    pipeline.set_render_scale(render_scale, ocr_render_scale)
+    pipeline.set_profiler(profiler)
+    if ocr_cache is not None:
+        pipeline.set_recognition_cache(ocr_cache)
+    document_key = None
+    if layout_cache is not None:
+        pipeline.set_layout_cache(layout_cache, key="page")
+        if not isinstance(pdf, pypdfium2.PdfDocument):
+            document_key = file_fingerprint(pdf)
+    if isinstance(pdf, pypdfium2.PdfDocument):
+        pdf_reader = pdf
+    else:
+        pdf_reader = pypdfium2.PdfDocument(pdf, autoclose=True)
     try:
-        for page_number, page in tqdm.tqdm(enumerate(pdf_reader), total=len(pdf_reader)):
-            page_layout = pipeline.analyze_pdf(page)
-            text = []
-            for i in range(len(page_layout)):
-                block = page_layout[i]
-                if block._text is None:
-                    continue
-                if block.kind == BlockType.EmbedEq:
-                    continue
-                elif block.kind == BlockType.Equation:
-                    text.append("\n$$\n" + block._text + "\n$$\n")
-                else:
-                    text.append(block._text)
-            texts.append(text)
-            page.close()
-            # break
+        yield from pipeline.analyze_document(
+            pdf_reader, workers=workers, checkpoint=checkpoint, document_key=document_key
+        )
     finally:
-        pdf_reader.close()
+        if pdf_reader is not pdf:
+            pdf_reader.close()
+        if opened_checkpoint is not None:
+            opened_checkpoint.close()
+
+
+def pdf2text(
+    pdf_path: str,
+    mode: str,
+    workers: int = 1,
+    text_layer_first: bool = False,
+    profiler: Optional[Profiler] = None,
+    checkpoint: Optional[str] = None,
+):
+    texts = []
+    pages = iter_pdf2text(
+        pdf_path,
+        mode,
+        workers=workers,
+        text_layer_first=text_layer_first,
+        profiler=profiler,
+        checkpoint=checkpoint,
+    )
+    for page_number, page_layout in pages:
+        texts.append(layout_to_text(page_layout))
     return texts
 
 
@@ -49,14 +156,65 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Process a PDF file.")
     parser.add_argument("--pdf", type=str, help="Path to the PDF file") # default="report6.pdf"
     parser.add_argument("--out", type=str, help="Path to the text file", default="out.txt")
+    parser.add_argument("--jsonl", type=str, help="Also write one JSON record per page to this file", default=None)
     parser.add_argument("--mode", type=str, help="Parse mode", default="paper")
+    parser.add_argument("--workers", type=int, help="Number of pages analyzed concurrently", default=1)
+    parser.add_argument("--text-layer-first", action="store_true", help="Use the PDF text layer when it is reliable")
+    parser.add_argument("--render-scale", type=float, default=2, help="Render scale of the pages for layout, 1 is 72 dpi")
+    parser.add_argument(
+        "--ocr-render-scale", type=float, default=None, help="Render the OCR blocks again at this scale"
+    )
+    parser.add_argument(
+        "--ocr-cache", type=str, default=None, help="sqlite file caching OCR results across runs"
+    )
+    parser.add_argument(
+        "--layout-cache", type=str, default=None, help="sqlite file caching page layouts across runs"
+    )
+    parser.add_argument(
+        "--checkpoint", type=str, default=None, help="Progress manifest, a restarted job skips the pages it holds"
+    )
+    parser.add_argument(
+        "--trace", type=str, default=None, help="Write a stage trace, JSON lines for .jsonl and Chrome trace otherwise"
+    )
 
     args = parser.parse_args()
 
     pdf_path = args.pdf
     print(f"PDF file path: {pdf_path}")
 
-    texts = pdf2text(pdf_path, mode=args.mode)
-    with open(args.out, "w", encoding="utf-8") as f:
-        for text in texts:
-            f.write("\n\n\n".join(text)+"\n\n\n")
+    profiler = TraceProfiler() if args.trace is not None else None
+    ocr_cache = RecognitionCache(path=args.ocr_cache) if args.ocr_cache is not None else None
+    layout_cache = LayoutCache(path=args.layout_cache) if args.layout_cache is not None else None
+    pdf_reader = pypdfium2.PdfDocument(pdf_path, autoclose=True)
+    jsonl_file = open(args.jsonl, "w", encoding="utf-8") if args.jsonl is not None else None
+    try:
+        with open(args.out, "w", encoding="utf-8") as f:
+            pages = iter_pdf2text(
+                pdf_path,
+                mode=args.mode,
+                workers=args.workers,
+                text_layer_first=args.text_layer_first,
+                profiler=profiler,
+                checkpoint=args.checkpoint,
+                ocr_cache=ocr_cache,
+                layout_cache=layout_cache,
+                render_scale=args.render_scale,
+                ocr_render_scale=args.ocr_render_scale,
+            )
+            # Every page is written as soon as it is ready, a crash keeps the pages before it
+            for page_number, page_layout in tqdm.tqdm(pages, total=len(pdf_reader)):
+                f.write("\n\n\n".join(layout_to_text(page_layout))+"\n\n\n")
+                f.flush()
+                if jsonl_file is not None:
+                    jsonl_file.write(json.dumps(layout_to_record(page_number, page_layout), ensure_ascii=False) + "\n")
+                    jsonl_file.flush()
+    finally:
+        if jsonl_file is not None:
+            jsonl_file.close()
+        pdf_reader.close()
+        if ocr_cache is not None:
+            ocr_cache.close()
+        if layout_cache is not None:
+            layout_cache.close()
+        if profiler is not None:
+            profiler.export(args.trace)
@@ -18,12 +18,11 @@ import numpy as np
 from PIL import Image
 from typing import List, Optional, Union
 
+from latyas.ocr.models.gotocr2.gotocr2_model import load_gotocr2
 from latyas.ocr.text_bbox import TextBoundingBox
 from latyas.tsr.models.tsr_model import TSRModel
 from .gotocr2_config import GOTOCR2TSRConfig
 
-from transformers import AutoModel, AutoTokenizer
-
 
 class GOTOCR2TSRModel(TSRModel):
     def __init__(self, config: GOTOCR2TSRConfig) -> None:
@@ -31,19 +30,7 @@ class GOTOCR2TSRModel(TSRModel):
         self._name_or_path = config._name_or_path
 
         self.device = "cuda"
-        self.tokenizer = AutoTokenizer.from_pretrained(
-            self._name_or_path, revision=config._revision, trust_remote_code=True
-        )
-        self.model = AutoModel.from_pretrained(
-            self._name_or_path,
-            revision=config._revision,
-            trust_remote_code=True,
-            low_cpu_mem_usage=True,
-            device_map=self.device,
-            use_safetensors=True,
-            pad_token_id=self.tokenizer.eos_token_id,
-        )
-        self.model = self.model.eval().to(self.device)
+        self.tokenizer, self.model = load_gotocr2(self._name_or_path, config._revision, self.device)
 
     @classmethod
     def from_pretrained(
@@ -15,7 +15,7 @@
 import numpy as np
 from PIL import Image
 from abc import ABC, abstractmethod
-from typing import Union
+from typing import List, Union
 
 from latyas.models.latyas_model import LatyasModel
 
@@ -27,3 +27,9 @@ class TSRModel(LatyasModel):
     @abstractmethod
     def recognize(self, image: Union["np.ndarray", "Image.Image"]) -> str:
         pass
+
+    def recognize_batch(self, images: List[Union["np.ndarray", "Image.Image"]]) -> List[str]:
+        """
+        Default implementation, recognizes the tables one by one.
+        """
+        return [self.recognize(image) for image in images]
@@ -0,0 +1,149 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Union
+
+
+class TieredCache(object):
+    """
+    Two tier string to string cache. The memory tier is an LRU of max_entries
+    values. The optional disk tier is a sqlite database at path, trimmed to about
+    max_disk_bytes by evicting the least recently used entries. Every tier is safe
+    to share between threads, and the database between processes.
+
+    The disk size is tracked with a running counter instead of summed on every
+    put, and the access times of disk hits are written in batches, so neither
+    grows with the size of the database. Other processes sharing the database
+    are accounted for when the counter says it is over budget.
+    """
+
+    # Disk hits whose access time is written together with the next write, or at this many
+    ACCESS_FLUSH_ENTRIES = 256
+    # The oldest entries are looked at and evicted this many at a time
+    EVICT_CHUNK_ENTRIES = 512
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        path: Optional[Union[str, os.PathLike]] = None,
+        max_disk_bytes: int = 256 * 1024 * 1024,
+    ) -> None:
+        self.max_entries = max_entries
+        self.path = None if path is None else str(path)
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_bytes = 0
+        self._accessed: Dict[str, float] = {}
+        if path is not None:
+            directory = os.path.dirname(str(path))
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(str(path), timeout=30, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            self._disk_bytes = self._db_bytes()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+            if self._db is not None:
+                row = self._db.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._accessed[key] = time.time()
+                    if len(self._accessed) >= self.ACCESS_FLUSH_ENTRIES:
+                        self._flush_accessed()
+                    self._put_memory(key, row[0])
+                    self.hits += 1
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: str) -> None:
+        with self._lock:
+            self._put_memory(key, value)
+            if self._db is not None:
+                size = len(key) + len(value.encode("utf-8"))
+                self._flush_accessed()
+                self._db.execute("BEGIN IMMEDIATE")
+                try:
+                    row = self._db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                        (key, value, size, time.time()),
+                    )
+                    self._db.execute("COMMIT")
+                except BaseException:
+                    self._db.execute("ROLLBACK")
+                    raise
+                self._disk_bytes += size - (row[0] if row is not None else 0)
+                if self._disk_bytes > self.max_disk_bytes:
+                    self._evict_disk()
+
+    def _put_memory(self, key: str, value: str) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _db_bytes(self) -> int:
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def _flush_accessed(self) -> None:
+        if len(self._accessed) == 0:
+            return
+        self._db.executemany(
+            "UPDATE entries SET accessed = ? WHERE key = ?", [(accessed, key) for key, accessed in self._accessed.items()]
+        )
+        self._accessed.clear()
+
+    def _evict_disk(self) -> None:
+        # Summed once per eviction round, which also picks up the writes of other processes
+        self._disk_bytes = self._db_bytes()
+        target = int(self.max_disk_bytes * 0.9)
+        while self._disk_bytes > target:
+            # Drop the oldest entries until the values fit again, plus some slack
+            sizes = self._db.execute(
+                "SELECT size FROM entries ORDER BY accessed LIMIT ?", (self.EVICT_CHUNK_ENTRIES,)
+            ).fetchall()
+            if len(sizes) == 0:
+                self._disk_bytes = 0
+                break
+            count, freed = 0, 0
+            for (size,) in sizes:
+                if self._disk_bytes - freed <= target:
+                    break
+                count += 1
+                freed += size
+            self._db.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed LIMIT ?)", (count,)
+            )
+            self._disk_bytes -= freed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._accessed.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM entries")
+                self._disk_bytes = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._flush_accessed()
+                self._db.close()
+            self._db = None
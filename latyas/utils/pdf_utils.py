@@ -0,0 +1,115 @@
+import hashlib
+import os
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+import pypdfium2
+
+
+def file_fingerprint(path: Union[str, os.PathLike], chunk_size: int = 1 << 20) -> str:
+    """
+    SHA-256 of the file content, identifies a PDF across renames and copies.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TextRectIndex(object):
+    """
+    Index over the text rects of a PDF page.
+
+    The rects are read from the text page once and kept in a NumPy array sorted by
+    their bottom edge. Text rects are short (one line at most), so the rects that
+    can overlap a query box vertically form one contiguous slice of that order,
+    found with two binary searches; the overlap test on that slice is vectorized.
+    Coordinates are in PDF space, (0, 0) is the left-bottom corner of the page.
+    """
+
+    def __init__(self, textpage: pypdfium2.PdfTextPage) -> None:
+        self._textpage = textpage
+        rects_n = textpage.count_rects()
+        rects = np.array(
+            [textpage.get_rect(rect_i) for rect_i in range(rects_n)], dtype=np.float64
+        ).reshape(-1, 4)  # left, bottom, right, top
+        self._page_rects = rects
+        self._order = np.argsort(rects[:, 1], kind="stable")
+        self._rects = rects[self._order]
+        self._areas = (self._rects[:, 2] - self._rects[:, 0]) * (self._rects[:, 3] - self._rects[:, 1])
+        if rects_n > 0:
+            self._max_height = float(np.max(self._rects[:, 3] - self._rects[:, 1]))
+        else:
+            self._max_height = 0.0
+        self._texts: List[Optional[str]] = [None] * rects_n
+
+    def __len__(self) -> int:
+        return self._rects.shape[0]
+
+    def query(
+        self, x_1: float, y_1: float, x_2: float, y_2: float, threshold: float = 0.5
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the page order indices of the rects whose overlap with the box,
+        relative to the smaller of the two, is above threshold, and the
+        intersection areas of those rects.
+        """
+        box_area = (x_2 - x_1) * (y_2 - y_1)
+        if box_area <= 0 or len(self) == 0:
+            return np.zeros((0,), dtype=np.int64), np.zeros((0,), dtype=np.float64)
+
+        start = np.searchsorted(self._rects[:, 1], y_1 - self._max_height, side="left")
+        stop = np.searchsorted(self._rects[:, 1], y_2, side="right")
+        rects = self._rects[start:stop]
+        areas = self._areas[start:stop]
+
+        inter_w = np.clip(np.minimum(rects[:, 2], x_2) - np.maximum(rects[:, 0], x_1), 0, None)
+        inter_h = np.clip(np.minimum(rects[:, 3], y_2) - np.maximum(rects[:, 1], y_1), 0, None)
+        inter_areas = inter_w * inter_h
+        with np.errstate(divide="ignore", invalid="ignore"):
+            overlap = inter_areas / np.minimum(areas, box_area)
+        matched = (areas > 0) & (overlap > threshold)
+
+        indices = self._order[start:stop][matched]
+        inter_areas = inter_areas[matched]
+        # Restore the page order of the rects, which is the reading order pdfium found
+        page_order = np.argsort(indices, kind="stable")
+        return indices[page_order], inter_areas[page_order]
+
+    def rect_text(self, rect_i: int) -> str:
+        # Each rect is read from pdfium at most once, however many blocks it falls in
+        if self._texts[rect_i] is None:
+            left, bottom, right, top = (float(v) for v in self._page_rects[rect_i])
+            self._texts[rect_i] = self._textpage.get_text_bounded(
+                left=left, bottom=bottom, right=right, top=top
+            ).replace("\n", "")
+        return self._texts[rect_i]
+
+    def text_and_coverage(
+        self, x_1: float, y_1: float, x_2: float, y_2: float, separate_words: bool = False
+    ) -> Tuple[str, float]:
+        """
+        Return the text of the rects overlapping the box, and the fraction of the
+        box area covered by those rects. The texts of the rects are joined as is,
+        or with a space between latin words with separate_words.
+        """
+        box_area = (x_2 - x_1) * (y_2 - y_1)
+        indices, inter_areas = self.query(x_1, y_1, x_2, y_2)
+        if len(indices) == 0:
+            return "", 0.0
+        pdf_text = ""
+        for rect_i in indices:
+            pdf_text_line = self.rect_text(int(rect_i))
+            # Keep latin words of consecutive rects apart, CJK text is joined as is
+            if (
+                separate_words
+                and pdf_text[-1:].isascii() and pdf_text[-1:].isalnum()
+                and pdf_text_line[:1].isascii() and pdf_text_line[:1].isalnum()
+            ):
+                pdf_text += " "
+            pdf_text += pdf_text_line
+        return pdf_text, min(float(np.sum(inter_areas)) / box_area, 1.0)
@@ -0,0 +1,171 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+
+class Span(object):
+    """
+    A stage or a model call being timed. Counters added with add() are summed into
+    the record of the span.
+    """
+
+    def __init__(self, profiler: "TraceProfiler", name: str, category: str, args: Dict[str, Any]) -> None:
+        self._profiler = profiler
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def add(self, **counters: int) -> None:
+        for key, value in counters.items():
+            self.args[key] = self.args.get(key, 0) + value
+
+    def __enter__(self) -> "Span":
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.thread_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        wall = time.perf_counter() - self._start_wall
+        cpu = time.thread_time() - self._start_cpu
+        self._profiler._record(self, self._start_wall, wall, cpu)
+
+
+class _NullSpan(object):
+    def add(self, **counters: int) -> None:
+        pass
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Profiler(object):
+    """
+    Instrumentation interface of the pipelines. The base class records nothing and
+    hands out a shared no-op span, so an uninstrumented pipeline only pays for a
+    method call per stage.
+    """
+
+    enabled = False
+
+    def stage(self, name: str, **args: Any):
+        return _NULL_SPAN
+
+    def model_call(self, model_name: str, **args: Any):
+        return _NULL_SPAN
+
+
+NULL_PROFILER = Profiler()
+
+
+class TraceProfiler(Profiler):
+    """
+    Records the wall time, the CPU time of the calling thread and the counters of
+    every stage and model call. Safe to share between the threads of a pipeline;
+    the process workers of analyze_document have their own pipelines and are not
+    recorded.
+    """
+
+    enabled = True
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self.events: List[Dict[str, Any]] = []
+
+    def stage(self, name: str, **args: Any) -> Span:
+        return Span(self, name, "stage", args)
+
+    def model_call(self, model_name: str, **args: Any) -> Span:
+        args["calls"] = 1
+        return Span(self, model_name, "model", args)
+
+    def _record(self, span: Span, start: float, wall: float, cpu: float) -> None:
+        event = {
+            "name": span.name,
+            "category": span.category,
+            "start": start - self._origin,
+            "wall": wall,
+            "cpu": cpu,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": span.args,
+        }
+        with self._lock:
+            self.events.append(event)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.events = []
+
+    def summary(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        Totals per category and name: count, wall, cpu and the summed counters.
+        """
+        totals: Dict[str, Dict[str, Dict[str, float]]] = {}
+        with self._lock:
+            events = list(self.events)
+        for event in events:
+            total = totals.setdefault(event["category"], {}).setdefault(
+                event["name"], {"count": 0, "wall": 0.0, "cpu": 0.0}
+            )
+            total["count"] += 1
+            total["wall"] += event["wall"]
+            total["cpu"] += event["cpu"]
+            for key, value in event["args"].items():
+                if isinstance(value, (int, float)):
+                    total[key] = total.get(key, 0) + value
+        return totals
+
+    def export_jsonl(self, path: str) -> None:
+        with self._lock:
+            events = list(self.events)
+        with open(path, "w", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+    def export_chrome_trace(self, path: str) -> None:
+        """
+        Write the events in the Chrome trace event format, for chrome://tracing or Perfetto.
+        """
+        with self._lock:
+            events = list(self.events)
+        trace_events = []
+        for event in events:
+            args = dict(event["args"])
+            args["cpu_ms"] = event["cpu"] * 1000
+            trace_events.append(
+                {
+                    "name": event["name"],
+                    "cat": event["category"],
+                    "ph": "X",
+                    "ts": event["start"] * 1e6,
+                    "dur": event["wall"] * 1e6,
+                    "pid": event["pid"],
+                    "tid": event["tid"],
+                    "args": args,
+                }
+            )
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+
+    def export(self, path: str, format: Optional[str] = None) -> None:
+        """
+        Export as "jsonl" or "chrome". Without a format, a .jsonl path gives JSON
+        lines and any other path a Chrome trace.
+        """
+        if format is None:
+            format = "jsonl" if path.endswith(".jsonl") else "chrome"
+        if format == "jsonl":
+            self.export_jsonl(path)
+        elif format == "chrome":
+            self.export_chrome_trace(path)
+        else:
+            raise Exception(f"Unsupported trace format: {format}")
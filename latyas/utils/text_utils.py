@@ -1,3 +1,6 @@
+import unicodedata
+
+
 def levenshtein_distance(s1: str, s2: str) -> int:
     if len(s1) < len(s2):
         return levenshtein_distance(s2, s1)
@@ -16,3 +19,24 @@ def levenshtein_distance(s1: str, s2: str) -> int:
         previous_row = current_row
 
     return previous_row[-1]
+
+
+def valid_char_ratio(text: str) -> float:
+    """
+    Fraction of the characters that are ordinary unicode. Replacement characters,
+    private use, surrogate, unassigned and control code points usually come from
+    a broken ToUnicode map of a PDF font.
+    """
+    if len(text) == 0:
+        return 0.0
+    valid = 0
+    for c in text:
+        if c in ("\ufffd", "\ufffe"):
+            continue
+        category = unicodedata.category(c)
+        if category in ("Co", "Cs", "Cn"):
+            continue
+        if category == "Cc" and c not in "\t\r\n":
+            continue
+        valid += 1
+    return valid / len(text)
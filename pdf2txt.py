@@ -18,7 +18,7 @@ from latyas.ocr.models.paddleocr.paddleocr_ocr_config import PaddleOCRConfig
 from latyas.ocr.models.paddleocr.paddleocr_ocr_model import PaddleOCRModel
 ocr_model = PaddleOCRModel(PaddleOCRConfig())
 
-from latyas.layout.shape import Rectangle
+from latyas.utils.pdf_utils import TextRectIndex
 import pypdfium2
 import cv2
 import numpy as np
@@ -26,29 +26,6 @@ import os
 import tqdm
 
 
-def get_text_by_bbox(textpage, x_1, y_1, x_2, y_2) -> str:
-    
-    # The page coordinate system's starting point (0,0) is the left-bottom corner of a page.
-    # The Y axis is directed from the bottom of the page to the top.
-    pdf_text = ""
-    rects_n = textpage.count_rects()
-    for rect_i in range(rects_n):
-        rect_cord = textpage.get_rect(rect_i)
-        lhs_rect = Rectangle(rect_cord[0], rect_cord[1], rect_cord[2], rect_cord[3])
-        rhs_rect = Rectangle(x_1, y_1, x_2, y_2)
-
-        overlap_area = lhs_rect.intersect(rhs_rect).area / min(
-            lhs_rect.area, rhs_rect.area
-        )
-
-        if overlap_area > 0.5:
-            pdf_text_line = textpage.get_text_bounded(
-                left=rect_cord[0], bottom=rect_cord[1], right=rect_cord[2], top=rect_cord[3]
-            ).replace("\n", "")
-            pdf_text += pdf_text_line
-    return pdf_text
-
-
 def get_page_text(page_number: int, page: pypdfium2.PdfPage) -> List[str]:
     width, height = page.get_size()
     render_scale = rs = 2
@@ -63,6 +40,7 @@ def get_page_text(page_number: int, page: pypdfium2.PdfPage) -> List[str]:
 
     # OCR
     textpage = page.get_textpage()
+    text_index = TextRectIndex(textpage)
     for bbox_i in range(len(page_layout)):
         block = page_layout[bbox_i]
         if block.kind not in (BlockType.Text, BlockType.Title, BlockType.Caption):
@@ -70,7 +48,7 @@ def get_page_text(page_number: int, page: pypdfium2.PdfPage) -> List[str]:
         x1, y1, x2, y2 = block.shape.boundingbox
         x_1, y_1, x_2, y_2 = x1 / rs, height - y2 / rs, x2 / rs, height - y1 / rs
         ocr_text = ocr_model.recognize(page_layout.crop_image(block))
-        pdf_text = get_text_by_bbox(textpage, x_1, y_1, x_2, y_2)
+        pdf_text, _ = text_index.text_and_coverage(x_1, y_1, x_2, y_2)
         print("=========== OCR Text =============")
         print(ocr_text)
         print("=========== PDF Text =============")
@@ -91,7 +69,7 @@ def get_page_text(page_number: int, page: pypdfium2.PdfPage) -> List[str]:
     textpage.close()
     
     sorted_block_indices = xy_cut_reflow(page_layout)
-    page_layout._blocks = [page_layout._blocks[i] for i in sorted_block_indices]
+    page_layout.reorder(sorted_block_indices)
 
     # write images
     vis = page_layout.visualize()
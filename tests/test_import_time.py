@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+from latyas.benchmarks.import_time_benchmark import TARGETS, check
+
+# Slow or loaded machines can scale every budget, e.g. LATYAS_IMPORT_BUDGET_SCALE=2
+BUDGET_SCALE = float(os.environ.get("LATYAS_IMPORT_BUDGET_SCALE", "1"))
+
+
+@pytest.fixture(scope="module")
+def results():
+    _, results = check(runs=5, budget_scale=BUDGET_SCALE)
+    return {result["target"]: result for result in results}
+
+
+@pytest.mark.parametrize("target", list(TARGETS))
+def test_imports_no_backend(results, target):
+    result = results[target]
+    assert "backends" in result, result["status"]
+    assert result["backends"] == []
+
+
+@pytest.mark.parametrize("target", list(TARGETS))
+def test_import_within_budget(results, target):
+    result = results[target]
+    assert "median_ms" in result, result["status"]
+    assert result["median_ms"] <= result["budget_ms"], (
+        f"{target} imports in {result['median_ms']:.1f} ms, over its budget of {result['budget_ms']:.0f} ms"
+    )
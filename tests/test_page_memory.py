@@ -0,0 +1,21 @@
+import pytest
+
+from latyas.benchmarks.page_memory_benchmark import measure
+from latyas.benchmarks.synthetic_pdf import write_synthetic_pdf
+
+PAGES = 2
+
+
+@pytest.fixture(scope="module")
+def allocations(tmp_path_factory):
+    pdf_path = str(tmp_path_factory.mktemp("pdf") / "paper.pdf")
+    write_synthetic_pdf(pdf_path, "paper", pages=PAGES)
+    return measure(pdf_path, PAGES, "before", 2), measure(pdf_path, PAGES, "after", 2)
+
+
+@pytest.mark.parametrize("stage", ["render_mb", "crops_mb"])
+def test_page_path_allocates_less_than_half(allocations, stage):
+    before, after = allocations
+    assert len(after[stage]) == PAGES
+    for page_before, page_after in zip(before[stage], after[stage]):
+        assert page_after < page_before / 2, f"{stage}: {page_after:.2f} MB, {page_before:.2f} MB before"